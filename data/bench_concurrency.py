@@ -0,0 +1,153 @@
+# @file bench_concurrency.py
+# @brief Multi-process stress test of part_info.db: rollback journal vs WAL with a writer queue.
+# Both modes use the same busy timeout and synchronous level, so only the journaling differs.
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+
+from data.gen_part_info import bulk_ingest
+from data.bench_startup import make_catalog
+from data.repository import PartRepository
+from data.journal import UPDATE_QUERY, SAVED_COLUMNS
+from data.storage import SYNCHRONOUS, ReadPool, Storage, connect
+
+# A rollback-journal connection with the WAL connections' busy timeout and synchronous level
+def rollback_connect(db_path):
+    conn = connect(db_path, wal=False)
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    return conn
+
+# One reader process: opens random components until the deadline, in WAL mode
+# through a read pool as the GUI does
+def reader(db_path, wal, n_components, deadline, seed, results):
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    if wal:
+        source = ReadPool(db_path, 1)
+        repo = PartRepository(readers=source)
+    else:
+        source = rollback_connect(db_path)
+        repo = PartRepository(source)
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            repo.failure_modes(rng.randrange(n_components))
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+    source.close()
+    results.put(("read", latencies, errors))
+
+def _edit(rng, n_rows):
+    values = [None] * len(SAVED_COLUMNS)
+    values[SAVED_COLUMNS.index("severity")] = rng.randint(1, 10)
+    return tuple(values) + (rng.randrange(n_rows),)
+
+# One writer process, as the GUI wrote before: every edit committed on its own
+def rollback_writer(db_path, n_rows, deadline, seed, results):
+    rng = random.Random(seed)
+    conn = rollback_connect(db_path)
+    writes, errors = 0, 0
+    while time.time() < deadline:
+        try:
+            with conn:
+                conn.execute(UPDATE_QUERY, _edit(rng, n_rows))
+            writes += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    results.put(("write", writes, errors))
+
+# One writer process in WAL mode: edits go through its Storage's writer queue
+def wal_writer(db_path, n_rows, deadline, seed, results):
+    rng = random.Random(seed)
+    storage = Storage(db_path, wal=True, readers=0)
+    writes, errors = 0, 0
+    pending = []
+    while time.time() < deadline:
+        edit = _edit(rng, n_rows)
+        pending.append(storage.writer.submit(lambda conn, edit=edit: conn.execute(UPDATE_QUERY, edit)))
+        # Bound the backlog so the count reflects committed writes
+        if len(pending) >= 1000:
+            for future in pending:
+                try:
+                    future.result()
+                    writes += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+            pending = []
+    for future in pending:
+        try:
+            future.result()
+            writes += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    storage.close()
+    results.put(("write", writes, errors))
+
+def run(db_path, wal, readers, writers, seconds, n_rows, n_components):
+    results = multiprocessing.Queue()
+    deadline = time.time() + 1 + seconds
+    writer = wal_writer if wal else rollback_writer
+    processes = [
+        multiprocessing.Process(target=reader, args=(db_path, wal, n_components, deadline, i, results))
+        for i in range(readers)
+    ] + [
+        multiprocessing.Process(target=writer, args=(db_path, n_rows, deadline, 1000 + i, results))
+        for i in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = np.concatenate([np.asarray(o[1]) for o in outcomes if o[0] == "read"] or [np.zeros(0)])
+    return {
+        "reads": len(latencies),
+        "p50": np.percentile(latencies, 50) if len(latencies) else float("nan"),
+        "p99": np.percentile(latencies, 99) if len(latencies) else float("nan"),
+        "read_errors": sum(o[2] for o in outcomes if o[0] == "read"),
+        "writes_per_s": sum(o[1] for o in outcomes if o[0] == "write") / seconds,
+        "write_errors": sum(o[2] for o in outcomes if o[0] == "write"),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress tests concurrent access to part_info.db")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--components", type=int, default=1_000)
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--writers", type=int, default=2, help="writer processes")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "part_info.csv")
+        make_catalog(csv_path, args.rows, args.components)
+        template = os.path.join(tmp, "template.db")
+        bulk_ingest(csv_path, template)
+        conn = sqlite3.connect(template)
+        PartRepository(conn)
+        conn.close()
+
+        print(f"{args.rows} rows, {args.readers} readers, {args.writers} writers, {args.seconds:g} s")
+        for name, wal in (("rollback journal", False), ("WAL + writer queue", True)):
+            db_path = os.path.join(tmp, f"{'wal' if wal else 'rollback'}.db")
+            with open(template, "rb") as src, open(db_path, "wb") as dst:
+                dst.write(src.read())
+            if wal:
+                connect(db_path, wal=True).close()
+            stats = run(db_path, wal, args.readers, args.writers, args.seconds, args.rows, args.components)
+            print(f"  {name}:")
+            print(f"    reads:  {stats['reads']:8d}  p50 {stats['p50'] * 1000:7.2f} ms"
+                  f"  p99 {stats['p99'] * 1000:7.2f} ms  locked {stats['read_errors']}")
+            print(f"    writes: {stats['writes_per_s']:8.0f}/s  locked {stats['write_errors']}")
+
+if __name__ == "__main__":
+    main()
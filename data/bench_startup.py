@@ -0,0 +1,121 @@
+# @file bench_startup.py
+# @brief Times the GUI's startup data paths under WAL: lazy SQLite against the memory-mapped snapshot
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from data.gen_part_info import bulk_ingest
+from data.repository import PartRepository, FailureModeCache
+from data.journal import ChangeJournal
+from data.storage import Storage
+from data.store import FmecaStore
+from data.criticality import CriticalityEngine
+from data.snapshot import build_snapshot, load_snapshot
+
+# Rows the GUI table shows per component
+MAX_IDS = 10
+
+# Writes a synthetic catalog with the same columns as part_info.csv
+def make_catalog(csv_path, n_rows, n_components, seed=0):
+    rng = np.random.default_rng(seed)
+    comps = rng.integers(0, n_components, n_rows)
+    fails = rng.integers(0, max(n_rows // 10, 1), n_rows)
+    pd.DataFrame(
+        {
+            "Component": [f"Component {c:06d}" for c in comps],
+            "ID": np.arange(n_rows) + 1,
+            "Failure Mode": [f"Failure mode {f:07d}" for f in fails],
+        }
+    ).to_csv(csv_path, index=False)
+
+# What read_sql did before lazy loading: every table into pandas, RPN in Python
+def full_load(db_path, _):
+    conn = sqlite3.connect(db_path)
+    pd.read_sql_query("SELECT * FROM components", conn)
+    pd.read_sql_query("SELECT * FROM fail_modes", conn)
+    for table in ("comp_fails", "local_comp_fails"):
+        frame = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+        [int(row["frequency"] * row["severity"] * row["detection"]) for _, row in frame.iterrows()]
+    conn.close()
+
+"""
+MainWindow.read_sql and read_store, then populate_table for each comp_id: a
+Storage in WAL mode, a PartRepository on its read pool, the criticality
+engine and a FailureModeCache. With use_snapshot, the snapshot is loaded (and
+checkpointed) and the store maps its arrays; otherwise every component is
+one indexed query.
+"""
+
+def gui_startup(db_path, comp_ids, use_snapshot=False):
+    storage = Storage(db_path, setup=PartRepository.prepare)
+    try:
+        repo = PartRepository(readers=storage.readers)
+        snapshot = load_snapshot(db_path) if use_snapshot else None
+        if use_snapshot:
+            assert snapshot is not None, "snapshot is not current"
+            source = FmecaStore.from_snapshot(snapshot)
+            rows = source.all()
+            CriticalityEngine(rows.cf_id, rows.comp_id, rows.best_estimate, rows.mission_time)
+        else:
+            source = repo
+            with storage.readers.connection() as conn:
+                CriticalityEngine.from_connection(conn)
+        cache = FailureModeCache(source, journal=ChangeJournal())
+        for comp_id in comp_ids:
+            cache.get(comp_id).page(MAX_IDS).to_frame()
+    finally:
+        storage.close()
+
+def lazy_sqlite(db_path, comp_ids):
+    gui_startup(db_path, comp_ids)
+
+def snapshot(db_path, comp_ids):
+    gui_startup(db_path, comp_ids, use_snapshot=True)
+
+def timed(fn, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks GUI startup data paths")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--components", type=int, default=2_000)
+    parser.add_argument("--opens", type=int, default=20,
+                        help="components opened after startup")
+    parser.add_argument("--skip-full", action="store_true",
+                        help="skip the (slow) full-load baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "part_info.csv")
+        db_path = os.path.join(tmp, "part_info.db")
+        make_catalog(csv_path, args.rows, args.components)
+        bulk_ingest(csv_path, db_path)
+        # Switch to WAL, migrate and index once so no path pays for it
+        Storage(db_path, setup=PartRepository.prepare).close()
+
+        start = time.perf_counter()
+        build_snapshot(db_path)
+        build_time = time.perf_counter() - start
+
+        comp_ids = np.random.default_rng(1).integers(0, args.components, args.opens).tolist()
+        print(f"{args.rows} rows, {args.components} components, WAL; startup, then {args.opens} components opened")
+        print(f"  snapshot build:        {build_time * 1000:9.1f} ms (once, after the database changes)")
+        if not args.skip_full:
+            print(f"  sqlite, full load:     {timed(full_load, db_path, comp_ids) * 1000:9.1f} ms")
+        for name, path in (("sqlite, lazy:", lazy_sqlite), ("snapshot (mmap):", snapshot)):
+            startup = timed(path, db_path, [])
+            total = timed(path, db_path, comp_ids)
+            print(f"  {name:22s} {startup * 1000:9.1f} ms startup, {total * 1000:9.1f} ms with opens")
+
+if __name__ == "__main__":
+    main()
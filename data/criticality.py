@@ -0,0 +1,164 @@
+# @file criticality.py
+# @brief MIL-STD-1629A criticality numbers for every failure mode and component
+
+import os
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from .repository import PartRepository
+
+# Conditional probability that a failure mode causes the loss (MIL-STD-1629A's beta).
+# The schema has no column for it, so every mode is taken as an actual loss.
+DEFAULT_BETA = 1.0
+
+# Columns added to each failure mode row:
+#   alpha:            failure mode ratio, the mode's share of its component's failure rate
+#   mode_criticality: Cm = beta * alpha * lambda_p * t
+#   item_criticality: Cr, the sum of Cm over the component's modes
+CRITICALITY_COLUMNS = ("alpha", "mode_criticality", "item_criticality")
+
+# Columns whose edits change criticality numbers
+INPUT_COLUMNS = ("best_estimate", "mission_time", "beta")
+
+DEFAULT_CHUNKSIZE = 50_000
+
+"""
+
+Name: CriticalityEngine
+Type: class
+Description: Criticality numbers for every row of a comp_fails table, held as
+NumPy arrays sorted by (comp_id, cf_id). Each row's best_estimate is its
+failure mode's rate (alpha * lambda_p, in failures per million hours), so a
+component's part failure rate lambda_p is the sum over its modes. Everything
+is computed in one vectorized pass; set_value() recomputes only the edited
+row's component.
+
+"""
+
+class CriticalityEngine:
+    def __init__(self, cf_ids, comp_ids, best_estimate, mission_time, beta=DEFAULT_BETA):
+        cf_ids = np.asarray(cf_ids, dtype=np.int64)
+        comp_ids = np.asarray(comp_ids, dtype=np.int64)
+        order = np.lexsort((cf_ids, comp_ids))
+        self.cf_ids = cf_ids[order]
+        self.comp_ids = comp_ids[order]
+        self.best_estimate = np.asarray(best_estimate, dtype=np.float64)[order]
+        self.mission_time = np.asarray(mission_time, dtype=np.float64)[order]
+        self.beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), order.shape)[order].copy()
+
+        # Components as contiguous row ranges: rows offsets[c]:offsets[c + 1] belong to components[c]
+        self.components, starts = np.unique(self.comp_ids, return_index=True)
+        self.offsets = np.append(starts, len(order)).astype(np.int64)
+        self._component_of_row = np.repeat(np.arange(len(self.components)), np.diff(self.offsets))
+        self._row_of_cf = np.full(int(self.cf_ids.max()) + 1 if len(order) else 0, -1, dtype=np.int64)
+        self._row_of_cf[self.cf_ids] = np.arange(len(order))
+        self.compute()
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, table="local_comp_fails", beta=DEFAULT_BETA,
+                        chunksize=DEFAULT_CHUNKSIZE):
+        if table not in ("comp_fails", "local_comp_fails"):
+            raise ValueError(f"unknown failure mode table: {table}")
+        cursor = conn.execute(f"SELECT cf_id, comp_id, best_estimate, mission_time FROM {table}")
+        blocks = []
+        while True:
+            chunk = cursor.fetchmany(chunksize)
+            if not chunk:
+                break
+            blocks.append(np.array(chunk, dtype=np.float64))
+        block = np.concatenate(blocks) if blocks else np.empty((0, 4))
+        return cls(block[:, 0], block[:, 1], block[:, 2], block[:, 3], beta)
+
+    def __len__(self):
+        return len(self.cf_ids)
+
+    # The whole-table pass: per-component sums with bincount, then per-row ratios
+    def compute(self) -> None:
+        n_components = len(self.components)
+        self.part_failure_rate = np.bincount(
+            self._component_of_row, weights=self.best_estimate, minlength=n_components
+        )
+        self.mode_criticality = self.beta * self.best_estimate * self.mission_time
+        self.item_criticality = np.bincount(
+            self._component_of_row, weights=self.mode_criticality, minlength=n_components
+        )
+        rate = self.part_failure_rate[self._component_of_row]
+        # A component with no failure rate at all has no mode ratios
+        self.alpha = np.divide(
+            self.best_estimate, rate, out=np.zeros_like(rate), where=rate > 0
+        )
+
+    # Recomputes one component's rows (from its slice, so edits don't accumulate rounding)
+    def _compute_component(self, c) -> None:
+        rows = slice(self.offsets[c], self.offsets[c + 1])
+        rate = self.best_estimate[rows].sum()
+        self.part_failure_rate[c] = rate
+        self.mode_criticality[rows] = self.beta[rows] * self.best_estimate[rows] * self.mission_time[rows]
+        self.item_criticality[c] = self.mode_criticality[rows].sum()
+        self.alpha[rows] = self.best_estimate[rows] / rate if rate > 0 else 0.0
+
+    def _rows(self, cf_ids) -> np.ndarray:
+        cf_ids = np.asarray(cf_ids, dtype=np.int64)
+        known = (cf_ids >= 0) & (cf_ids < len(self._row_of_cf))
+        rows = np.full(cf_ids.shape, -1, dtype=np.int64)
+        rows[known] = self._row_of_cf[cf_ids[known]]
+        if (rows < 0).any():
+            raise KeyError(int(cf_ids[rows < 0].flat[0]))
+        return rows
+
+    # Applies one edited value; other columns are ignored. Returns the comp_id whose rows changed.
+    def set_value(self, cf_id, column: str, value):
+        row = self._rows(int(cf_id))
+        if column not in INPUT_COLUMNS:
+            return None
+        getattr(self, column)[row] = value
+        c = self._component_of_row[row]
+        self._compute_component(c)
+        return int(self.components[c])
+
+    # CRITICALITY_COLUMNS for the given cf_ids, indexed by cf_id
+    def values(self, cf_ids) -> pd.DataFrame:
+        cf_ids = np.asarray(cf_ids, dtype=np.int64)
+        rows = self._rows(cf_ids)
+        return pd.DataFrame(
+            {
+                "alpha": self.alpha[rows],
+                "mode_criticality": self.mode_criticality[rows],
+                "item_criticality": self.item_criticality[self._component_of_row[rows]],
+            },
+            index=cf_ids,
+        )
+
+    # Failure modes by descending mode criticality, from the arrays (so unsaved edits count)
+    def ranking(self, limit=None) -> pd.DataFrame:
+        # Ties in cf_id order, like CRITICALITY_RANKING_QUERIES
+        rows = np.lexsort((self.cf_ids, -self.mode_criticality))[:limit]
+        return pd.DataFrame(
+            {
+                "cf_id": self.cf_ids[rows],
+                "comp_id": self.comp_ids[rows],
+                "alpha": self.alpha[rows],
+                "mode_criticality": self.mode_criticality[rows],
+                "item_criticality": self.item_criticality[self._component_of_row[rows]],
+            }
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ranks failure modes by MIL-STD-1629A mode criticality")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "part_info.db"))
+    parser.add_argument("--table", choices=("comp_fails", "local_comp_fails"), default="local_comp_fails")
+    parser.add_argument("--beta", type=float, default=DEFAULT_BETA)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ranking = PartRepository(conn).criticality_ranking(args.table, args.limit, args.beta)
+    finally:
+        conn.close()
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(ranking.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
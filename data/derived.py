@@ -0,0 +1,80 @@
+# @file derived.py
+# @brief Dependency graph of values derived from failure mode rows, computed lazily
+
+from collections import Counter, defaultdict
+
+# A rule's scope says what its values are keyed by
+ROW = "row"
+COMPONENT = "component"
+
+"""
+
+Name: DerivedValues
+Type: class
+Description: Values derived from failure mode rows (RPN, threshold class,
+criticality, fits, chart series) as a dependency graph. Each rule names its
+inputs, which are row columns, global inputs such as "threshold", or other
+rules. A ROW value is keyed by cf_id and a COMPONENT value by comp_id.
+invalidate() marks everything downstream of one edit dirty and returns it.
+get() recomputes a dirty value only when a view asks for it, so each value
+is computed at most once however many edits come before the next read.
+
+"""
+
+class DerivedValues:
+    def __init__(self):
+        self._rules = {}
+        self._dependents = defaultdict(list)
+        self._values = defaultdict(dict)
+        # Computations per rule, e.g. to check how much an edit recomputed
+        self.computed = Counter()
+
+    # compute(key) returns the value for one cf_id (ROW) or comp_id (COMPONENT),
+    # reading other rules through get()
+    def rule(self, kind: str, inputs, compute, scope=ROW) -> None:
+        if kind in self._rules:
+            raise ValueError(f"rule already defined: {kind}")
+        if scope not in (ROW, COMPONENT):
+            raise ValueError(f"unknown scope: {scope}")
+        for name in inputs:
+            # A component value changing would dirty rows this graph can't enumerate
+            if scope == ROW and name in self._rules and self._rules[name][0] == COMPONENT:
+                raise ValueError(f"row rule {kind} can't depend on component rule {name}")
+            self._dependents[name].append(kind)
+        self._rules[kind] = (scope, compute)
+
+    def get(self, kind: str, cf_id=None, comp_id=None):
+        scope, compute = self._rules[kind]
+        key = cf_id if scope == ROW else comp_id
+        values = self._values[kind]
+        if key not in values:
+            values[key] = compute(key)
+            self.computed[kind] += 1
+        return values[key]
+
+    """
+    Marks every value downstream of an input dirty: the row's values for a
+    column edit (cf_id and its comp_id), or every value for a global input
+    (no cf_id). Returns the dirty (rule, key) pairs; a key of None means
+    all keys of that rule.
+    """
+
+    def invalidate(self, name: str, cf_id=None, comp_id=None) -> set:
+        dirty = set()
+        names = [name]
+        while names:
+            for kind in self._dependents.get(names.pop(), ()):
+                key = cf_id if self._rules[kind][0] == ROW else comp_id
+                if (kind, key) not in dirty:
+                    dirty.add((kind, key))
+                    names.append(kind)
+        for kind, key in dirty:
+            if key is None:
+                self._values[kind].clear()
+            else:
+                self._values[kind].pop(key, None)
+        return dirty
+
+    # Drops every value, e.g. after the rows were replaced wholesale
+    def clear(self) -> None:
+        self._values.clear()
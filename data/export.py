@@ -0,0 +1,213 @@
+# @file export.py
+# @brief Streams the joined FMECA worksheet out of part_info.db to CSV, XLSX or Parquet
+
+import os
+import sys
+import sqlite3
+import argparse
+import pandas as pd
+from .migrate import COMP_FAIL_TABLES, migrate
+
+# Worksheet columns, in output order
+EXPORT_COLUMNS = (
+    "component",
+    "failure_mode",
+    "cf_id",
+    "comp_id",
+    "fail_id",
+    "frequency",
+    "severity",
+    "detection",
+    "rpn",
+    "lower_bound",
+    "best_estimate",
+    "upper_bound",
+    "mission_time",
+)
+
+# Ordered by (comp_id, cf_id): SQLite walks a comp_id index and sorts within one component at a time
+EXPORT_QUERIES = {
+    table: f"""
+    SELECT c.name, f.desc, cf.cf_id, cf.comp_id, cf.fail_id,
+           cf.frequency, cf.severity, cf.detection, cf.rpn,
+           cf.lower_bound, cf.best_estimate, cf.upper_bound, cf.mission_time
+    FROM {table} AS cf
+    JOIN components AS c ON c.id = cf.comp_id
+    JOIN fail_modes AS f ON f.id = cf.fail_id
+    ORDER BY cf.comp_id, cf.cf_id
+    """
+    for table in COMP_FAIL_TABLES
+}
+
+EXPORT_FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".parquet": "parquet"}
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Data rows per XLSX sheet (Excel's limit, less the header); extra rows go to new sheets
+XLSX_MAX_ROWS = 1_048_575
+
+def export_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"unsupported export format: {ext or path}")
+    return EXPORT_FORMATS[ext]
+
+"""
+Writes every failure mode row of a comp_fails table, joined with its component
+name and failure mode description, to a .csv, .xlsx or .parquet file. Rows are
+fetched and written one chunk at a time, so memory use depends on the chunk
+size only. progress(rows_written, total_rows) is called after each chunk.
+Returns the number of rows written.
+"""
+
+def export_worksheet(conn: sqlite3.Connection, path: str, table="local_comp_fails",
+                     chunksize=DEFAULT_CHUNKSIZE, progress=None) -> int:
+    if table not in COMP_FAIL_TABLES:
+        raise ValueError(f"unknown failure mode table: {table}")
+    writer = _WRITERS[export_format(path)](path)
+
+    (total,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+    written = 0
+    try:
+        cursor = conn.execute(EXPORT_QUERIES[table])
+        while True:
+            chunk = cursor.fetchmany(chunksize)
+            if not chunk:
+                break
+            writer.write(pd.DataFrame.from_records(chunk, columns=EXPORT_COLUMNS))
+            written += len(chunk)
+            if progress is not None:
+                progress(written, total)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return written
+
+"""
+
+Name: CsvWriter
+Type: class
+Description: Appends chunks to a CSV file, writing the header once.
+
+"""
+
+class CsvWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.header = True
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        chunk.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self) -> None:
+        if self.header:
+            pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(self.file, index=False)
+        self.file.close()
+
+    def abort(self) -> None:
+        self.file.close()
+        os.remove(self.path)
+
+"""
+
+Name: XlsxWriter
+Type: class
+Description: Appends chunks to an openpyxl write-only workbook, which streams
+rows to disk instead of holding cells in memory. Starts a new sheet whenever
+one fills up.
+
+"""
+
+class XlsxWriter:
+    def __init__(self, path: str):
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise ImportError("XLSX export requires openpyxl (pip install openpyxl)") from e
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+
+    def _new_sheet(self) -> None:
+        n = len(self.workbook.worksheets)
+        self.sheet = self.workbook.create_sheet("FMECA" if n == 0 else f"FMECA ({n + 1})")
+        self.sheet.append(EXPORT_COLUMNS)
+        self.sheet_rows = 0
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        for row in chunk.itertuples(index=False, name=None):
+            if self.sheet is None or self.sheet_rows == XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self) -> None:
+        if self.sheet is None:
+            self._new_sheet()
+        self.workbook.save(self.path)
+
+    def abort(self) -> None:
+        # Nothing reaches the path until save()
+        pass
+
+"""
+
+Name: ParquetWriter
+Type: class
+Description: Appends each chunk to a Parquet file as a row group.
+
+"""
+
+class ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from e
+        self.path = path
+        self.pa = pa
+        self.schema = pa.schema(
+            [("component", pa.string()), ("failure_mode", pa.string())]
+            + [(column, pa.int64()) for column in EXPORT_COLUMNS[2:9]]
+            + [(column, pa.float64()) for column in EXPORT_COLUMNS[9:]]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        self.writer.write_table(self.pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False))
+
+    def close(self) -> None:
+        self.writer.close()
+
+    def abort(self) -> None:
+        self.writer.close()
+        os.remove(self.path)
+
+_WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "parquet": ParquetWriter}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exports the FMECA worksheet from part_info.db")
+    parser.add_argument("output", help="output file (.csv, .xlsx or .parquet)")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "part_info.db"))
+    parser.add_argument("--table", default="local_comp_fails", choices=COMP_FAIL_TABLES)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} rows", end="", file=sys.stderr)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        n_rows = export_worksheet(conn, args.output, args.table, args.chunksize, progress)
+    finally:
+        conn.close()
+    print(f"\nExported {n_rows} rows to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
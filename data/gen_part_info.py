@@ -3,12 +3,356 @@
 # @brief Generates a normalized SQL database based on part_info.csv
 
 import os
+import sys
+import time
+import argparse
 import sqlite3
 import pandas as pd
+from .migrate import RPN_COLUMN_DDL, COMP_FAIL_COLUMNS, SCHEMA_VERSION, DIST_PARAMS_DDL, MODEL_SELECTION_DDL, FIT_TABLES, rpn_indexes, migrate
 
-def main():
-    db_path = os.path.dirname(os.path.abspath(__file__))
-    whole_df = pd.read_csv(os.path.join(db_path, "part_info.csv"))
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(DATA_DIR, "part_info.csv")
+DB_PATH = os.path.join(DATA_DIR, "part_info.db")
+
+# Rows per CSV chunk in bulk mode
+DEFAULT_CHUNKSIZE = 50_000
+
+COMPONENTS_DDL = """
+CREATE TABLE components (
+    id INT PRIMARY KEY,
+    name TEXT
+)
+"""
+
+FAIL_MODES_DDL = """
+CREATE TABLE fail_modes (
+    id INT PRIMARY KEY,
+    desc TEXT
+)
+"""
+
+# Shared by comp_fails (defaults) and local_comp_fails (analyst edits)
+COMP_FAILS_DDL = """
+CREATE TABLE {table} (
+    cf_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    comp_id INT NOT NULL,
+    fail_id INT NOT NULL,
+    frequency INT DEFAULT 1,
+    severity INT DEFAULT 1,
+    detection INT DEFAULT 1,
+    lower_bound REAL DEFAULT 0,
+    best_estimate REAL DEFAULT 0,
+    upper_bound REAL DEFAULT 0,
+    mission_time REAL DEFAULT 1,
+    {rpn},
+    FOREIGN KEY(comp_id) REFERENCES components(id),
+    FOREIGN KEY(fail_id) REFERENCES fail_modes(id)
+)
+"""
+
+# Generated columns can't be inserted into, so copies name their columns
+COPY_TO_LOCAL_QUERY = f"""
+INSERT INTO local_comp_fails ({", ".join(COMP_FAIL_COLUMNS)})
+SELECT {", ".join(COMP_FAIL_COLUMNS)} FROM comp_fails
+"""
+
+# Natural key of a comp_fails row: (component name, failure mode description)
+CATALOG_KEY = ["Component", "Failure Mode"]
+
+# CSV columns that carry catalog defaults into comp_fails
+CATALOG_VALUE_COLUMNS = {
+    "Frequency": "frequency",
+    "Severity": "severity",
+    "Detection": "detection",
+    "Lower Bound": "lower_bound",
+    "Best Estimate": "best_estimate",
+    "Upper Bound": "upper_bound",
+    "Mission Time": "mission_time",
+}
+
+# Schema defaults, used for missing and invalid CSV values (see clean_catalog)
+CATALOG_DEFAULTS = {
+    "frequency": 1,
+    "severity": 1,
+    "detection": 1,
+    "lower_bound": 0.0,
+    "best_estimate": 0.0,
+    "upper_bound": 0.0,
+    "mission_time": 1.0,
+}
+
+"""
+Renames a chunk of catalog rows' value columns to their comp_fails names and
+coerces them to valid values, the same way for every load path: missing or
+non-numeric values and out-of-range F/S/D take the schema default, as do a
+row's LB/BE/UB together unless 0 <= LB <= BE <= UB, and a mission time that
+isn't positive.
+"""
+
+def clean_catalog(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk.rename(columns=CATALOG_VALUE_COLUMNS)
+    for column, default in CATALOG_DEFAULTS.items():
+        if column not in chunk.columns:
+            chunk[column] = default
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").fillna(default)
+    for column in ("frequency", "severity", "detection"):
+        valid = chunk[column].between(1, 10)
+        chunk[column] = chunk[column].where(valid, CATALOG_DEFAULTS[column]).astype(int)
+    bounds = ["lower_bound", "best_estimate", "upper_bound"]
+    ordered = (
+        (chunk["lower_bound"] >= 0)
+        & (chunk["lower_bound"] <= chunk["best_estimate"])
+        & (chunk["best_estimate"] <= chunk["upper_bound"])
+    )
+    chunk.loc[~ordered, bounds] = [CATALOG_DEFAULTS[column] for column in bounds]
+    chunk["mission_time"] = chunk["mission_time"].where(chunk["mission_time"] > 0, CATALOG_DEFAULTS["mission_time"])
+    return chunk
+
+# Catalog CSV columns to read: the natural key and whichever value columns the file has
+def catalog_columns(csv_path=CSV_PATH) -> list:
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return CATALOG_KEY + [c for c in CATALOG_VALUE_COLUMNS if c in header]
+
+INSERT_COMP_FAILS_QUERY = f"""
+INSERT INTO comp_fails (comp_id, fail_id, {", ".join(CATALOG_DEFAULTS)})
+VALUES (?, ?, {", ".join("?" * len(CATALOG_DEFAULTS))})
+"""
+
+"""
+Streams the CSV into the database in a single transaction.
+
+The CSV is read twice in chunks: once (Component/Failure Mode columns only)
+to collect the sorted id spaces, and once to insert comp_fails rows via
+executemany with dict-based id lookup, values cleaned as in sync
+(clean_catalog). local_comp_fails is copied from
+comp_fails inside SQLite rather than re-inserted from Python.
+Returns the number of comp_fails rows written.
+"""
+
+def bulk_ingest(csv_path=CSV_PATH, db_path=DB_PATH, chunksize=DEFAULT_CHUNKSIZE, verbose=False):
+    start = time.perf_counter()
+    comp_names, fail_descs = set(), set()
+    for chunk in pd.read_csv(csv_path, usecols=CATALOG_KEY, chunksize=chunksize):
+        comp_names.update(chunk["Component"].unique())
+        fail_descs.update(chunk["Failure Mode"].unique())
+
+    comp_ids = {name: i for i, name in enumerate(sorted(comp_names))}
+    fail_ids = {desc: i for i, desc in enumerate(sorted(fail_descs))}
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    n_rows = 0
+    try:
+        with conn:
+            for table in ("model_selection", "dist_params", "local_comp_fails", "comp_fails", "fail_modes", "components"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(COMPONENTS_DDL)
+            conn.execute(FAIL_MODES_DDL)
+            conn.execute(COMP_FAILS_DDL.format(table="comp_fails", rpn=RPN_COLUMN_DDL))
+            conn.execute(COMP_FAILS_DDL.format(table="local_comp_fails", rpn=RPN_COLUMN_DDL))
+
+            conn.executemany(
+                "INSERT INTO components (id, name) VALUES (?, ?)",
+                ((i, name) for name, i in comp_ids.items()),
+            )
+            conn.executemany(
+                "INSERT INTO fail_modes (id, desc) VALUES (?, ?)",
+                ((i, desc) for desc, i in fail_ids.items()),
+            )
+
+            for chunk in pd.read_csv(csv_path, usecols=catalog_columns(csv_path), chunksize=chunksize):
+                chunk = clean_catalog(chunk)
+                chunk["Component"] = chunk["Component"].map(comp_ids)
+                chunk["Failure Mode"] = chunk["Failure Mode"].map(fail_ids)
+                conn.executemany(
+                    INSERT_COMP_FAILS_QUERY,
+                    chunk[CATALOG_KEY + list(CATALOG_DEFAULTS)].itertuples(index=False, name=None),
+                )
+                n_rows += len(chunk.index)
+
+            conn.execute(COPY_TO_LOCAL_QUERY)
+            for table in ("comp_fails", "local_comp_fails"):
+                for query in rpn_indexes(table):
+                    conn.execute(query)
+            conn.execute(DIST_PARAMS_DDL)
+            conn.execute(MODEL_SELECTION_DDL)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        if verbose:
+            for table in ("components", "fail_modes", "comp_fails", "local_comp_fails"):
+                for row in conn.execute(f"SELECT * FROM {table}"):
+                    print(row)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Ingested {n_rows} rows in {elapsed:.3f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+    return n_rows
+
+"""
+Reads the catalog CSV in chunks into one row per natural key, with the
+value columns cleaned by clean_catalog.
+"""
+
+def read_catalog(csv_path=CSV_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    usecols = catalog_columns(csv_path)
+    chunks = [clean_catalog(chunk) for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize)]
+    catalog = pd.concat(chunks, ignore_index=True) if chunks else clean_catalog(pd.DataFrame(columns=usecols))
+    catalog = catalog.drop_duplicates(subset=CATALOG_KEY, keep="last")
+    return catalog.reset_index(drop=True)
+
+"""
+Incrementally syncs the catalog CSV into an existing database.
+
+Rows are matched on (component name, failure mode description). Only new,
+changed and removed catalog rows are written, in one transaction:
+  - new rows are inserted into comp_fails and copied into local_comp_fails,
+  - changed catalog values are updated in comp_fails only,
+  - removed rows are deleted from both tables (and their fits from
+    FIT_TABLES), along with components and failure modes the catalog no
+    longer mentions,
+  - rows duplicating a natural key already in the database (e.g. written by
+    rebuild(), which doesn't dedupe) are retired the same way, keeping the
+    lowest cf_id, and reported.
+Existing local_comp_fails rows are never overwritten, so analyst edits survive.
+New components and failure modes get ids after the current maximum.
+Returns a dict of change counts.
+"""
+
+def sync(csv_path=CSV_PATH, db_path=DB_PATH, chunksize=DEFAULT_CHUNKSIZE, verbose=False):
+    if not os.path.isfile(db_path):
+        n_rows = bulk_ingest(csv_path, db_path, chunksize, verbose)
+        return {"inserted": n_rows, "updated": 0, "retired": 0, "duplicates": 0}
+
+    start = time.perf_counter()
+    catalog = read_catalog(csv_path, chunksize)
+    value_cols = list(CATALOG_DEFAULTS)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        migrate(conn)
+        comp_ids = dict(conn.execute("SELECT name, id FROM components"))
+        fail_ids = dict(conn.execute("SELECT desc, id FROM fail_modes"))
+        rows = pd.read_sql_query(
+            f"""
+            SELECT cf.cf_id, c.name AS "Component", f.desc AS "Failure Mode",
+                   {", ".join("cf." + c for c in value_cols)}
+            FROM comp_fails cf
+            JOIN components c ON c.id = cf.comp_id
+            JOIN fail_modes f ON f.id = cf.fail_id
+            ORDER BY cf.cf_id
+            """,
+            conn,
+        )
+        # The lowest cf_id of each natural key is synced; any others are retired
+        extra = rows.duplicated(subset=CATALOG_KEY, keep="first")
+        duplicates = rows[extra]
+        current = rows[~extra]
+
+        diff = catalog.merge(
+            current, on=CATALOG_KEY, how="outer", suffixes=("", "_db"), indicator=True
+        )
+        inserted = diff[diff["_merge"] == "left_only"]
+        retired = diff[diff["_merge"] == "right_only"]
+        matched = diff[diff["_merge"] == "both"]
+        changed = (
+            matched[value_cols].to_numpy(dtype=float)
+            != matched[[c + "_db" for c in value_cols]].to_numpy(dtype=float)
+        ).any(axis=1)
+        updated = matched[changed]
+
+        new_comps = sorted(set(inserted["Component"]) - comp_ids.keys())
+        new_fails = sorted(set(inserted["Failure Mode"]) - fail_ids.keys())
+        next_comp = max(comp_ids.values(), default=-1) + 1
+        next_fail = max(fail_ids.values(), default=-1) + 1
+        comp_ids.update({name: next_comp + i for i, name in enumerate(new_comps)})
+        fail_ids.update({desc: next_fail + i for i, desc in enumerate(new_fails)})
+
+        gone_comps = set(comp_ids) - set(catalog["Component"])
+        gone_fails = set(fail_ids) - set(catalog["Failure Mode"])
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO components (id, name) VALUES (?, ?)",
+                ((comp_ids[name], name) for name in new_comps),
+            )
+            conn.executemany(
+                "INSERT INTO fail_modes (id, desc) VALUES (?, ?)",
+                ((fail_ids[desc], desc) for desc in new_fails),
+            )
+
+            if len(inserted.index):
+                (last_cf_id,) = conn.execute(
+                    "SELECT COALESCE(MAX(cf_id), 0) FROM comp_fails"
+                ).fetchone()
+                conn.executemany(
+                    INSERT_COMP_FAILS_QUERY,
+                    (
+                        (comp_ids[row[0]], fail_ids[row[1]], *row[2:])
+                        for row in inserted[CATALOG_KEY + value_cols].itertuples(index=False)
+                    ),
+                )
+                conn.execute(COPY_TO_LOCAL_QUERY + " WHERE cf_id > ?", (last_cf_id,))
+
+            conn.executemany(
+                f"""
+                UPDATE comp_fails
+                SET {", ".join(c + " = ?" for c in value_cols)}
+                WHERE cf_id = ?
+                """,
+                (
+                    (*row[:-1], int(row[-1]))
+                    for row in updated[value_cols + ["cf_id"]].itertuples(index=False)
+                ),
+            )
+
+            retired_ids = [(int(cf_id),) for cf_id in pd.concat([retired["cf_id"], duplicates["cf_id"]])]
+            # Fits of retired rows go first, or their foreign keys block the delete
+            for table in FIT_TABLES:
+                conn.executemany(f"DELETE FROM {table} WHERE cf_id = ?", retired_ids)
+            conn.executemany("DELETE FROM local_comp_fails WHERE cf_id = ?", retired_ids)
+            conn.executemany("DELETE FROM comp_fails WHERE cf_id = ?", retired_ids)
+            conn.executemany(
+                "DELETE FROM components WHERE id = ?",
+                ((comp_ids[name],) for name in gone_comps),
+            )
+            conn.executemany(
+                "DELETE FROM fail_modes WHERE id = ?",
+                ((fail_ids[desc],) for desc in gone_fails),
+            )
+    finally:
+        conn.close()
+
+    counts = {
+        "inserted": len(inserted.index),
+        "updated": len(updated.index),
+        "retired": len(retired.index),
+        "duplicates": len(duplicates.index),
+    }
+    elapsed = time.perf_counter() - start
+    print(
+        f"Synced in {elapsed:.3f}s: {counts['inserted']} inserted, "
+        f"{counts['updated']} updated, {counts['retired']} retired",
+        file=sys.stderr,
+    )
+    if counts["duplicates"]:
+        print(
+            f"Retired {counts['duplicates']} duplicate rows (cf_id "
+            f"{', '.join(str(cf_id) for cf_id in duplicates['cf_id'])}) of "
+            f"{duplicates[CATALOG_KEY].drop_duplicates().shape[0]} natural keys",
+            file=sys.stderr,
+        )
+    if verbose:
+        for kind, frame in (("+", inserted), ("~", updated), ("-", retired), ("=", duplicates)):
+            for row in frame[CATALOG_KEY].itertuples(index=False):
+                print(kind, tuple(row))
+    return counts
+
+def rebuild():
+    db_path = DATA_DIR
+    whole_df = clean_catalog(pd.read_csv(os.path.join(db_path, "part_info.csv")))
     conn = sqlite3.connect(os.path.join(db_path, "part_info.db"))
 
     def exec_SQL(conn, query):
@@ -28,20 +372,15 @@ def main():
     comps = whole_df["Component"].drop_duplicates().reset_index(drop=True)
     comps = pd.Series(sorted(comps))
 
+    exec_SQL(conn, "DROP TABLE IF EXISTS model_selection")
+    exec_SQL(conn, "DROP TABLE IF EXISTS dist_params")
     exec_SQL(conn, "DROP TABLE IF EXISTS local_comp_fails")
     exec_SQL(conn, "DROP TABLE IF EXISTS comp_fails")
     exec_SQL(conn, "DROP TABLE IF EXISTS fail_modes")
     exec_SQL(conn, "DROP TABLE IF EXISTS components")
 
     def comp_setup():
-        query = """
-        CREATE TABLE components (
-            id INT PRIMARY KEY,
-            name TEXT
-            )
-        """
-
-        exec_SQL(conn, query)
+        exec_SQL(conn, COMPONENTS_DDL)
 
         for i, e in enumerate(comps):
             query = f"INSERT INTO components (id, name) VALUES ({i}, '{e}')"
@@ -50,14 +389,7 @@ def main():
         all_rows_select(conn, "SELECT * FROM components")
 
     def fail_setup():
-        query = """
-        CREATE TABLE fail_modes (
-            id INT PRIMARY KEY,
-            desc TEXT
-        )
-        """
-
-        exec_SQL(conn, query)
+        exec_SQL(conn, FAIL_MODES_DDL)
 
         for i, e in enumerate(fails):
             query = f"INSERT INTO fail_modes (id, desc) VALUES ({i}, '{e}')"
@@ -69,64 +401,32 @@ def main():
         comp_fails_srs = whole_df[["Component", "Failure Mode"]].drop_duplicates().reset_index(drop=True)
         comp_fails_srs = comp_fails_srs.sort_values(by=["Component", "Failure Mode"])
 
-        query = """
-        CREATE TABLE comp_fails (
-            cf_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            comp_id INT NOT NULL,
-            fail_id INT NOT NULL,
-            frequency INT DEFAULT 1,
-            severity INT DEFAULT 1,
-            detection INT DEFAULT 1,
-            lower_bound REAL DEFAULT 0,
-            best_estimate REAL DEFAULT 0,
-            upper_bound REAL DEFAULT 0,
-            mission_time REAL DEFAULT 1,
-            FOREIGN KEY(comp_id) REFERENCES components(id),
-            FOREIGN KEY(fail_id) REFERENCES fail_modes(id)
-        )
-        """
-
-        exec_SQL(conn, query)
+        exec_SQL(conn, COMP_FAILS_DDL.format(table="comp_fails", rpn=RPN_COLUMN_DDL))
 
         for _, row in whole_df.iterrows():
             comp_id = comps[comps == row["Component"]].index.astype(int)
             comp_id = sum(comp_id)
             fail_id = fails[fails == row["Failure Mode"]].index.astype(int)
             fail_id = sum(fail_id)
+            values = ", ".join(str(row[column]) for column in CATALOG_DEFAULTS)
             query = f"""
-            INSERT INTO comp_fails (comp_id, fail_id)
-            VALUES ({comp_id}, {fail_id})"""
+            INSERT INTO comp_fails (comp_id, fail_id, {", ".join(CATALOG_DEFAULTS)})
+            VALUES ({comp_id}, {fail_id}, {values})"""
             exec_SQL(conn, query)
 
         all_rows_select(conn, "SELECT * FROM comp_fails")
 
-        query = """
-        CREATE TABLE local_comp_fails (
-            cf_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            comp_id INT NOT NULL,
-            fail_id INT NOT NULL,
-            frequency INT DEFAULT 1,
-            severity INT DEFAULT 1,
-            detection INT DEFAULT 1,
-            lower_bound REAL DEFAULT 0,
-            best_estimate REAL DEFAULT 0,
-            upper_bound REAL DEFAULT 0,
-            mission_time REAL DEFAULT 1,
-            FOREIGN KEY(comp_id) REFERENCES components(id),
-            FOREIGN KEY(fail_id) REFERENCES fail_modes(id)
-        )
-        """
-
-        exec_SQL(conn, query)
+        exec_SQL(conn, COMP_FAILS_DDL.format(table="local_comp_fails", rpn=RPN_COLUMN_DDL))
 
         for _, row in whole_df.iterrows():
             comp_id = comps[comps == row["Component"]].index.astype(int)
             comp_id = sum(comp_id)
             fail_id = fails[fails == row["Failure Mode"]].index.astype(int)
             fail_id = sum(fail_id)
+            values = ", ".join(str(row[column]) for column in CATALOG_DEFAULTS)
             query = f"""
-            INSERT INTO local_comp_fails (comp_id, fail_id)
-            VALUES ({comp_id}, {fail_id})"""
+            INSERT INTO local_comp_fails (comp_id, fail_id, {", ".join(CATALOG_DEFAULTS)})
+            VALUES ({comp_id}, {fail_id}, {values})"""
             exec_SQL(conn, query)
 
         all_rows_select(conn, "SELECT * FROM local_comp_fails")
@@ -135,5 +435,33 @@ def main():
     fail_setup()
     comp_fails_setup()
 
+    for table in ("comp_fails", "local_comp_fails"):
+        for query in rpn_indexes(table):
+            exec_SQL(conn, query)
+    exec_SQL(conn, DIST_PARAMS_DDL)
+    exec_SQL(conn, MODEL_SELECTION_DDL)
+    exec_SQL(conn, f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates part_info.db from part_info.csv")
+    parser.add_argument("--bulk", action="store_true",
+                        help="stream the CSV in chunks and load it in one transaction")
+    parser.add_argument("--sync", action="store_true",
+                        help="apply only catalog changes to an existing database, keeping local edits")
+    parser.add_argument("--csv", default=CSV_PATH, help="source CSV (bulk/sync mode)")
+    parser.add_argument("--db", default=DB_PATH, help="target database (bulk/sync mode)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per CSV chunk (bulk/sync mode)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="don't dump table contents or changed rows (bulk/sync mode)")
+    args = parser.parse_args(argv)
+
+    if args.sync:
+        sync(args.csv, args.db, args.chunksize, verbose=not args.quiet)
+    elif args.bulk:
+        bulk_ingest(args.csv, args.db, args.chunksize, verbose=not args.quiet)
+    else:
+        rebuild()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,316 @@
+# @file importer.py
+# @brief Validates FMECA worksheets (CSV/XLSX) in chunks and writes them into local_comp_fails
+
+import os
+import sys
+import sqlite3
+import argparse
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from .journal import SAVED_COLUMNS, UPDATE_QUERY
+from .migrate import migrate
+
+DEFAULT_CHUNKSIZE = 50_000
+
+FSD_COLUMNS = ("frequency", "severity", "detection")
+BOUND_COLUMNS = ("lower_bound", "best_estimate", "upper_bound")
+
+# Headers other than the column names themselves: the GUI's labels and part_info.csv's
+HEADER_ALIASES = {
+    "component": "component",
+    "failure mode": "failure_mode",
+    "failure modes": "failure_mode",
+    "desc": "failure_mode",
+    "detectability": "detection",
+    "lower bound (lb)": "lower_bound",
+    "best estimate (be)": "best_estimate",
+    "upper bound (ub)": "upper_bound",
+}
+
+KEY_COLUMNS = ("cf_id", "component", "failure_mode")
+
+# Rows an import can update: local_comp_fails rows with their comp_fails
+# default under the same cf_id, i.e. (component, failure mode) pairs in the catalog
+IMPORTABLE_ROWS_QUERY = f"""
+SELECT l.cf_id, l.comp_id, l.fail_id, {", ".join("l." + column for column in BOUND_COLUMNS)}
+FROM local_comp_fails l
+JOIN comp_fails c ON c.cf_id = l.cf_id
+ORDER BY l.cf_id DESC
+"""
+
+RowError = namedtuple("RowError", ["line", "column", "message"])
+
+"""
+
+Name: ImportReport
+Type: class
+Description: Outcome of an import: how many rows were read and updated, and
+one RowError per rejected value (line numbers count the header as line 1).
+Rows with any error are skipped; the rest are still imported.
+
+"""
+
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def rejected(self) -> int:
+        return len({error.line for error in self.errors})
+
+    def __str__(self):
+        return f"{self.rows_read} rows read: {self.updated} updated, {self.rejected} rejected"
+
+    def error_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.errors, columns=RowError._fields)
+
+    def write_errors(self, path: str) -> None:
+        self.error_frame().to_csv(path, index=False)
+
+def _column_name(header) -> str:
+    name = str(header).strip().lower()
+    return HEADER_ALIASES.get(name, name.replace(" ", "_"))
+
+"""
+Yields the worksheet as DataFrames of at most chunksize rows, with headers
+normalized to column names and every cell as read (text is not converted).
+"""
+
+def read_chunks(path: str, chunksize=DEFAULT_CHUNKSIZE):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            yield chunk.rename(columns=_column_name)
+    elif ext == ".xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ImportError("XLSX import requires openpyxl (pip install openpyxl)") from e
+        # Read-only mode streams rows from the file instead of loading the sheet
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [_column_name(cell) for cell in next(rows, ())]
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunksize:
+                    yield pd.DataFrame.from_records(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame.from_records(chunk, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"unsupported import format: {ext or path}")
+
+"""
+
+Name: _Resolver
+Type: class
+Description: Maps component names, failure mode descriptions and
+(comp_id, fail_id) pairs to ids, from lookups read once per import, and
+holds each importable row's stored LB/BE/UB so blank cells can be checked
+against the values they keep.
+
+"""
+
+class _Resolver:
+    def __init__(self, conn: sqlite3.Connection):
+        self.components = dict(conn.execute("SELECT name, id FROM components"))
+        self.fail_modes = dict(conn.execute("SELECT desc, id FROM fail_modes"))
+        rows = pd.read_sql_query(IMPORTABLE_ROWS_QUERY, conn)
+        # Descending order leaves the lowest cf_id for a duplicated pair
+        self.pairs = dict(zip(zip(rows["comp_id"].tolist(), rows["fail_id"].tolist()), rows["cf_id"].tolist()))
+        self.bounds = rows.set_index("cf_id")[list(BOUND_COLUMNS)].astype(np.float64)
+
+    def exists(self, cf_ids) -> np.ndarray:
+        return np.isin(cf_ids, self.bounds.index.to_numpy())
+
+    # Stored (LB, BE, UB) for each cf_id, NaN for unknown ones
+    def stored_bounds(self, cf_ids) -> np.ndarray:
+        return self.bounds.reindex(cf_ids).to_numpy()
+
+    # Records bounds just written, so later chunks are checked against them
+    def update_bounds(self, cf_ids, bounds) -> None:
+        written = pd.DataFrame(bounds, index=cf_ids, columns=self.bounds.columns)
+        written = written[~written.index.duplicated(keep="last")]
+        self.bounds.loc[written.index] = written
+
+def _numeric(chunk: pd.DataFrame, column: str):
+    if column not in chunk.columns:
+        n = len(chunk.index)
+        return np.full(n, np.nan), np.ones(n, dtype=bool)
+    raw = chunk[column]
+    blank = (raw.isna() | (raw.astype(str).str.strip() == "")).to_numpy()
+    values = pd.to_numeric(raw.where(~blank), errors="coerce").to_numpy(np.float64)
+    return values, blank
+
+def _ids(chunk: pd.DataFrame, column: str, lookup: dict):
+    if column not in chunk.columns:
+        n = len(chunk.index)
+        return np.full(n, -1, dtype=np.int64), np.ones(n, dtype=bool)
+    names = chunk[column].astype(str).str.strip()
+    blank = (chunk[column].isna() | (names == "")).to_numpy()
+    ids = names.map(lookup).fillna(-1).to_numpy(np.int64)
+    return ids, blank
+
+"""
+Bounds each row leaves after its update, the file's values over the stored
+ones, and whether they're ordered LB <= BE <= UB. Rows repeating a cf_id build
+on the last earlier repeat that is written (not invalid), so those few are
+merged one at a time in file order.
+"""
+
+def _merged_bounds(cf_ids, given, stored, invalid):
+    merged = np.where(np.isnan(given), stored, given)
+    ordered = (merged[:, 0] <= merged[:, 1]) & (merged[:, 1] <= merged[:, 2])
+    repeated = pd.Series(cf_ids).duplicated(keep=False).to_numpy() & (cf_ids >= 0)
+    latest = {}
+    for i in np.flatnonzero(repeated):
+        previous = latest.get(cf_ids[i])
+        if previous is not None:
+            merged[i] = np.where(np.isnan(given[i]), previous, given[i])
+            ordered[i] = merged[i, 0] <= merged[i, 1] <= merged[i, 2]
+        if ordered[i] and not invalid[i]:
+            latest[cf_ids[i]] = merged[i]
+    return merged, ordered
+
+"""
+Checks a chunk with whole-column NumPy operations and appends its errors to
+the report. Every row must resolve to a catalog row, by cf_id or by component
+and failure mode. Bounds are ordered as they'll be stored: blank cells take
+the row's stored value. Returns the valid rows' cf_ids, their values (NaN for
+blanks) and their bounds after the update.
+"""
+
+def _validate(chunk: pd.DataFrame, first_line: int, resolver: _Resolver, report: ImportReport):
+    n = len(chunk.index)
+    checks = []
+
+    numbers, no_cf_id = _numeric(chunk, "cf_id")
+    comp_ids, no_comp = _ids(chunk, "component", resolver.components)
+    fail_ids, no_fail = _ids(chunk, "failure_mode", resolver.fail_modes)
+    named = ~no_comp & ~no_fail
+    checks.append((~no_cf_id & np.isnan(numbers), "cf_id", "not a number"))
+    checks.append((no_cf_id & ~named, "component", "needs cf_id or component and failure mode"))
+    checks.append((~no_comp & (comp_ids < 0), "component", "unknown component"))
+    checks.append((~no_fail & (fail_ids < 0), "failure_mode", "unknown failure mode"))
+
+    # Rows without a cf_id update the row for their (component, failure mode)
+    cf_ids = np.where(no_cf_id, -1, np.nan_to_num(numbers, nan=-1)).astype(np.int64)
+    by_pair = np.fromiter(
+        (resolver.pairs.get(pair, -1) for pair in zip(comp_ids.tolist(), fail_ids.tolist())),
+        dtype=np.int64,
+        count=n,
+    )
+    cf_ids = np.where(no_cf_id, by_pair, cf_ids)
+    exists = resolver.exists(cf_ids)
+    checks.append((~np.isnan(numbers) & ~exists, "cf_id", "unknown cf_id"))
+    # New pairs would need a comp_fails default under the same cf_id; they come from the catalog (gen_part_info --sync)
+    checks.append((no_cf_id & named & (comp_ids >= 0) & (fail_ids >= 0) & ~exists,
+                   "failure_mode", "not in the catalog for this component"))
+
+    values = {}
+    for column in SAVED_COLUMNS:
+        column_values, blank = _numeric(chunk, column)
+        values[column] = column_values
+        checks.append((~blank & np.isnan(column_values), column, "not a number"))
+    for column in FSD_COLUMNS:
+        v = values[column]
+        checks.append((~np.isnan(v) & ((v < 1) | (v > 10) | (v != np.round(v))), column, "must be an integer from 1 to 10"))
+    for column in BOUND_COLUMNS:
+        checks.append((values[column] < 0, column, "must not be negative"))
+    checks.append((values["mission_time"] <= 0, "mission_time", "must be positive"))
+
+    invalid = np.zeros(n, dtype=bool)
+    for mask, _, _ in checks:
+        invalid |= mask
+    given = np.column_stack([values[column] for column in BOUND_COLUMNS])
+    bounds, ordered = _merged_bounds(cf_ids, given, resolver.stored_bounds(cf_ids), invalid)
+    # Only rows that resolved are ordered; the others already have an error
+    unordered = exists & ~ordered
+    lower, best, upper = bounds.T
+    checks.append((unordered & (lower > best), "lower_bound", "must not exceed best_estimate"))
+    checks.append((unordered & (best > upper), "best_estimate", "must not exceed upper_bound"))
+    checks.append((unordered & (lower > upper), "lower_bound", "must not exceed upper_bound"))
+
+    errors = []
+    for mask, column, message in checks:
+        invalid |= mask
+        errors.extend(RowError(first_line + int(i), column, message) for i in np.flatnonzero(mask))
+    report.errors.extend(sorted(errors, key=lambda error: error.line))
+
+    valid = ~invalid
+    return cf_ids[valid], {column: column_values[valid] for column, column_values in values.items()}, bounds[valid]
+
+def _params(columns: dict) -> list:
+    # NaN (blank) -> NULL, which keeps the stored value
+    frame = pd.DataFrame(columns)
+    frame = frame.astype(object).where(frame.notna(), None)
+    for column in FSD_COLUMNS:
+        frame[column] = [None if v is None else int(v) for v in frame[column]]
+    return list(frame.itertuples(index=False, name=None))
+
+"""
+Reads a worksheet in chunks, validates each chunk and updates local_comp_fails
+with its valid rows, found by cf_id or by component and failure mode. Rows
+for pairs the catalog (comp_fails) doesn't have are rejected, since every
+local_comp_fails row shares its cf_id with a comp_fails default. Blank cells
+keep the stored value. Does not commit, so it can run as a WriterQueue job;
+use import_worksheet() to run it in a transaction of its own.
+progress(rows_read) is called after each chunk.
+"""
+
+def apply_import(conn: sqlite3.Connection, path: str, chunksize=DEFAULT_CHUNKSIZE, progress=None) -> ImportReport:
+    report = ImportReport()
+    resolver = _Resolver(conn)
+    first_line = 2
+    for chunk in read_chunks(path, chunksize):
+        if not any(column in chunk.columns for column in KEY_COLUMNS):
+            raise ValueError("worksheet needs a cf_id column or component and failure mode columns")
+        chunk = chunk.reset_index(drop=True)
+        cf_ids, values, bounds = _validate(chunk, first_line, resolver, report)
+
+        if len(cf_ids):
+            rows = _params(values)
+            conn.executemany(UPDATE_QUERY, [row + (int(cf_id),) for row, cf_id in zip(rows, cf_ids)])
+            resolver.update_bounds(cf_ids, bounds)
+            report.updated += len(cf_ids)
+
+        report.rows_read += len(chunk.index)
+        first_line += len(chunk.index)
+        if progress is not None:
+            progress(report.rows_read)
+    return report
+
+# Imports a worksheet in one transaction: everything valid is written, or nothing
+def import_worksheet(conn: sqlite3.Connection, path: str, chunksize=DEFAULT_CHUNKSIZE, progress=None) -> ImportReport:
+    with conn:
+        return apply_import(conn, path, chunksize, progress)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Imports an FMECA worksheet into local_comp_fails")
+    parser.add_argument("input", help="worksheet (.csv or .xlsx)")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "part_info.db"))
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--errors", help="write rejected values to this CSV")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        migrate(conn)
+        report = import_worksheet(conn, args.input, args.chunksize)
+    finally:
+        conn.close()
+    print(report, file=sys.stderr)
+    for error in report.errors[:20]:
+        print(f"  line {error.line}: {error.column} {error.message}", file=sys.stderr)
+    if args.errors:
+        report.write_errors(args.errors)
+
+if __name__ == "__main__":
+    main()
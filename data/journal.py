@@ -0,0 +1,144 @@
+# @file journal.py
+# @brief Change journal of unsaved local_comp_fails edits, keyed by cf_id
+
+import sqlite3
+import threading
+
+# Editable columns written back to local_comp_fails
+SAVED_COLUMNS = (
+    "frequency",
+    "severity",
+    "detection",
+    "lower_bound",
+    "best_estimate",
+    "upper_bound",
+    "mission_time",
+)
+
+# One statement for every dirty row: columns that weren't edited are bound as
+# NULL and keep their stored value.
+UPDATE_QUERY = f"""
+UPDATE local_comp_fails
+SET {", ".join(f"{column} = COALESCE(?, {column})" for column in SAVED_COLUMNS)}
+WHERE cf_id = ?
+"""
+
+RESET_QUERY = f"""
+UPDATE local_comp_fails
+SET ({", ".join(SAVED_COLUMNS)}) = (
+    SELECT {", ".join(SAVED_COLUMNS)} FROM comp_fails
+    WHERE comp_fails.cf_id = local_comp_fails.cf_id
+)
+"""
+
+"""
+
+Name: ChangeBatch
+Type: class
+Description: The edits taken out of a journal for one save.
+
+"""
+
+class ChangeBatch:
+    def __init__(self, changes: dict, reset: bool):
+        self.changes = changes
+        self.reset = reset
+
+    def __len__(self):
+        return len(self.changes)
+
+    # Runs the batch's statements (one executemany) without committing,
+    # e.g. as a WriterQueue job
+    def apply(self, conn: sqlite3.Connection) -> None:
+        rows = [
+            tuple(values.get(column) for column in SAVED_COLUMNS) + (cf_id,)
+            for cf_id, values in self.changes.items()
+        ]
+        if self.reset:
+            conn.execute(RESET_QUERY)
+        conn.executemany(UPDATE_QUERY, rows)
+
+    # Writes the batch to local_comp_fails in one transaction
+    def write(self, conn: sqlite3.Connection) -> None:
+        with conn:
+            self.apply(conn)
+
+"""
+
+Name: ChangeJournal
+Type: class
+Description: Records which cf_ids were edited (and to what) since the last save,
+so a save only touches those rows. Edits taken for a save stay visible through
+overlay() until the save is confirmed, and are put back if it fails. Thread-safe,
+so the batch can be written off the GUI thread.
+
+"""
+
+class ChangeJournal:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._in_flight = {}
+        self._reset_pending = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending) + (1 if self._reset_pending else 0)
+
+    @property
+    def reset_pending(self) -> bool:
+        with self._lock:
+            return self._reset_pending
+
+    def record(self, cf_id, column: str, value) -> None:
+        if column not in SAVED_COLUMNS:
+            raise ValueError(f"column is not editable: {column}")
+        with self._lock:
+            self._pending.setdefault(int(cf_id), {})[column] = value
+
+    # Drops unsaved edits; the next save copies comp_fails over local_comp_fails first
+    def reset_to_defaults(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._reset_pending = True
+
+    # Moves the pending edits into a batch to be written
+    def take(self) -> ChangeBatch:
+        with self._lock:
+            batch = ChangeBatch(self._pending, self._reset_pending)
+            self._in_flight = self._pending
+            self._pending = {}
+            self._reset_pending = False
+            return batch
+
+    def confirm(self, batch: ChangeBatch) -> None:
+        with self._lock:
+            if self._in_flight is batch.changes:
+                self._in_flight = {}
+
+    # Puts a failed batch back, without overwriting edits made since it was taken
+    def restore(self, batch: ChangeBatch) -> None:
+        with self._lock:
+            # A reset since the batch was taken has discarded these edits anyway
+            if not self._reset_pending:
+                for cf_id, values in batch.changes.items():
+                    merged = dict(values)
+                    merged.update(self._pending.get(cf_id, {}))
+                    self._pending[cf_id] = merged
+                self._reset_pending = batch.reset
+            if self._in_flight is batch.changes:
+                self._in_flight = {}
+
+    # Overlays unsaved edits onto freshly read rows (a store.ComponentView,
+    # whose set_value updates RPN)
+    def overlay(self, rows) -> None:
+        with self._lock:
+            edits = [
+                (cf_id, values)
+                for changes in (self._in_flight, self._pending)
+                for cf_id, values in changes.items()
+                if cf_id in rows
+            ]
+        for cf_id, values in edits:
+            for column, value in values.items():
+                rows.set_value(cf_id, column, value)
@@ -0,0 +1,113 @@
+# @file migrate.py
+# @brief Upgrades existing part_info.db files to the current schema
+
+import os
+import sys
+import sqlite3
+
+# Stored in PRAGMA user_version
+SCHEMA_VERSION = 3
+
+COMP_FAIL_TABLES = ("comp_fails", "local_comp_fails")
+
+# RPN = Frequency * Severity * Detection, computed by SQLite. VIRTUAL so that
+# existing tables can gain it with ALTER TABLE; the indexes hold the values.
+RPN_COLUMN_DDL = "rpn INT GENERATED ALWAYS AS (frequency * severity * detection) VIRTUAL"
+
+# Writable comp_fails columns, in table order (for copies between tables)
+COMP_FAIL_COLUMNS = (
+    "cf_id",
+    "comp_id",
+    "fail_id",
+    "frequency",
+    "severity",
+    "detection",
+    "lower_bound",
+    "best_estimate",
+    "upper_bound",
+    "mission_time",
+)
+
+# Fitted distribution parameters per local_comp_fails row, written by precompute.py.
+# input_hash identifies the LB/BE/UB (and fit version) they were fitted to.
+DIST_PARAMS_DDL = """
+CREATE TABLE IF NOT EXISTS dist_params (
+    cf_id INTEGER PRIMARY KEY,
+    input_hash INT NOT NULL,
+    weibull_k REAL,
+    weibull_lam REAL,
+    weibull_residual REAL,
+    weibull_iterations INT,
+    weibull_converged INT,
+    rayleigh_sigma REAL,
+    rayleigh_residual REAL,
+    FOREIGN KEY(cf_id) REFERENCES local_comp_fails(cf_id)
+)
+"""
+
+# Best-scoring distribution per local_comp_fails row (see stats.select_model_batch),
+# written by precompute.py. shape is NULL for one-parameter distributions.
+MODEL_SELECTION_DDL = """
+CREATE TABLE IF NOT EXISTS model_selection (
+    cf_id INTEGER PRIMARY KEY,
+    input_hash INT NOT NULL,
+    distribution TEXT NOT NULL,
+    shape REAL,
+    scale REAL,
+    residual REAL,
+    score REAL,
+    FOREIGN KEY(cf_id) REFERENCES local_comp_fails(cf_id)
+)
+"""
+
+# Tables whose rows reference a local_comp_fails row; delete from these before deleting the row
+FIT_TABLES = ("model_selection", "dist_params")
+
+def rpn_indexes(table: str) -> tuple:
+    return (
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_rpn ON {table}(rpn)",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_comp_id_rpn ON {table}(comp_id, rpn)",
+    )
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    # table_xinfo, unlike table_info, lists generated columns
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+"""
+Brings a database up to SCHEMA_VERSION in one transaction. Safe to run on
+databases that are already current. Returns the version found before migrating.
+"""
+
+def migrate(conn: sqlite3.Connection) -> int:
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    with conn:
+        # 0 -> 1: generated rpn column with rpn and (comp_id, rpn) indexes
+        if version < 1:
+            for table in COMP_FAIL_TABLES:
+                if "rpn" not in _columns(conn, table):
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {RPN_COLUMN_DDL}")
+                for query in rpn_indexes(table):
+                    conn.execute(query)
+        # 1 -> 2: dist_params table
+        if version < 2:
+            conn.execute(DIST_PARAMS_DDL)
+        # 2 -> 3: model_selection table
+        if version < 3:
+            conn.execute(MODEL_SELECTION_DDL)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return version
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "part_info.db"
+    )
+    conn = sqlite3.connect(db_path)
+    old = migrate(conn)
+    print(f"{db_path}: schema version {old} -> {schema_version(conn)}")
+    conn.close()
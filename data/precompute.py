@@ -0,0 +1,241 @@
+# @file precompute.py
+# @brief Fits Weibull and Rayleigh parameters for every local_comp_fails row into dist_params,
+# and the best-scoring candidate distribution into model_selection
+
+import os
+import sys
+import time
+import hashlib
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from stats_and_charts.stats import Fit, fit_weibull_batch, fit_rayleigh_batch, select_model_batch, selection_fit
+from .migrate import migrate
+
+# Part of every input hash: bump when the fitting code changes results, so the next run refits everything
+FIT_VERSION = 1
+
+# Rows per work unit sent to a worker process
+DEFAULT_CHUNKSIZE = 20_000
+
+DIST_PARAMS_COLUMNS = (
+    "cf_id",
+    "input_hash",
+    "weibull_k",
+    "weibull_lam",
+    "weibull_residual",
+    "weibull_iterations",
+    "weibull_converged",
+    "rayleigh_sigma",
+    "rayleigh_residual",
+)
+
+MODEL_SELECTION_COLUMNS = (
+    "cf_id",
+    "input_hash",
+    "distribution",
+    "shape",
+    "scale",
+    "residual",
+    "score",
+)
+
+def _upsert_query(table, columns):
+    return f"""
+    INSERT INTO {table} ({", ".join(columns)})
+    VALUES ({", ".join("?" * len(columns))})
+    ON CONFLICT(cf_id) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in columns[1:])}
+    """
+
+UPSERT_QUERY = _upsert_query("dist_params", DIST_PARAMS_COLUMNS)
+SELECTION_UPSERT_QUERY = _upsert_query("model_selection", MODEL_SELECTION_COLUMNS)
+
+# Each row's bounds with the hashes of its stored fit and selection (NULL if it has none)
+STALE_SCAN_QUERY = """
+SELECT cf.cf_id, cf.lower_bound, cf.best_estimate, cf.upper_bound, dp.input_hash, ms.input_hash
+FROM local_comp_fails AS cf
+LEFT JOIN dist_params AS dp ON dp.cf_id = cf.cf_id
+LEFT JOIN model_selection AS ms ON ms.cf_id = cf.cf_id
+ORDER BY cf.cf_id
+"""
+
+PRUNE_QUERIES = tuple(
+    f"""
+    DELETE FROM {table}
+    WHERE cf_id NOT IN (SELECT cf_id FROM local_comp_fails)
+    """
+    for table in ("dist_params", "model_selection")
+)
+
+FETCH_QUERY = f"SELECT {', '.join(DIST_PARAMS_COLUMNS[1:])} FROM dist_params WHERE cf_id = ?"
+SELECTION_FETCH_QUERY = f"SELECT {', '.join(MODEL_SELECTION_COLUMNS[1:])} FROM model_selection WHERE cf_id = ?"
+
+# 64-bit hash of one row's LB/BE/UB and FIT_VERSION. The values are rounded to
+# float32 first, as the GUI's FmecaStore holds them, so its lookups match the
+# float64 values read here.
+def input_hashes(lb, be, ub) -> np.ndarray:
+    # + 0.0 turns -0.0 into 0.0 so equal bounds hash equally
+    values = np.stack([lb, be, ub], axis=-1).astype(np.float32) + np.float32(0.0)
+    salt = FIT_VERSION.to_bytes(4, "little")
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8, salt=salt).digest(), "little", signed=True)
+            for row in values
+        ),
+        dtype=np.int64,
+        count=len(values),
+    )
+
+# Work unit run in a worker process: every fit for one chunk of rows,
+# as dist_params rows and model_selection rows
+def _fit_chunk(cf_ids, hashes, lb, be, ub) -> tuple:
+    k, lam, converged, weibull_residual, iterations = fit_weibull_batch(lb, be, ub, full_output=True)
+    sigma, rayleigh_residual = fit_rayleigh_batch(lb, be, ub, full_output=True)
+    selection = select_model_batch(
+        lb, be, ub, fits={"weibull": ((k, lam), weibull_residual), "rayleigh": ((sigma,), rayleigh_residual)}
+    )
+    # NaN shapes (one-parameter winners) are stored as NULL
+    shape = [None if np.isnan(value) else value for value in selection.shape.tolist()]
+    params = list(
+        zip(
+            cf_ids.tolist(),
+            hashes.tolist(),
+            k.tolist(),
+            lam.tolist(),
+            weibull_residual.tolist(),
+            iterations.tolist(),
+            converged.astype(int).tolist(),
+            sigma.tolist(),
+            rayleigh_residual.tolist(),
+        )
+    )
+    selections = list(
+        zip(
+            cf_ids.tolist(),
+            hashes.tolist(),
+            selection.distribution.tolist(),
+            shape,
+            selection.scale.tolist(),
+            selection.residual.tolist(),
+            selection.score.tolist(),
+        )
+    )
+    return params, selections
+
+"""
+Fits every local_comp_fails row whose LB/BE/UB changed since its dist_params
+and model_selection rows were written (or that lacks one), across a process
+pool, and upserts the results. Each finished work unit is committed on its own, so an interrupted
+run keeps what it finished. Rows deleted from local_comp_fails lose their
+parameters. progress(rows_fitted, rows_stale) is called after each unit.
+Returns (rows_fitted, rows_total).
+"""
+
+def precompute(db_path: str, workers=None, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        migrate(conn)
+        with conn:
+            for query in PRUNE_QUERIES:
+                conn.execute(query)
+
+        # Find stale rows first, so the read isn't held open while writing
+        stale, n_rows = [], 0
+        cursor = conn.execute(STALE_SCAN_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            n_rows += len(rows)
+            block = np.array([row[:4] for row in rows], dtype=np.float64)
+            hashes = input_hashes(block[:, 1], block[:, 2], block[:, 3])
+            changed = np.zeros(len(rows), dtype=bool)
+            for column in (4, 5):
+                stored = np.array([row[column] if row[column] is not None else 0 for row in rows], dtype=np.int64)
+                has_fit = np.array([row[column] is not None for row in rows], dtype=bool)
+                changed |= ~has_fit | (hashes != stored)
+            if changed.any():
+                stale.append((block[changed, 0].astype(np.int64), hashes[changed], block[changed, 1:]))
+
+        n_stale = sum(len(cf_ids) for cf_ids, _, _ in stale)
+        done = 0
+        if n_stale:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # At most two units in flight per worker keeps memory bounded
+                limit = 2 * workers
+                pending = set()
+                units = iter(stale)
+                while True:
+                    for cf_ids, hashes, bounds in units:
+                        pending.add(executor.submit(_fit_chunk, cf_ids, hashes, *bounds.T))
+                        if len(pending) >= limit:
+                            break
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        params, selections = future.result()
+                        with conn:
+                            conn.executemany(UPSERT_QUERY, params)
+                            conn.executemany(SELECTION_UPSERT_QUERY, selections)
+                        done += len(params)
+                        if progress is not None:
+                            progress(done, n_stale)
+        return done, n_rows
+    finally:
+        conn.close()
+
+"""
+Returns the stored fit for a row if it was fitted to exactly these LB/BE/UB
+values, else None (never precomputed, or edited since).
+"""
+
+def stored_fit(conn: sqlite3.Connection, cf_id, distribution: str, values):
+    row = conn.execute(FETCH_QUERY, (int(cf_id),)).fetchone()
+    if row is None:
+        return None
+    lb, be, ub = np.asarray(values, dtype=np.float64)
+    if row[0] != int(input_hashes([lb], [be], [ub])[0]):
+        return None
+    _, k, lam, weibull_residual, iterations, converged, sigma, rayleigh_residual = row
+    if distribution == "weibull":
+        return Fit("weibull", (k, lam), weibull_residual, iterations, bool(converged))
+    if distribution == "rayleigh":
+        return Fit("rayleigh", (sigma,), rayleigh_residual, 0, True)
+    raise ValueError(f"unknown distribution: {distribution}")
+
+"""
+Returns the stored best-scoring distribution for a row as (Fit, score) if it
+was selected for exactly these LB/BE/UB values, else None.
+"""
+
+def stored_selection(conn: sqlite3.Connection, cf_id, values):
+    row = conn.execute(SELECTION_FETCH_QUERY, (int(cf_id),)).fetchone()
+    if row is None:
+        return None
+    lb, be, ub = np.asarray(values, dtype=np.float64)
+    if row[0] != int(input_hashes([lb], [be], [ub])[0]):
+        return None
+    _, distribution, shape, scale, residual, score = row
+    return selection_fit(distribution, shape, scale, residual), score
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomputes distribution parameters into dist_params")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "part_info.db"))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per work unit")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} rows fitted", end="", file=sys.stderr)
+
+    start = time.perf_counter()
+    fitted, total = precompute(args.db, args.workers, args.chunksize, progress)
+    elapsed = time.perf_counter() - start
+    print(f"\n{fitted} of {total} rows refitted in {elapsed:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
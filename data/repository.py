@@ -0,0 +1,256 @@
+# @file repository.py
+# @brief Indexed, query-based access to part_info.db for the GUI
+
+import sqlite3
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+import pandas as pd
+from .migrate import COMP_FAIL_TABLES, migrate
+from .store import FAIL_MODE_ROW_COLUMNS, ComponentView
+
+# One statement per table so sqlite3's statement cache keeps them prepared.
+# Rows are limited in cf_id order, then shown in failure mode order.
+FAIL_MODE_QUERIES = {
+    table: f"""
+    SELECT f.desc, cf.cf_id, cf.comp_id, cf.fail_id, cf.rpn,
+           cf.frequency, cf.severity, cf.detection,
+           cf.lower_bound, cf.best_estimate, cf.upper_bound, cf.mission_time
+    FROM (
+        SELECT * FROM {table} WHERE comp_id = ? ORDER BY cf_id LIMIT ?
+    ) AS cf
+    JOIN fail_modes AS f ON f.id = cf.fail_id
+    ORDER BY f.id, cf.cf_id
+    """
+    for table in COMP_FAIL_TABLES
+}
+
+# One component's rows in cf_id order, the layout ComponentView.from_records reads
+COMPONENT_QUERIES = {
+    table: f"""
+    SELECT f.desc, cf.cf_id, cf.comp_id, cf.fail_id,
+           cf.frequency, cf.severity, cf.detection,
+           cf.lower_bound, cf.best_estimate, cf.upper_bound, cf.mission_time
+    FROM {table} AS cf
+    JOIN fail_modes AS f ON f.id = cf.fail_id
+    WHERE cf.comp_id = ?
+    ORDER BY cf.cf_id
+    """
+    for table in COMP_FAIL_TABLES
+}
+
+ABOVE_THRESHOLD_QUERIES = {
+    table: f"""
+    SELECT f.desc, cf.cf_id, cf.comp_id, cf.fail_id, cf.rpn,
+           cf.frequency, cf.severity, cf.detection,
+           cf.lower_bound, cf.best_estimate, cf.upper_bound, cf.mission_time
+    FROM {table} AS cf
+    JOIN fail_modes AS f ON f.id = cf.fail_id
+    WHERE cf.rpn > ?
+    ORDER BY cf.rpn DESC
+    LIMIT ?
+    """
+    for table in COMP_FAIL_TABLES
+}
+
+CRITICALITY_RANKING_COLUMNS = (
+    "name",
+    "desc",
+    "cf_id",
+    "comp_id",
+    "fail_id",
+    "best_estimate",
+    "mission_time",
+    "alpha",
+    "mode_criticality",
+    "item_criticality",
+)
+
+# Failure modes by MIL-STD-1629A mode criticality (beta * alpha * lambda_p * t,
+# where alpha * lambda_p is the row's best_estimate), highest first.
+# Component sums are window functions over one scan.
+CRITICALITY_RANKING_QUERIES = {
+    table: f"""
+    SELECT c.name, f.desc, cf.cf_id, cf.comp_id, cf.fail_id,
+           cf.best_estimate, cf.mission_time,
+           COALESCE(cf.best_estimate / NULLIF(cf.part_failure_rate, 0), 0) AS alpha,
+           cf.mode_criticality,
+           SUM(cf.mode_criticality) OVER (PARTITION BY cf.comp_id) AS item_criticality
+    FROM (
+        SELECT *, :beta * best_estimate * mission_time AS mode_criticality,
+               SUM(best_estimate) OVER (PARTITION BY comp_id) AS part_failure_rate
+        FROM {table}
+    ) AS cf
+    JOIN components AS c ON c.id = cf.comp_id
+    JOIN fail_modes AS f ON f.id = cf.fail_id
+    ORDER BY cf.mode_criticality DESC, cf.cf_id
+    LIMIT :limit
+    """
+    for table in COMP_FAIL_TABLES
+}
+
+"""
+
+Name: PartRepository
+Type: class
+Description: Wraps a part_info.db connection, or borrows one per query from
+a storage.ReadPool (readers) so several threads can read at once. With a
+connection it migrates the schema and creates the comp_id indexes (prepare);
+pooled readers only read, so pass prepare as the Storage's setup. Keeps a
+component name -> id dict
+and returns one component's joined failure mode rows through a single
+prepared query. Given a current Snapshot, rows are read from it instead
+until the database file changes.
+
+"""
+
+class PartRepository:
+    INDEXES = tuple(
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_comp_id ON {table}(comp_id)"
+        for table in COMP_FAIL_TABLES
+    )
+
+    def __init__(self, conn: sqlite3.Connection = None, snapshot=None, readers=None):
+        if (conn is None) == (readers is None):
+            raise ValueError("give either a connection or a read pool")
+        self.conn = conn
+        self.readers = readers
+        self.snapshot = snapshot
+        if conn is not None:
+            self.prepare(conn)
+        self.refresh_components()
+
+    # Migrates the schema and creates the comp_id indexes, committing on conn
+    @classmethod
+    def prepare(cls, conn: sqlite3.Connection) -> None:
+        migrate(conn)
+        for query in cls.INDEXES:
+            conn.execute(query)
+        conn.commit()
+
+    # The connection to run a query on: the repository's own, or one borrowed from the pool
+    def connection(self):
+        return nullcontext(self.conn) if self.readers is None else self.readers.connection()
+
+    # Reloads the name -> id dict, e.g. after the catalog has been synced
+    def refresh_components(self) -> None:
+        with self.connection() as conn:
+            self.component_ids = dict(conn.execute("SELECT name, id FROM components ORDER BY rowid"))
+
+    def component_names(self) -> list:
+        return list(self.component_ids)
+
+    # Returns None for unknown names (e.g. the "Select a Component" placeholder)
+    def component_id(self, name: str):
+        return self.component_ids.get(name)
+
+    # Rows across all components with RPN above a threshold, highest first.
+    # Filtered and sorted by SQLite using the rpn index.
+    def above_threshold(self, threshold, table="local_comp_fails", limit=None) -> pd.DataFrame:
+        if table not in COMP_FAIL_TABLES:
+            raise ValueError(f"unknown failure mode table: {table}")
+        with self.connection() as conn:
+            rows = conn.execute(
+                ABOVE_THRESHOLD_QUERIES[table], (threshold, -1 if limit is None else limit)
+            ).fetchall()
+        return pd.DataFrame.from_records(rows, columns=FAIL_MODE_ROW_COLUMNS)
+
+    # Every failure mode ranked by criticality, computed by SQLite from the saved values
+    def criticality_ranking(self, table="local_comp_fails", limit=None, beta=1.0) -> pd.DataFrame:
+        if table not in COMP_FAIL_TABLES:
+            raise ValueError(f"unknown failure mode table: {table}")
+        with self.connection() as conn:
+            rows = conn.execute(
+                CRITICALITY_RANKING_QUERIES[table],
+                {"beta": beta, "limit": -1 if limit is None else limit},
+            ).fetchall()
+        return pd.DataFrame.from_records(rows, columns=CRITICALITY_RANKING_COLUMNS)
+
+    # Joined failure mode rows for one component; limit=None returns all of them
+    def failure_modes(self, comp_id, table="local_comp_fails", limit=None) -> pd.DataFrame:
+        if table not in FAIL_MODE_QUERIES:
+            raise ValueError(f"unknown failure mode table: {table}")
+        if comp_id is None:
+            return pd.DataFrame(columns=FAIL_MODE_ROW_COLUMNS)
+        if self.snapshot is not None:
+            if self.snapshot.is_current():
+                return self.snapshot.failure_modes(comp_id, table, limit)
+            # Written since the snapshot was taken (e.g. by a save): use SQLite from now on
+            self.snapshot = None
+        with self.connection() as conn:
+            rows = conn.execute(
+                FAIL_MODE_QUERIES[table], (comp_id, -1 if limit is None else limit)
+            ).fetchall()
+        return pd.DataFrame.from_records(rows, columns=FAIL_MODE_ROW_COLUMNS)
+
+    # One component's rows as compact arrays (see store.ComponentView), read from SQLite
+    def component(self, comp_id, table="local_comp_fails") -> ComponentView:
+        if table not in COMPONENT_QUERIES:
+            raise ValueError(f"unknown failure mode table: {table}")
+        if comp_id is None:
+            return ComponentView.from_records([])
+        with self.connection() as conn:
+            rows = conn.execute(COMPONENT_QUERIES[table], (comp_id,)).fetchall()
+        return ComponentView.from_records(rows)
+
+# Default number of components whose failure modes are kept in memory
+DEFAULT_CACHE_SIZE = 128
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+"""
+
+Name: FailureModeCache
+Type: class
+Description: Bounded LRU cache of per-component failure mode rows as
+store.ComponentViews, loaded on demand through repo.component(): one indexed
+query per component from a PartRepository, or a view of an FmecaStore.
+Cached views are edited in place. Unsaved edits are also kept in a
+ChangeJournal, which is re-applied whenever rows are (re)loaded, so evicting
+an edited component loses nothing.
+
+"""
+
+class FailureModeCache:
+    def __init__(self, repo, maxsize=DEFAULT_CACHE_SIZE, table="local_comp_fails", journal=None):
+        if maxsize < 1:
+            raise ValueError("cache size must be at least 1")
+        self.repo = repo
+        self.maxsize = maxsize
+        self.table = table
+        self.journal = journal
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    # Returns the cached rows for a component, fetching them on a miss
+    def get(self, comp_id) -> ComponentView:
+        if comp_id in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(comp_id)
+            return self._entries[comp_id]
+
+        self.misses += 1
+        rows = self.repo.component(comp_id, self.table)
+        if self.journal is not None:
+            self.journal.overlay(rows)
+        if comp_id is not None:
+            self._entries[comp_id] = rows
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return rows
+
+    # Drops the given components (all if None) so the next get re-reads them
+    def invalidate(self, comp_ids=None) -> None:
+        if comp_ids is None:
+            self._entries.clear()
+            return
+        for comp_id in comp_ids:
+            self._entries.pop(comp_id, None)
+
+    # Switches the source table, discarding everything cached from the old one
+    def reset(self, table: str) -> None:
+        self.table = table
+        self.invalidate()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
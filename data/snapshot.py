@@ -0,0 +1,197 @@
+# @file snapshot.py
+# @brief Columnar, memory-mapped snapshot of part_info.db for fast startup
+
+import os
+import json
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+from .migrate import SCHEMA_VERSION, COMP_FAIL_TABLES, schema_version
+from .storage import BUSY_TIMEOUT
+from .store import FAIL_MODE_ROW_COLUMNS, COLUMN_DTYPES, widen
+
+# Bumped whenever the on-disk layout below changes
+SNAPSHOT_FORMAT = 3
+
+# Every failure mode row column except the joined description
+COMP_FAIL_SNAPSHOT_COLUMNS = FAIL_MODE_ROW_COLUMNS[1:]
+
+META_FILE = "meta.json"
+
+def snapshot_dir(db_path: str) -> str:
+    return db_path + ".snapshot"
+
+# Copies committed WAL frames into the database file and empties the -wal file,
+# so the file holds everything committed. A no-op in rollback journal mode.
+def checkpoint(db_path: str) -> None:
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+# What a snapshot is keyed on: the database file's mtime/size, the -wal file's size
+# and the schema version. Taken right after a checkpoint, when the -wal file is
+# empty; any later commit adds frames to it. Its mtime is left out, since every
+# WAL-mode session touches the file without committing anything.
+def db_signature(db_path: str, version: int) -> dict:
+    stat = os.stat(db_path)
+    try:
+        wal_size = os.stat(db_path + "-wal").st_size
+    except FileNotFoundError:
+        wal_size = 0
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "schema_version": version,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "wal_size": wal_size,
+    }
+
+"""
+Writes one .npy file per column of the four tables next to the database.
+comp_fails rows are sorted by (comp_id, cf_id), in store.COLUMN_DTYPES (fail_id
+as int32), and an offsets array gives each component's slice. meta.json is written last and marks the snapshot valid;
+it isn't written if a commit lands while the tables are read, or if the WAL
+couldn't be emptied (a reader was in a transaction). Returns the snapshot
+directory.
+"""
+
+def build_snapshot(db_path: str) -> str:
+    directory = snapshot_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    checkpoint(db_path)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        # Read everything in one transaction so the arrays are consistent
+        conn.execute("BEGIN")
+        version = schema_version(conn)
+        signature = db_signature(db_path, version)
+
+        components = pd.read_sql_query("SELECT id, name FROM components ORDER BY rowid", conn)
+        _save(directory, "components.id", components["id"].to_numpy(np.int64))
+        _save(directory, "components.name", _fixed_width(components["name"]))
+
+        fail_modes = pd.read_sql_query("SELECT id, desc FROM fail_modes", conn)
+        # Dense id -> description lookup; gaps left by retired ids are empty
+        size = int(fail_modes["id"].max()) + 1 if len(fail_modes.index) else 0
+        descs = np.full(size, "", dtype=_fixed_width(fail_modes["desc"]).dtype)
+        descs[fail_modes["id"].to_numpy(np.int64)] = _fixed_width(fail_modes["desc"])
+        _save(directory, "fail_modes.desc", descs)
+
+        n_comps = int(components["id"].max()) + 1 if len(components.index) else 0
+        for table in COMP_FAIL_TABLES:
+            rows = pd.read_sql_query(
+                f"SELECT {', '.join(COMP_FAIL_SNAPSHOT_COLUMNS)} FROM {table} ORDER BY comp_id, cf_id",
+                conn,
+            )
+            for column in COMP_FAIL_SNAPSHOT_COLUMNS:
+                dtype = COLUMN_DTYPES.get(column, np.int32)
+                _save(directory, f"{table}.{column}", rows[column].to_numpy(dtype))
+            comp_ids = rows["comp_id"].to_numpy(np.int64)
+            offsets = np.searchsorted(comp_ids, np.arange(n_comps + 1), side="left")
+            _save(directory, f"{table}.offsets", offsets.astype(np.int64))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    if signature["wal_size"] or db_signature(db_path, version) != signature:
+        return directory
+    with open(meta_path, "w") as f:
+        json.dump(signature, f)
+    return directory
+
+def _fixed_width(values) -> np.ndarray:
+    # Object arrays can't be memory-mapped, so text is stored as fixed-width unicode
+    return np.asarray(list(values), dtype=str) if len(values) else np.zeros(0, dtype="<U1")
+
+# Written to a temporary file and renamed over the old one, so a store still
+# mapping the old file keeps reading it instead of a truncated one
+def _save(directory: str, name: str, array: np.ndarray) -> None:
+    path = os.path.join(directory, name + ".npy")
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(path + ".tmp", path)
+
+"""
+
+Name: Snapshot
+Type: class
+Description: Read-only view of a snapshot directory. Arrays are memory-mapped,
+so opening it reads only the metadata; failure mode rows for one component are
+a slice of each column.
+
+"""
+
+class Snapshot:
+    def __init__(self, db_path: str, meta: dict):
+        self.db_path = db_path
+        self.meta = meta
+        directory = snapshot_dir(db_path)
+        self._arrays = {
+            name[: -len(".npy")]: np.load(os.path.join(directory, name), mmap_mode="r")
+            for name in os.listdir(directory)
+            if name.endswith(".npy")
+        }
+
+    # False once anything has been committed since the snapshot was taken
+    def is_current(self) -> bool:
+        try:
+            return db_signature(self.db_path, self.meta["schema_version"]) == self.meta
+        except OSError:
+            return False
+
+    # One table's columns (rows sorted by comp_id, cf_id), its component offsets
+    # and the fail_id -> description lookup. The columns are mapped afresh and
+    # copy-on-write: writes to them stay in this process's memory.
+    def table_arrays(self, table="local_comp_fails"):
+        directory = snapshot_dir(self.db_path)
+        columns = {
+            column: np.load(os.path.join(directory, f"{table}.{column}.npy"), mmap_mode="c")
+            for column in COMP_FAIL_SNAPSHOT_COLUMNS
+        }
+        return columns, self._arrays[f"{table}.offsets"], self._arrays["fail_modes.desc"]
+
+    # Same rows and order as PartRepository.failure_modes
+    def failure_modes(self, comp_id, table="local_comp_fails", limit=None) -> pd.DataFrame:
+        offsets = self._arrays[f"{table}.offsets"]
+        if comp_id is None or not 0 <= comp_id < len(offsets) - 1:
+            return pd.DataFrame(columns=FAIL_MODE_ROW_COLUMNS)
+        start, end = int(offsets[comp_id]), int(offsets[comp_id + 1])
+
+        # Slices are in cf_id order, so the limit is a truncation
+        if limit is not None:
+            end = min(end, start + limit)
+        columns = {
+            column: widen(self._arrays[f"{table}.{column}"][start:end])
+            for column in COMP_FAIL_SNAPSHOT_COLUMNS
+        }
+        columns = {"desc": self._arrays["fail_modes.desc"][columns["fail_id"]].tolist(), **columns}
+        rows = pd.DataFrame(columns)
+        return rows.sort_values(["fail_id", "cf_id"], kind="stable").reset_index(drop=True)
+
+"""
+Returns the snapshot for a database if there is one matching its committed
+content (checkpointed first, see db_signature) and schema version, otherwise None.
+"""
+
+def load_snapshot(db_path: str):
+    meta_path = os.path.join(snapshot_dir(db_path), META_FILE)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != SNAPSHOT_FORMAT or meta.get("schema_version") != SCHEMA_VERSION:
+        return None
+    checkpoint(db_path)
+    snapshot = Snapshot(db_path, meta)
+    return snapshot if snapshot.is_current() else None
+
+def remove_snapshot(db_path: str) -> None:
+    shutil.rmtree(snapshot_dir(db_path), ignore_errors=True)
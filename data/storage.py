@@ -0,0 +1,175 @@
+# @file storage.py
+# @brief WAL-mode access to part_info.db: a pool of read connections and one writer thread
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+# Seconds a connection waits on a lock before raising "database is locked"
+BUSY_TIMEOUT = 30
+
+# Sync level of WAL connections: commits are durable across crashes, and only
+# the last few can be lost on power failure
+SYNCHRONOUS = "NORMAL"
+
+DEFAULT_READERS = 4
+
+# Most jobs committed together in one writer transaction
+DEFAULT_MAX_BATCH = 256
+
+def connect(db_path: str, wal=True, check_same_thread=True) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+    if wal:
+        # Readers don't block the writer (or each other) and see the last commit
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    return conn
+
+"""
+
+Name: ReadPool
+Type: class
+Description: A fixed set of connections shared between threads for reading.
+Borrow one with `with pool.connection() as conn:`.
+
+"""
+
+class ReadPool:
+    def __init__(self, db_path: str, size=DEFAULT_READERS, wal=True):
+        self._idle = queue.LifoQueue()
+        self._all = []
+        for _ in range(size):
+            conn = connect(db_path, wal, check_same_thread=False)
+            self._all.append(conn)
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            # Don't hand out a connection still inside a read transaction
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._all:
+            conn.close()
+        self._all.clear()
+
+"""
+
+Name: WriterQueue
+Type: class
+Description: Owns the only write connection and runs it on a dedicated thread.
+Jobs are callables taking the connection; they must not commit. Jobs queued
+together are run in one transaction, each inside a savepoint so a failing job
+is rolled back alone. submit() returns a Future with the job's result.
+
+"""
+
+class WriterQueue:
+    _STOP = object()
+
+    def __init__(self, db_path: str, wal=True, max_batch=DEFAULT_MAX_BATCH):
+        self.db_path = db_path
+        self.wal = wal
+        self.max_batch = max_batch
+        self.transactions = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, job) -> Future:
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        conn = connect(self.db_path, self.wal)
+        # Transactions are managed explicitly below
+        conn.isolation_level = None
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if self._STOP in batch:
+                    stopping = True
+                    batch = [item for item in batch if item is not self._STOP]
+                if batch:
+                    self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list) -> None:
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((future, job(conn), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.transactions += 1
+        self.jobs += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+"""
+
+Name: Storage
+Type: class
+Description: Read pool plus writer queue for one database file. setup(conn),
+e.g. PartRepository.prepare, runs on the first connection and is committed
+before the pool and the writer open, so readers never need to write.
+
+"""
+
+class Storage:
+    def __init__(self, db_path: str, wal=True, readers=DEFAULT_READERS, max_batch=DEFAULT_MAX_BATCH, setup=None):
+        self.db_path = db_path
+        self.wal = wal
+        # Switch the file to WAL (and migrate it) before any other connection opens it
+        conn = connect(db_path, wal)
+        try:
+            if setup is not None:
+                setup(conn)
+                conn.commit()
+        finally:
+            conn.close()
+        self.readers = ReadPool(db_path, readers, wal)
+        self.writer = WriterQueue(db_path, wal, max_batch)
+
+    def close(self) -> None:
+        self.writer.close()
+        self.readers.close()
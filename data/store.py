@@ -0,0 +1,330 @@
+# @file store.py
+# @brief Compact, typed in-memory store of comp_fails rows with per-component views
+
+import sys
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# Columns returned for each failure mode row, in display-friendly order
+FAIL_MODE_ROW_COLUMNS = (
+    "desc",
+    "cf_id",
+    "comp_id",
+    "fail_id",
+    "rpn",
+    "frequency",
+    "severity",
+    "detection",
+    "lower_bound",
+    "best_estimate",
+    "upper_bound",
+    "mission_time",
+)
+
+# Narrowest types that hold each column: F/S/D are 1-10, RPN is at most 1000.
+# Bounds and mission time are float32; fits are keyed on a hash of the
+# float32-rounded bounds (see precompute.input_hashes), so lookups still match.
+COLUMN_DTYPES = {
+    "cf_id": np.int32,
+    "comp_id": np.int32,
+    "frequency": np.int8,
+    "severity": np.int8,
+    "detection": np.int8,
+    "rpn": np.int16,
+    "lower_bound": np.float32,
+    "best_estimate": np.float32,
+    "upper_bound": np.float32,
+    "mission_time": np.float32,
+}
+
+BOUND_COLUMNS = ("lower_bound", "best_estimate", "upper_bound")
+
+# Columns read from the table, in query order (rpn is computed here)
+LOADED_COLUMNS = (
+    "cf_id",
+    "comp_id",
+    "fail_id",
+    "frequency",
+    "severity",
+    "detection",
+    "lower_bound",
+    "best_estimate",
+    "upper_bound",
+    "mission_time",
+)
+
+FSD_COLUMNS = ("frequency", "severity", "detection")
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Copy of a column as int64 or float64, so products like F * S * D don't overflow
+def widen(array) -> np.ndarray:
+    return np.asarray(array).astype(np.int64 if np.issubdtype(array.dtype, np.integer) else np.float64)
+
+# F * S * D for every row of a set of columns
+def _rpn(columns: dict) -> np.ndarray:
+    return (
+        columns["frequency"].astype(np.int16)
+        * columns["severity"].astype(np.int16)
+        * columns["detection"].astype(np.int16)
+    )
+
+# Writes one value into a set of columns; RPN follows F/S/D edits
+def _set_value(columns: dict, row: int, column: str, value) -> None:
+    if column not in COLUMN_DTYPES or column in ("cf_id", "comp_id", "rpn"):
+        raise ValueError(f"column is not editable: {column}")
+    columns[column][row] = value
+    if column in FSD_COLUMNS:
+        columns["rpn"][row] = np.prod([int(columns[c][row]) for c in FSD_COLUMNS])
+
+"""
+
+Name: ComponentView
+Type: class
+Description: One component's failure mode rows as NumPy arrays, in cf_id
+order. Views taken from an FmecaStore share its memory, so they see later
+edits and cost nothing to create; from_records() builds one from a query's
+rows. Descriptions are stored as codes into a shared table of unique strings.
+
+"""
+
+class ComponentView:
+    def __init__(self, columns: dict, desc_codes: np.ndarray, desc_table: np.ndarray, fail_ids: np.ndarray):
+        self.columns = columns
+        self.desc_codes = desc_codes
+        self.desc_table = desc_table
+        self.fail_ids = fail_ids
+
+    """
+    Builds a view from (desc, cf_id, comp_id, fail_id, F, S, D, LB, BE, UB,
+    mission_time) rows in cf_id order, e.g. one component's rows from SQLite.
+    """
+
+    @classmethod
+    def from_records(cls, records):
+        block = np.array([row[1:] for row in records], dtype=np.float64).reshape(-1, len(LOADED_COLUMNS))
+        fail_ids, first, desc_codes = np.unique(
+            block[:, LOADED_COLUMNS.index("fail_id")], return_index=True, return_inverse=True
+        )
+        columns = {
+            column: block[:, i].astype(COLUMN_DTYPES[column])
+            for i, column in enumerate(LOADED_COLUMNS)
+            if column != "fail_id"
+        }
+        columns["rpn"] = _rpn(columns)
+        desc_table = np.array([sys.intern(records[i][0]) for i in first] or [], dtype=object)
+        return cls(
+            {column: columns[column] for column in COLUMN_DTYPES},
+            desc_codes.astype(np.int32),
+            desc_table,
+            fail_ids.astype(np.int32),
+        )
+
+    def __len__(self):
+        return len(self.desc_codes)
+
+    def __contains__(self, cf_id):
+        try:
+            self._row(cf_id)
+        except KeyError:
+            return False
+        return True
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def fail_id(self) -> np.ndarray:
+        return self.fail_ids[self.desc_codes]
+
+    def descriptions(self) -> list:
+        return self.desc_table[self.desc_codes].tolist()
+
+    # View of the rows at the given positions (copies, unless rows is a slice)
+    def take(self, rows):
+        return ComponentView(
+            {column: array[rows] for column, array in self.columns.items()},
+            self.desc_codes[rows],
+            self.desc_table,
+            self.fail_ids,
+        )
+
+    # The first n rows in cf_id order, in failure mode order: the rows the GUI
+    # table shows. Zero-copy when the slice is already in that order.
+    def page(self, n=None):
+        head = self.take(slice(0, n))
+        order = np.lexsort((head.cf_id, head.fail_id))
+        return head if np.all(order[1:] > order[:-1]) else head.take(order)
+
+    # Rows as a DataFrame in the repository's column layout, widened (see widen),
+    # e.g. for a table model
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame({column: widen(array) for column, array in self.columns.items()})
+        frame["desc"] = self.descriptions()
+        frame["fail_id"] = self.fail_id.astype(np.int64)
+        return frame[list(FAIL_MODE_ROW_COLUMNS)]
+
+    # Position of a cf_id, by binary search (the rows are in cf_id order)
+    def _row(self, cf_id) -> int:
+        cf_ids = self.columns["cf_id"]
+        row = int(np.searchsorted(cf_ids, cf_id))
+        if row == len(cf_ids) or cf_ids[row] != cf_id:
+            raise KeyError(cf_id)
+        return row
+
+    def value(self, cf_id, column: str):
+        return self.columns[column][self._row(cf_id)].item()
+
+    # (LB, BE, UB) of one row
+    def bounds(self, cf_id) -> np.ndarray:
+        row = self._row(cf_id)
+        return np.array([self.columns[column][row] for column in BOUND_COLUMNS], dtype=np.float64)
+
+    # Edits one value in place (and in the store, for a store's view); RPN follows F/S/D edits
+    def set_value(self, cf_id, column: str, value) -> None:
+        _set_value(self.columns, self._row(cf_id), column, value)
+
+    # Bytes of the rows' arrays; the description strings are shared
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.columns.values()) + self.desc_codes.nbytes
+
+"""
+
+Name: FmecaStore
+Type: class
+Description: Every row of a comp_fails table held as fixed-width NumPy arrays
+(int8 F/S/D, int16 RPN, float32 bounds), sorted by (comp_id, cf_id). Failure
+mode descriptions are held once each and referenced by int32 codes. Loaded
+from a snapshot, the arrays stay memory-mapped (copy-on-write, so edits never
+reach the files). component() returns zero-copy views, with the same
+signature as PartRepository.component, so a FailureModeCache can take its
+views from the store instead of the database; set_value() edits in place by cf_id.
+
+"""
+
+class FmecaStore:
+    def __init__(self, columns: dict, desc_codes, desc_table, fail_ids, offsets, table="local_comp_fails"):
+        self.table = table
+        self.columns = columns
+        self.desc_codes = desc_codes
+        self.desc_table = desc_table
+        self.fail_ids = fail_ids
+        self.offsets = offsets
+        # cf_id -> row, built on the first lookup so loading doesn't read every cf_id
+        self._row_of_cf = None
+
+    """
+    Streams a table through a cursor in chunks into preallocated arrays, so
+    peak memory is the compact arrays plus one chunk.
+    """
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, table="local_comp_fails", chunksize=DEFAULT_CHUNKSIZE):
+        if table not in ("comp_fails", "local_comp_fails"):
+            raise ValueError(f"unknown failure mode table: {table}")
+
+        fail_modes = conn.execute("SELECT id, desc FROM fail_modes ORDER BY id").fetchall()
+        fail_ids = np.array([row[0] for row in fail_modes], dtype=np.int32)
+        # sys.intern so every view and frame shares one object per description
+        desc_table = np.array([sys.intern(row[1]) for row in fail_modes] or [], dtype=object)
+
+        (n_rows,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        columns = {column: np.empty(n_rows, dtype=dtype) for column, dtype in COLUMN_DTYPES.items()}
+        desc_codes = np.empty(n_rows, dtype=np.int32)
+
+        cursor = conn.execute(
+            f"SELECT {', '.join(LOADED_COLUMNS)} FROM {table} ORDER BY comp_id, cf_id"
+        )
+        start = 0
+        while True:
+            chunk = cursor.fetchmany(chunksize)
+            if not chunk:
+                break
+            block = np.array(chunk, dtype=np.float64)
+            end = start + len(block)
+            for i, column in enumerate(LOADED_COLUMNS):
+                if column == "fail_id":
+                    desc_codes[start:end] = np.searchsorted(fail_ids, block[:, i])
+                else:
+                    columns[column][start:end] = block[:, i]
+            start = end
+
+        columns["rpn"][:] = _rpn(columns)
+
+        (max_comp,) = conn.execute("SELECT COALESCE(MAX(id), -1) FROM components").fetchone()
+        offsets = np.searchsorted(columns["comp_id"], np.arange(max_comp + 2), side="left")
+        return cls(columns, desc_codes, desc_table, fail_ids, offsets.astype(np.int64), table)
+
+    # Opens one table of a snapshot.Snapshot without reading SQLite or copying:
+    # the columns are its memory-mapped arrays, already in COLUMN_DTYPES, and
+    # pages are read as rows are touched
+    @classmethod
+    def from_snapshot(cls, snapshot, table="local_comp_fails"):
+        columns, offsets, descs = snapshot.table_arrays(table)
+        # The snapshot's description lookup is dense, so fail_ids are their own codes
+        fail_ids = np.arange(len(descs), dtype=np.int32)
+        desc_table = np.array([sys.intern(str(desc)) for desc in descs] or [], dtype=object)
+        desc_codes = columns.pop("fail_id")
+        return cls(columns, desc_codes, desc_table, fail_ids, offsets, table)
+
+    def __len__(self):
+        return len(self.desc_codes)
+
+    # Zero-copy view of one component's rows (in cf_id order)
+    def component(self, comp_id, table=None) -> ComponentView:
+        if table is not None and table != self.table:
+            raise ValueError(f"store holds {self.table}, not {table}")
+        if comp_id is None or not 0 <= comp_id < len(self.offsets) - 1:
+            start = end = 0
+        else:
+            start, end = int(self.offsets[comp_id]), int(self.offsets[comp_id + 1])
+        return ComponentView(
+            {column: array[start:end] for column, array in self.columns.items()},
+            self.desc_codes[start:end],
+            self.desc_table,
+            self.fail_ids,
+        )
+
+    # View over every row, e.g. for whole-database statistics
+    def all(self) -> ComponentView:
+        return ComponentView(self.columns, self.desc_codes, self.desc_table, self.fail_ids)
+
+    # Same rows and order as PartRepository.failure_modes
+    def failure_modes(self, comp_id, table=None, limit=None) -> pd.DataFrame:
+        return self.component(comp_id, table).page(limit).to_frame()
+
+    def _row(self, cf_id) -> int:
+        if self._row_of_cf is None:
+            cf_ids = self.columns["cf_id"]
+            self._row_of_cf = np.full(int(cf_ids.max()) + 1 if len(cf_ids) else 0, -1, dtype=np.int32)
+            self._row_of_cf[cf_ids] = np.arange(len(cf_ids), dtype=np.int32)
+        row = self._row_of_cf[cf_id] if 0 <= cf_id < len(self._row_of_cf) else -1
+        if row < 0:
+            raise KeyError(cf_id)
+        return int(row)
+
+    def value(self, cf_id, column: str):
+        return self.columns[column][self._row(cf_id)].item()
+
+    # (LB, BE, UB) of one row
+    def bounds(self, cf_id) -> np.ndarray:
+        row = self._row(cf_id)
+        return np.array([self.columns[column][row] for column in BOUND_COLUMNS], dtype=np.float64)
+
+    # Edits one value in place; RPN follows F/S/D edits
+    def set_value(self, cf_id, column: str, value) -> None:
+        _set_value(self.columns, self._row(cf_id), column, value)
+
+    # Bytes held (mapped, for a snapshot's store), including the description strings
+    @property
+    def nbytes(self) -> int:
+        arrays = list(self.columns.values()) + [self.desc_codes, self.fail_ids, self.offsets]
+        if self._row_of_cf is not None:
+            arrays.append(self._row_of_cf)
+        strings = sum(sys.getsizeof(desc) for desc in self.desc_table)
+        return sum(array.nbytes for array in arrays) + self.desc_table.nbytes + strings
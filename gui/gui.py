@@ -70,7 +70,8 @@ DONE: create charts.py to hold all charting functions
 
 """
 
-import os, sys, sqlite3
+import os, sys, sqlite3, threading
+from concurrent.futures import wait
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -85,6 +86,17 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from stats_and_charts.charts import Charts
+from data.repository import PartRepository, FailureModeCache
+from data.journal import ChangeJournal
+from data.storage import Storage
+from data.snapshot import load_snapshot, build_snapshot
+from data.store import ComponentView, FmecaStore
+from data.export import export_worksheet
+from data.importer import apply_import
+from data.precompute import stored_fit, stored_selection
+from data.criticality import CriticalityEngine, CRITICALITY_COLUMNS
+from data.derived import DerivedValues, COMPONENT
+from stats_and_charts.survival import failure_log_curves, overlay_survival
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 
 database_data = {}
@@ -102,6 +114,14 @@ class MainWindow(QMainWindow):
     CURRENT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
     DB_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "data")
     DB_NAME = "part_info.db"
+    # Number of components whose failure modes are kept in memory at once
+    FAIL_MODE_CACHE_SIZE = 128
+    # Milliseconds between background saves of pending edits; 0 disables autosave
+    AUTOSAVE_INTERVAL_MS = 0
+    # Open the database in WAL mode so several windows/analysts can share it
+    USE_WAL = True
+    # Read failure modes from a memory-mapped snapshot of the database when it is current
+    USE_SNAPSHOT = True
     RECOMMENDATIONS = (
         "Recommended Detectability: 9-10 (Unacceptable)",
         "Recommended Detectability: 7-8 (Severe)",
@@ -120,9 +140,20 @@ class MainWindow(QMainWindow):
         "best_estimate",
         "upper_bound",
         "mission_time",
+        "alpha",
+        "mode_criticality",
+        "item_criticality",
     )
     # The types associated with each.
-    FAIL_MODE_COLUMN_TYPES = (str, int, int, int, int, float, float, float, float)
+    FAIL_MODE_COLUMN_TYPES = (str, int, int, int, int, float, float, float, float, float, float, float)
+    # Statistics tab charts of fitted distributions, by stats.FIT_FUNCTIONS name
+    DISTRIBUTION_CHARTS = {
+        "weibull": "Weibull Distribution",
+        "rayleigh": "Rayleigh Distribution",
+        "exponential": "Exponential Distribution",
+        "lognormal": "Lognormal Distribution",
+        "gamma": "Gamma Distribution",
+    }
     # These are the actual labels to show.
     HORIZONTAL_HEADER_LABELS = [
         "Failure Modes",
@@ -134,6 +165,9 @@ class MainWindow(QMainWindow):
         "Best Estimate (BE)",
         "Upper Bound (UB)",
         "Mission Time",
+        "Mode Ratio (α)",
+        "Mode Criticality (Cm)",
+        "Item Criticality (Cr)",
     ]
 
     """
@@ -153,6 +187,8 @@ class MainWindow(QMainWindow):
 
         self.current_row = 0
         self.current_column = 0
+        # Failure mode (table row) whose distribution the Statistics tab plots
+        self.stats_row = 0
         self.refreshing_table = False
         self.risk_threshold = self.DEFAULT_RISK_THRESHOLD
 
@@ -196,6 +232,8 @@ class MainWindow(QMainWindow):
 
         self._init_stats_tab()
 
+        self._init_menu()
+
         self.counter = 0
         self.questions = [
             "Does this system have redundancy, i.e. multiple units of the same component/subsystem in the case one fails?",
@@ -204,6 +242,17 @@ class MainWindow(QMainWindow):
         ]
         self.qindex = 0
         self.charts = Charts(self)
+        self.fit_cache = stats.FitCache()
+        # Kaplan-Meier curves by (component name, failure mode) from File > Load Failure Log
+        self.survival_curves = {}
+
+        # Pending edits are written by the storage's writer thread
+        self.autosave_future = None
+        self.autosave_batch = None
+        if self.AUTOSAVE_INTERVAL_MS > 0:
+            self.autosave_timer = QTimer(self)
+            self.autosave_timer.timeout.connect(self.autosave)
+            self.autosave_timer.start(self.AUTOSAVE_INTERVAL_MS)
 
     def closeEvent(self, event) -> None:
         close_confirm = QMessageBox()
@@ -217,8 +266,11 @@ class MainWindow(QMainWindow):
         match close_confirm:
             case QMessageBox.Yes:
                 self.save_sql()
+                self.storage.close()
                 event.accept()
             case QMessageBox.No:
+                self.finish_autosave(wait=True)
+                self.storage.close()
                 event.accept()
             case QMessageBox.Cancel:
                 event.ignore()
@@ -325,6 +377,18 @@ class MainWindow(QMainWindow):
         # self.read_database()
         ### END OF DATABASE VIEW TAB SETUP ###
 
+    def _init_menu(self):
+        file_menu = self.menuBar().addMenu("File")
+        self.export_action = QAction("Export Worksheet...", self)
+        self.export_action.triggered.connect(self.export_worksheet)
+        file_menu.addAction(self.export_action)
+        self.import_action = QAction("Import Worksheet...", self)
+        self.import_action.triggered.connect(self.import_worksheet)
+        file_menu.addAction(self.import_action)
+        self.load_log_action = QAction("Load Failure Log...", self)
+        self.load_log_action.triggered.connect(self.load_failure_log)
+        file_menu.addAction(self.load_log_action)
+
     def _init_main_tab(self):
         ### START OF MAIN TAB SETUP ###
 
@@ -355,7 +419,7 @@ class MainWindow(QMainWindow):
                 self.update_layout(),
             )
         )
-        self.populate_component_dropdown(self.components["name"])
+        self.populate_component_dropdown(self.repo.component_names())
         search_and_dropdown_layout.addWidget(self.component_name_field)
 
         self.left_layout.addLayout(search_and_dropdown_layout)
@@ -365,7 +429,7 @@ class MainWindow(QMainWindow):
         self.threshold_field = QLineEdit()
         self.threshold_field.setText(str(self.DEFAULT_RISK_THRESHOLD))
         self.threshold_field.editingFinished.connect(
-            lambda: (self.read_risk_threshold(), self.update_layout())
+            lambda: (self.read_risk_threshold(), self.threshold_changed())
         )
         self.threshold_field.setToolTip(
             "Enter the maximum acceptable RPN: must be an integer value in [1-1000]."
@@ -399,6 +463,9 @@ class MainWindow(QMainWindow):
         self.table_widget.setColumnWidth(6, 110)  # Best Estimate
         self.table_widget.setColumnWidth(7, 110)  # Upper Bound
         self.table_widget.setColumnWidth(8, 110)  # Mission Time
+        self.table_widget.setColumnWidth(9, 110)  # Mode Ratio
+        self.table_widget.setColumnWidth(10, 150)  # Mode Criticality
+        self.table_widget.setColumnWidth(11, 150)  # Item Criticality
         # self.table_widget.setColumnWidth(10, 150)  # Mission Time
         self.table_widget.verticalHeader().setDefaultSectionSize(32)
         self.table_widget.verticalHeader().setMaximumSectionSize(32)
@@ -510,7 +577,7 @@ class MainWindow(QMainWindow):
                 self.update_layout(),
             )
         )
-        for name in self.components["name"]:
+        for name in self.repo.component_names():
             self.component_name_field_stats.addItem(name)
         self.left_layout.addWidget(self.component_name_field_stats)
         left_layout_stats.addWidget(self.component_name_field_stats)
@@ -518,7 +585,7 @@ class MainWindow(QMainWindow):
         # Create and add the submit button
         self.stat_submit_button = QPushButton("Show Table")
         self.stat_submit_button.clicked.connect(
-            lambda: self.populate_table(self.table_widget_stats, self.comp_fails)
+            lambda: (self.populate_table(self.table_widget_stats), self.choose_stats_chart())
         )
         left_layout_stats.addWidget(self.stat_submit_button)
 
@@ -533,6 +600,7 @@ class MainWindow(QMainWindow):
         self.table_widget_stats = QTableWidget()
         self.table_widget_stats.setColumnCount(len(self.HORIZONTAL_HEADER_LABELS))
         self.table_widget_stats.setHorizontalHeaderLabels(self.HORIZONTAL_HEADER_LABELS)
+        self.table_widget_stats.cellClicked.connect(self.stats_cell_clicked)
         self.table_widget_stats.setColumnWidth(0, 150)  # ID
         self.table_widget_stats.setColumnWidth(1, 150)  # Failure Mode
         self.table_widget_stats.setColumnWidth(3, 150)  # RPN
@@ -580,8 +648,8 @@ class MainWindow(QMainWindow):
         # Create dropdown menu for holding charts we want to give the option of generating
         self.chart_name_field_stats = QComboBox(self)
         self.chart_name_field_stats.addItem("Select a Chart")
-        self.chart_name_field_stats.addItem("Weibull Distribution")
-        self.chart_name_field_stats.addItem("Rayleigh Distribution")
+        for label in self.DISTRIBUTION_CHARTS.values():
+            self.chart_name_field_stats.addItem(label)
         self.chart_name_field_stats.addItem("Bathtub Curve")
         right_layout_stats.addWidget(self.chart_name_field_stats)
 
@@ -615,25 +683,75 @@ class MainWindow(QMainWindow):
 
     def update_layout(self):
         self.refreshing_table = True
-        self.populate_table(self.table_widget, self.comp_fails)
-        self.populate_table(self.table_widget_stats, self.comp_fails)
+        self.populate_table(self.table_widget)
+        self.fill_table(self.table_widget_stats)
         self.generate_main_chart()
 
         for row in range(len(self.comp_data.index)):
-            rpn_item = self.table_widget.item(row, 1)
-            if int(rpn_item.text()) > self.risk_threshold:
-                rpn_item.setBackground(QColor(255, 102, 102))  # muted red
-            else:
-                rpn_item.setBackground(QColor(102, 255, 102))  # muted green
+            self.color_rpn_item(row)
 
         self.refreshing_table = False
+        self.choose_stats_chart()
 
     def table_changed_main(self, item):
         if self.refreshing_table:
             return
-        self.save_to_df(item)
-        self.populate_table(self.table_widget_stats, self.comp_fails)
-        self.generate_main_chart()
+        dirty = self.save_to_df(item)
+        if dirty is None:
+            return
+        # The stats table shows the same rows: copy the edited cell, then refresh what depends on it
+        self.refreshing_table = True
+        self.table_widget_stats.setItem(item.row(), item.column(), QTableWidgetItem(item.text()))
+        self.refreshing_table = False
+        self.refresh_derived(dirty)
+
+    def threshold_changed(self):
+        if not hasattr(self, "comp_data"):
+            self.update_layout()
+            return
+        self.refresh_derived(self.derived.invalidate("threshold"))
+
+    def color_rpn_item(self, row) -> None:
+        rpn_item = self.table_widget.item(row, 1)
+        if self.derived.get("above_threshold", self.comp_data.iloc[row]["cf_id"]):
+            rpn_item.setBackground(QColor(255, 102, 102))  # muted red
+        else:
+            rpn_item.setBackground(QColor(102, 255, 102))  # muted green
+
+    """
+    Brings the shown rows and the main chart up to date with the values an
+    edit (or a threshold change) made dirty, pulling each from self.derived.
+    Cells and charts that don't depend on the edit are left alone.
+    """
+
+    def refresh_derived(self, dirty: set) -> None:
+        def is_dirty(kind, key):
+            return (kind, key) in dirty or (kind, None) in dirty
+
+        self.refreshing_table = True
+        for i, cf_id in enumerate(self.comp_data["cf_id"]):
+            if is_dirty("rpn", cf_id):
+                rpn = self.derived.get("rpn", cf_id)
+                self.comp_data.loc[i, "rpn"] = rpn
+                for table_widget in (self.table_widget, self.table_widget_stats):
+                    table_widget.setItem(i, 1, QTableWidgetItem(str(rpn)))
+            if is_dirty("above_threshold", cf_id):
+                self.color_rpn_item(i)
+
+        if is_dirty("criticality", self.comp_id):
+            self.update_criticality()
+            for c, key in enumerate(self.FAIL_MODE_COLUMNS):
+                if key not in CRITICALITY_COLUMNS:
+                    continue
+                for i, value in enumerate(self.comp_data[key]):
+                    for table_widget in (self.table_widget, self.table_widget_stats):
+                        table_widget.setItem(i, c, QTableWidgetItem(self.cell_text(key, value)))
+        self.refreshing_table = False
+
+        if is_dirty("chart_view", self.comp_id):
+            self.generate_main_chart()
+        if len(self.comp_data.index) and is_dirty("best_model", self.stats_cf_id()):
+            self.choose_stats_chart()
 
     """
 
@@ -669,6 +787,11 @@ class MainWindow(QMainWindow):
                 self.update_rayleigh_canvas()
             case "Bathtub Curve":
                 self.update_bathtub_canvas()
+            case label if label in self.DISTRIBUTION_CHARTS.values():
+                distribution = next(
+                    name for name, chart in self.DISTRIBUTION_CHARTS.items() if chart == label
+                )
+                self.update_distribution_canvas(distribution)
 
     """
 
@@ -726,9 +849,11 @@ class MainWindow(QMainWindow):
         # Clear the existing tabs
         self.stats_tab.clear()
 
-        fig1 = stats._rayleigh(self.values())
-        fig2 = stats._rayleigh(self.values())
-        fig3 = stats._rayleigh(self.values())
+        # Fit once (or reuse a cached fit); each canvas gets its own figure
+        fit = self.stats_fit("rayleigh")
+        fig1 = self.overlay_log_curve(stats.rayleigh_figure(fit), fit)
+        fig2 = self.overlay_log_curve(stats.rayleigh_figure(fit), fit)
+        fig3 = self.overlay_log_curve(stats.rayleigh_figure(fit), fit)
 
         # Update the canvas with the new figures
         self.stats_tab_canvas1.figure = fig1
@@ -754,6 +879,31 @@ class MainWindow(QMainWindow):
     
     """
 
+    """
+
+    Name: update_distribution_canvas
+    Type: function
+    Description: Populates the canvases with a histogram PDF plot of any other fitted distribution.
+
+    """
+
+    def update_distribution_canvas(self, distribution: str):
+        self.stats_tab_canvas1.figure.clear()
+        self.stats_tab_canvas2.figure.clear()
+        self.stats_tab_canvas3.figure.clear()
+
+        self.stats_tab.clear()
+
+        fit = self.stats_fit(distribution)
+        for canvas in (self.stats_tab_canvas1, self.stats_tab_canvas2, self.stats_tab_canvas3):
+            canvas.figure = self.overlay_log_curve(stats.distribution_figure(fit), fit)
+            canvas.figure.tight_layout()
+            canvas.draw()
+
+        self.stats_tab.addTab(self.stats_tab_canvas1, "Plot 1")
+        self.stats_tab.addTab(self.stats_tab_canvas2, "Plot 2")
+        self.stats_tab.addTab(self.stats_tab_canvas3, "Plot 3")
+
     def update_weibull_canvas(self):
         # Clear the existing figures before displaying new ones
         self.stats_tab_canvas1.figure.clear()
@@ -763,9 +913,11 @@ class MainWindow(QMainWindow):
         # Clear the existing tabs
         self.stats_tab.clear()
 
-        fig1 = stats._weibull(self.values())
-        fig2 = stats._weibull(self.values())
-        fig3 = stats._weibull(self.values())
+        # Fit once (or reuse a cached fit); each canvas gets its own figure
+        fit = self.stats_fit("weibull")
+        fig1 = self.overlay_log_curve(stats.weibull_figure(fit), fit)
+        fig2 = self.overlay_log_curve(stats.weibull_figure(fit), fit)
+        fig3 = self.overlay_log_curve(stats.weibull_figure(fit), fit)
 
         # Update the canvas with the new figures
         self.stats_tab_canvas1.figure = fig1
@@ -783,7 +935,9 @@ class MainWindow(QMainWindow):
         self.stats_tab.addTab(self.stats_tab_canvas3, "Plot 3")
 
     """
-    Pulls default data from part_info.db and stores it in a pandas DataFrame.
+    Opens part_info.db. Only the component list is read up front; each
+    component's failure modes are fetched on demand as a compact ComponentView
+    and kept in an LRU cache. The table, charts and fits read those views.
     """
 
     def read_sql(self) -> None:
@@ -792,37 +946,98 @@ class MainWindow(QMainWindow):
         )
         if not os.path.isfile(DB_PATH):
             raise FileNotFoundError("could not find database file.")
-        self.conn = sqlite3.connect(DB_PATH)
-        self.components = pd.read_sql_query("SELECT * FROM components", self.conn)
-        self.fail_modes = pd.read_sql_query("SELECT * FROM fail_modes", self.conn)
-        self.default_comp_fails = pd.read_sql_query(
-            "SELECT * FROM comp_fails", self.conn
+        self.db_file = DB_PATH
+        # All writes go through the storage's single writer thread; reads borrow its pooled connections
+        self.storage = Storage(DB_PATH, wal=self.USE_WAL, setup=PartRepository.prepare)
+        self.repo = PartRepository(readers=self.storage.readers)
+        if self.USE_SNAPSHOT:
+            self.repo.snapshot = load_snapshot(DB_PATH)
+            if self.repo.snapshot is None:
+                # Missing or stale: rebuild it for the next start; this session reads SQLite
+                threading.Thread(target=build_snapshot, args=(DB_PATH,), daemon=True).start()
+        # Unsaved edits by cf_id; re-applied to rows whenever the cache loads them
+        self.journal = ChangeJournal()
+        self.fail_mode_cache = None
+        self.read_store("local_comp_fails")
+        self._init_derived()
+
+    """
+    Points the row cache and the criticality engine at a failure mode table.
+    While the snapshot is current, self.store maps its arrays (copy-on-write,
+    not copied) and the cache's views are slices of it; otherwise self.store
+    is None and each component is one indexed query.
+    """
+
+    def read_store(self, table: str) -> None:
+        snapshot = self.repo.snapshot
+        if snapshot is not None and snapshot.is_current():
+            self.store = FmecaStore.from_snapshot(snapshot, table)
+            rows = self.store.all()
+            self.criticality = CriticalityEngine(rows.cf_id, rows.comp_id, rows.best_estimate, rows.mission_time)
+        else:
+            self.store = None
+            with self.storage.readers.connection() as conn:
+                self.criticality = CriticalityEngine.from_connection(conn, table)
+        source = self.repo if self.store is None else self.store
+        if self.fail_mode_cache is None:
+            self.fail_mode_cache = FailureModeCache(
+                source, self.FAIL_MODE_CACHE_SIZE, table=table, journal=self.journal
+            )
+        else:
+            self.fail_mode_cache.repo = source
+            self.fail_mode_cache.reset(table)
+
+    """
+    Values derived from the current component's rows, recomputed only when an
+    edit makes them dirty (see data/derived.py). ROW values are keyed by
+    cf_id, COMPONENT values by comp_id.
+    """
+
+    def _init_derived(self) -> None:
+        self.derived = DerivedValues()
+        fsd = ("frequency", "severity", "detection")
+        bounds = ("lower_bound", "best_estimate", "upper_bound")
+
+        def row_value(cf_id, column):
+            return self.fail_mode_cache.get(self.comp_id).value(cf_id, column)
+
+        self.derived.rule(
+            "rpn", fsd, lambda cf_id: int(np.prod([row_value(cf_id, c) for c in fsd]))
+        )
+        self.derived.rule(
+            "above_threshold",
+            ("rpn", "threshold"),
+            lambda cf_id: self.derived.get("rpn", cf_id) > self.risk_threshold,
         )
-        self.comp_fails = pd.read_sql_query("SELECT * FROM local_comp_fails", self.conn)
-        # Calculates RPN = Frequency * Severity * Detection
-        self.default_comp_fails.insert(
-            3,
-            "rpn",
-            [
-                int(row["frequency"] * row["severity"] * row["detection"])
-                for _, row in self.comp_fails.iterrows()
-            ],
-            True,
+        # The engine is updated as cells are edited; this reads out the whole component
+        self.derived.rule(
+            "criticality",
+            ("best_estimate", "mission_time"),
+            lambda comp_id: self.criticality.values(self.fail_mode_cache.get(comp_id).cf_id),
+            scope=COMPONENT,
         )
-        self.comp_fails.insert(
-            3,
-            "rpn",
-            [
-                int(row["frequency"] * row["severity"] * row["detection"])
-                for _, row in self.comp_fails.iterrows()
-            ],
-            True,
+        for distribution in stats.FIT_FUNCTIONS:
+            self.derived.rule(
+                distribution,
+                bounds,
+                lambda cf_id, distribution=distribution: self.row_fit(cf_id, distribution),
+            )
+        self.derived.rule("best_model", bounds, self.row_selection)
+        # Everything the main tab's charts read
+        self.derived.rule(
+            "chart_view",
+            ("rpn", "threshold") + fsd,
+            lambda comp_id: self.fail_mode_cache.get(comp_id).page(self.max_ids),
+            scope=COMPONENT,
         )
 
+    # Discards unsaved edits and shows the defaults until the next save
     def reset_df(self) -> None:
-        if not (hasattr(self, "comp_fails") and hasattr(self, "default_comp_fails")):
+        if not hasattr(self, "fail_mode_cache"):
             return
-        self.comp_fails = self.default_comp_fails.copy()
+        self.journal.reset_to_defaults()
+        self.read_store("comp_fails")
+        self.derived.clear()
 
     def read_risk_threshold(self):
         try:
@@ -840,49 +1055,63 @@ class MainWindow(QMainWindow):
     Populates a table with failure modes associated with a specific component.
     """
 
-    def populate_table(self, table_widget, data_source) -> None:
-        # clear existing table data (does not affect underlying database)
-        table_widget.clearContents()
-
+    def populate_table(self, table_widget) -> None:
         # retrieve component name from text box
         component_name = self.component_name_field.currentText()
 
-        # Update the column header for "Failure Mode"
-        header_labels_static = self.HORIZONTAL_HEADER_LABELS[1:]
-        table_widget.setHorizontalHeaderLabels(
-            [f"{component_name} Failure Modes"] + header_labels_static
-        )
-
         # Update the maximum number of IDs to show
         self.max_ids = 10
 
-        # drop_duplicates shouldn't be necessary here, since components are unique. Just in case, though.
-        # np.sum is a duct-tapey way to convert to int, since you can't directly
-        self.comp_id = np.sum(
-            self.components[
-                self.components["name"] == component_name
-            ].drop_duplicates()["id"]
-        )
+        # Indexed lookup: dict for the id, cached rows (with unsaved edits) for the data
+        self.comp_id = self.repo.component_id(component_name)
+        rows = self.fail_mode_cache.get(self.comp_id)
 
-        self.comp_data = (
-            data_source[data_source["comp_id"] == self.comp_id]
-            .head(self.max_ids)
-            .reset_index(drop=True)
-        )
+        # First max_ids rows in database order, shown in failure mode order
+        self.comp_data = rows.page(self.max_ids).to_frame()
+        self.update_criticality()
 
-        self.comp_data = pd.merge(
-            self.fail_modes, self.comp_data, left_on="id", right_on="fail_id"
-        )
+        self.fill_table(table_widget)
+
+    """
+    Writes the currently loaded component's rows into a table without re-querying.
+    """
 
-        # id column is identical to fail_id column, so we can drop it.
-        self.comp_data = self.comp_data.drop(columns="id")
+    def fill_table(self, table_widget) -> None:
+        if not hasattr(self, "comp_data"):
+            return
+        # clear existing table data (does not affect underlying database)
+        table_widget.clearContents()
+
+        # Update the column header for "Failure Mode"
+        component_name = self.component_name_field.currentText()
+        header_labels_static = self.HORIZONTAL_HEADER_LABELS[1:]
+        table_widget.setHorizontalHeaderLabels(
+            [f"{component_name} Failure Modes"] + header_labels_static
+        )
 
         # Set the row count of the table widget
         table_widget.setRowCount(self.max_ids)
 
         for row, data in self.comp_data.iterrows():
             for i, key in enumerate(self.FAIL_MODE_COLUMNS):
-                table_widget.setItem(row, i, QTableWidgetItem(str(data[key])))
+                table_widget.setItem(row, i, QTableWidgetItem(self.cell_text(key, data[key])))
+
+    def cell_text(self, column: str, value) -> str:
+        return f"{value:.4g}" if column in CRITICALITY_COLUMNS else str(value)
+
+    # Copies the shown rows' criticality numbers into comp_data
+    def update_criticality(self) -> None:
+        values = self.derived.get("criticality", comp_id=self.comp_id).reindex(self.comp_data["cf_id"])
+        for column in CRITICALITY_COLUMNS:
+            self.comp_data[column] = values[column].to_numpy()
+
+    """
+    Typed arrays of the rows shown in the table, for the charts: a view of
+    the cached rows, so it shares their memory.
+    """
+
+    def chart_view(self) -> ComponentView:
+        return self.derived.get("chart_view", comp_id=self.comp_id)
 
     """
     Records the location of a cell when it's clicked.
@@ -892,6 +1121,62 @@ class MainWindow(QMainWindow):
         self.current_row = row
         self.current_column = column
 
+    # Records which failure mode the Statistics tab should plot
+    def stats_cell_clicked(self, row, column):
+        self.stats_row = row
+        self.choose_stats_chart()
+
+    def stats_cf_id(self):
+        return self.comp_data.iloc[min(self.stats_row, len(self.comp_data.index) - 1)]["cf_id"]
+
+    # Switches the Statistics tab's chart to the selected failure mode's best-scoring distribution
+    def choose_stats_chart(self) -> None:
+        if not hasattr(self, "comp_data") or not len(self.comp_data.index):
+            return
+        fit, score = self.derived.get("best_model", self.stats_cf_id())
+        self.chart_name_field_stats.setCurrentText(self.DISTRIBUTION_CHARTS[fit.distribution])
+        self.statusBar().showMessage(f"Best fit: {fit.distribution} (score {score:.2f})", 5000)
+
+    """
+    The selected failure mode's fit: read from dist_params (see data/precompute.py)
+    when it was fitted to the row's current LB/BE/UB, otherwise fitted now and cached.
+    """
+
+    def stats_fit(self, distribution: str):
+        if not hasattr(self, "comp_data") or not len(self.comp_data.index):
+            return self.fit_cache.get(distribution, self.values())
+        return self.derived.get(distribution, self.stats_cf_id())
+
+    # The selected failure mode's Kaplan-Meier curve, if the loaded failure log has one
+    def stats_survival_curve(self):
+        if not self.survival_curves or not hasattr(self, "comp_data") or not len(self.comp_data.index):
+            return None
+        desc = self.comp_data.iloc[min(self.stats_row, len(self.comp_data.index) - 1)]["desc"]
+        return self.survival_curves.get((self.component_name_field.currentText(), desc))
+
+    def overlay_log_curve(self, fig, fit):
+        curve = self.stats_survival_curve()
+        return fig if curve is None else overlay_survival(fig, curve, fit)
+
+    def row_bounds(self, cf_id) -> np.ndarray:
+        return self.fail_mode_cache.get(self.comp_id).bounds(cf_id)
+
+    def row_fit(self, cf_id, distribution: str):
+        values = self.row_bounds(cf_id)
+        # dist_params only holds Weibull and Rayleigh fits
+        fit = None
+        if distribution in ("weibull", "rayleigh"):
+            with self.storage.readers.connection() as conn:
+                fit = stored_fit(conn, cf_id, distribution, values)
+        return fit if fit is not None else self.fit_cache.get(distribution, values)
+
+    # (Fit, score) of the best-scoring distribution: from model_selection if current, else selected now
+    def row_selection(self, cf_id):
+        values = self.row_bounds(cf_id)
+        with self.storage.readers.connection() as conn:
+            selection = stored_selection(conn, cf_id, values)
+        return selection if selection is not None else stats.select_model(values)
+
     """
     TODO: get lower bound, geometric mean, and upper bound from dataset, for the component passed in
     """
@@ -916,13 +1201,13 @@ class MainWindow(QMainWindow):
         else:
             return np.array([1, 1, 1])
 
-    # Executes and commits an SQL query on this window's database connection
+    # Executes and commits an SQL query through the storage's writer thread
     def exec_SQL(self, query) -> None:
-        self.conn.execute(query)
-        self.conn.commit()
+        self.storage.writer.submit(lambda conn: conn.execute(query)).result()
 
-    # Saves individual values in the UI to self.comp_fails
-    def save_to_df(self, item: QTableWidgetItem) -> None:
+    # Saves individual values in the UI to the cached failure mode rows.
+    # Returns the derived values the edit made dirty, or None if it was rejected.
+    def save_to_df(self, item: QTableWidgetItem):
         if self.refreshing_table or not hasattr(self, "comp_data"):
             return
         i, j = item.row(), item.column()
@@ -934,14 +1219,14 @@ class MainWindow(QMainWindow):
             self.refreshing_table = False
             return
 
-        row = self.comp_fails["cf_id"] == self.comp_data.iloc[i]["cf_id"]
+        row = self.comp_data.iloc[i]["cf_id"]
         column = self.FAIL_MODE_COLUMNS[j]
         new_val = item.text()
 
         self.refreshing_table = True
         # Catch invalid entry fields
-        if j < 2:
-            item.setText(str(self.comp_data.iloc[i][column]))
+        if j < 2 or column in CRITICALITY_COLUMNS:
+            item.setText(self.cell_text(column, self.comp_data.iloc[i][column]))
             self.refreshing_table = False
 
             QMessageBox.warning(self, "Error", "Cannot edit these fields.")
@@ -950,57 +1235,71 @@ class MainWindow(QMainWindow):
         try:
             new_val = self.FAIL_MODE_COLUMN_TYPES[j](new_val)
             if not (1 <= new_val <= 10):
-                item.setText(str(self.comp_data.iloc[i, j + 3]))
+                item.setText(str(self.comp_data.iloc[i][column]))
                 self.refreshing_table = False
 
                 QMessageBox.warning(
                     self, "Error", "Input must be an integer from 1 to 10, inclusive."
                 )
                 return
-            self.comp_fails.loc[row, column] = new_val
+            self.fail_mode_cache.get(self.comp_id).set_value(row, column, new_val)
+            self.comp_data.loc[i, column] = new_val
+            self.journal.record(row, column, new_val)
         except ValueError:
-            item.setText(str(self.comp_data.iloc[i, j + 3]))
+            item.setText(str(self.comp_data.iloc[i][column]))
             self.refreshing_table = False
 
             QMessageBox.warning(self, "Error", "Invalid input for cell type.")
             return
 
-        # If the user is updating FSD, update RPN
-        if 2 <= j <= 4:
-            new_rpn = int(
-                (
-                    self.comp_fails.loc[row, "frequency"]
-                    * self.comp_fails.loc[row, "severity"]
-                    * self.comp_fails.loc[row, "detection"]
-                ).iloc[0]
-            )
-            self.comp_fails.loc[row, "rpn"] = new_rpn
-            self.table_widget.setItem(i, 1, QTableWidgetItem(str(new_rpn)))
-
-            rpn_item = self.table_widget.item(i, 1)
-            if int(rpn_item.text()) > self.risk_threshold:
-                rpn_item.setBackground(QColor(255, 102, 102))  # muted red
-            else:
-                rpn_item.setBackground(QColor(102, 255, 102))  # muted green
+        self.criticality.set_value(row, column, new_val)
         self.refreshing_table = False
+        return self.derived.invalidate(column, row, self.comp_id)
 
-    # Saves local values to the database
+    # Saves local values to the database: only rows edited since the last save
     def save_sql(self) -> None:
-        for _, row in self.comp_fails.iterrows():
-            self.exec_SQL(
-                f"""
-                UPDATE local_comp_fails
-                SET frequency={row["frequency"]},
-                    severity={row["severity"]},
-                    detection={row["detection"]},
-                    lower_bound={row["lower_bound"]},
-                    best_estimate={row["best_estimate"]},
-                    upper_bound={row["upper_bound"]},
-                    mission_time={row["mission_time"]}
-                WHERE
-                    cf_id={row["cf_id"]}
-                """
-            )
+        self.finish_autosave(wait=True)
+        batch = self.journal.take()
+        try:
+            self.storage.writer.submit(batch.apply).result()
+        except sqlite3.Error:
+            self.journal.restore(batch)
+            raise
+        self.batch_saved(batch)
+
+    # Starts writing pending edits in the background, if none are already being written
+    def autosave(self) -> None:
+        self.finish_autosave()
+        if self.autosave_future is not None or not len(self.journal):
+            return
+        self.autosave_batch = self.journal.take()
+        self.autosave_future = self.storage.writer.submit(self.autosave_batch.apply)
+
+    # Collects the result of a background save; runs on the GUI thread
+    def finish_autosave(self, wait=False) -> None:
+        if self.autosave_future is None:
+            return
+        if not (wait or self.autosave_future.done()):
+            return
+        future, batch = self.autosave_future, self.autosave_batch
+        self.autosave_future = self.autosave_batch = None
+        try:
+            future.result()
+        except sqlite3.Error as e:
+            self.journal.restore(batch)
+            self.statusBar().showMessage(f"Autosave failed: {e}")
+            return
+        self.batch_saved(batch)
+        self.statusBar().showMessage(f"Autosaved {len(batch)} edited rows", 5000)
+
+    def batch_saved(self, batch) -> None:
+        self.journal.confirm(batch)
+        # Write-through: after a reset, the local table now holds the defaults
+        if batch.reset and not self.journal.reset_pending:
+            # The store's rows (defaults plus edits since) are now what the local table holds
+            if self.store is not None:
+                self.store.table = "local_comp_fails"
+            self.fail_mode_cache.reset("local_comp_fails")
 
     """
     Refreshes table to the previous page.
@@ -1009,7 +1308,7 @@ class MainWindow(QMainWindow):
     def show_previous(self):
         # so that it doesn't go below 0
         self.selected_index = max(0, self.selected_index - self.max_ids)
-        self.populate_table(self.table_widget, self.comp_fails)
+        self.populate_table(self.table_widget)
 
     """
     Description: Refreshes statistics table to the previous page.
@@ -1020,7 +1319,7 @@ class MainWindow(QMainWindow):
         self.selected_index_stats = max(
             0, self.selected_index_stats - self.max_ids_stats
         )
-        self.populate_table(self.table_widget_stats, self.comp_fails)
+        self.populate_table(self.table_widget_stats)
 
     """
     Refreshes table to the next page.
@@ -1040,7 +1339,7 @@ class MainWindow(QMainWindow):
             and self.selected_index // self.max_ids < total_pages - 1
         ):
             self.selected_index = (total_pages - 1) * self.max_ids
-        self.populate_table(self.table_widget, self.comp_fails)
+        self.populate_table(self.table_widget)
 
     """
     Refreshes statistics table to the next page.
@@ -1060,7 +1359,7 @@ class MainWindow(QMainWindow):
             and self.selected_index_stats // self.max_ids_stats < total_pages - 1
         ):
             self.selected_index_stats = (total_pages - 1) * self.max_ids_stats
-        self.populate_table(self.table_widget_stats, self.comp_fails)
+        self.populate_table(self.table_widget_stats)
 
     """
     Gives user the option to download displayed figure.
@@ -1073,6 +1372,157 @@ class MainWindow(QMainWindow):
         self.main_figure
         figure.savefig(file_path, format="jpg", dpi=300)
 
+    """
+    Exports the full FMECA worksheet (every component's failure modes) to
+    CSV, XLSX or Parquet, streaming it from the database with a progress dialog.
+    """
+
+    def export_worksheet(self) -> None:
+        if len(self.journal):
+            save_confirm = QMessageBox.question(
+                self,
+                "Export Worksheet",
+                "Save changes before exporting? Unsaved edits are not exported.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+            )
+            match save_confirm:
+                case QMessageBox.Yes:
+                    self.save_sql()
+                case QMessageBox.No:
+                    pass
+                case _:
+                    return
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Worksheet",
+            "fmeca.csv",
+            "CSV (*.csv);;Excel Workbook (*.xlsx);;Parquet (*.parquet)",
+        )
+        if not file_path:
+            return
+
+        dialog = QProgressDialog("Exporting worksheet...", "Cancel", 0, 100, self)
+        dialog.setWindowModality(Qt.WindowModal)
+
+        def progress(done, total):
+            dialog.setValue(int(100 * done / total) if total else 100)
+            QApplication.processEvents()
+            if dialog.wasCanceled():
+                raise InterruptedError
+
+        try:
+            with self.storage.readers.connection() as conn:
+                n_rows = export_worksheet(conn, file_path, progress=progress)
+        except InterruptedError:
+            return
+        except (ValueError, ImportError, OSError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Export Failed", str(e))
+            return
+        finally:
+            dialog.close()
+        self.statusBar().showMessage(f"Exported {n_rows} rows to {file_path}", 5000)
+
+    """
+    Reads a failure log (CSV or Parquet of component, failure_mode, time and
+    status columns) into Kaplan-Meier curves, which the Statistics tab's
+    distribution plots then overlay for matching failure modes.
+    """
+
+    def load_failure_log(self) -> None:
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Load Failure Log", "", "Failure Logs (*.csv *.parquet);;All Files (*)"
+        )
+        if not file_path:
+            return
+
+        dialog = QProgressDialog("Reading failure log...", "Cancel", 0, 0, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.show()
+
+        def progress(done):
+            dialog.setLabelText(f"Reading failure log... {done} records read")
+            QApplication.processEvents()
+            if dialog.wasCanceled():
+                raise InterruptedError
+
+        try:
+            curves = failure_log_curves(file_path, progress=progress)
+        except InterruptedError:
+            return
+        except (ValueError, KeyError, ImportError, OSError) as e:
+            QMessageBox.warning(self, "Load Failed", str(e))
+            return
+        finally:
+            dialog.close()
+        self.survival_curves = curves
+        self.statusBar().showMessage(
+            f"Loaded Kaplan-Meier curves for {len(curves)} failure modes from {file_path}", 5000
+        )
+
+    """
+    Imports a supplier FMECA worksheet (CSV or XLSX) into the local table on
+    the writer thread. Invalid values are listed in one report at the end
+    instead of a dialog each; the valid rows are written in one transaction.
+    """
+
+    def import_worksheet(self) -> None:
+        if len(self.journal):
+            # Unsaved edits would otherwise overwrite imported values on the next save
+            save_confirm = QMessageBox.question(
+                self,
+                "Import Worksheet",
+                "Unsaved changes must be saved before importing. Save now?",
+                QMessageBox.Save | QMessageBox.Cancel,
+            )
+            if save_confirm != QMessageBox.Save:
+                return
+            self.save_sql()
+
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Import Worksheet", "", "Worksheets (*.csv *.xlsx);;All Files (*)"
+        )
+        if not file_path:
+            return
+
+        dialog = QProgressDialog("Importing worksheet...", None, 0, 0, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.show()
+        rows_read = [0]
+
+        def progress(done):
+            rows_read[0] = done
+
+        future = self.storage.writer.submit(
+            lambda conn: apply_import(conn, file_path, progress=progress)
+        )
+        while not future.done():
+            dialog.setLabelText(f"Importing worksheet... {rows_read[0]} rows read")
+            QApplication.processEvents()
+            wait([future], timeout=0.05)
+        dialog.close()
+        try:
+            report = future.result()
+        except (ValueError, ImportError, OSError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Import Failed", str(e))
+            return
+
+        self.read_store("local_comp_fails")
+        self.derived.clear()
+        self.update_layout()
+
+        summary = QMessageBox(self)
+        summary.setWindowTitle("Import Worksheet")
+        summary.setText(str(report))
+        if report.errors:
+            summary.setDetailedText(
+                "\n".join(
+                    f"Line {error.line}, {error.column}: {error.message}"
+                    for error in report.errors
+                )
+            )
+        summary.exec()
+
     def ask_questions(self):
         if self.qindex < len(self.questions):
             reply = QMessageBox.question(
@@ -1099,7 +1549,7 @@ class MainWindow(QMainWindow):
     def filter_components(self, search_query):
         filtered_components = [
             component
-            for component in self.components["name"]
+            for component in self.repo.component_names()
             if search_query.lower() in component.lower()
         ]
         self.populate_component_dropdown(filtered_components)
@@ -0,0 +1,89 @@
+# @file bench_importance.py
+# @brief Compares importance sampling with crude Monte Carlo on rare component failures.
+# Exits non-zero if an estimate misses its closed form or needs fewer than 100x fewer trials.
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from scipy.stats import norm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats_and_charts.stats import Fit
+from stats_and_charts.reliability import (
+    DEFAULT_RELATIVE_HALF_WIDTH,
+    estimate_reliability,
+    estimate_unreliability,
+    failure_probabilities,
+)
+
+REQUIRED_SPEEDUP = 100
+
+def weibull(k, rate_per_million_hours):
+    # Uncertain rate with the given scale, in failures per million hours (reliability.RATE_HOURS)
+    return Fit("weibull", (k, rate_per_million_hours), None, None, None)
+
+# (name, rate fits, mission time in hours, logic, k): failure modes at a few per million hours
+CASES = (
+    ("series, 3 modes", [weibull(1.0, 2.0), weibull(1.5, 5.0), weibull(0.8, 1.0)], 100.0, "series", None),
+    ("series, 8 modes", [weibull(1.0 + 0.2 * i, 1.0 + i) for i in range(8)], 10.0, "series", None),
+    ("parallel, 2 modes", [weibull(1.0, 3.0), weibull(1.2, 4.0)], 1000.0, "parallel", None),
+    ("2-of-4", [weibull(1.0, 2.0)] * 4, 500.0, "k-of-n", 2),
+)
+
+# The probability that at least m of the independent modes fail (Poisson binomial tail)
+def exact_unreliability(p, m):
+    counts = np.zeros(len(p) + 1)
+    counts[0] = 1.0
+    for probability in p:
+        counts[1:] = counts[1:] * (1 - probability) + counts[:-1] * probability
+        counts[0] *= 1 - probability
+    return float(counts[m:].sum())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks importance sampling against crude Monte Carlo")
+    parser.add_argument("--relative-half-width", type=float, default=DEFAULT_RELATIVE_HALF_WIDTH)
+    parser.add_argument("--crude-trials", type=int, default=2_000_000, help="trials given to crude sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    z = norm.ppf(0.975)
+    failures = 0
+    for name, fits, mission_time, logic, k in CASES:
+        p = failure_probabilities(fits, mission_time)
+        m = {"series": 1, "parallel": len(fits), "k-of-n": len(fits) - (k or 0) + 1}[logic]
+        exact = exact_unreliability(p, m)
+
+        start = time.perf_counter()
+        estimate = estimate_unreliability(
+            fits, mission_time, logic=logic, k=k, relative_half_width=args.relative_half_width, rng=rng
+        )
+        importance_time = time.perf_counter() - start
+        start = time.perf_counter()
+        crude = estimate_reliability(fits, mission_time, logic=logic, k=k, half_width=0.0,
+                                     max_trials=args.crude_trials, rng=rng)
+        crude_time = time.perf_counter() - start
+
+        # Crude trials for the same relative half-width: z^2 (1 - Q) / (Q r^2),
+        # against every trial importance sampling drew, the cross-entropy pilot included
+        needed = z * z * (1 - exact) / (exact * args.relative_half_width ** 2)
+        total_trials = estimate.trials + estimate.pilot_trials
+        speedup = needed / total_trials
+        off = abs(estimate.unreliability - exact) / estimate.std_error if estimate.std_error > 0 else 0.0
+        failed = speedup < REQUIRED_SPEEDUP or off > 4 or not estimate.converged
+        failures += failed
+        print(f"{name}: 1 - R = {exact:.4g}")
+        print(f"  importance: {estimate.unreliability:.4g} +- {estimate.std_error:.2g} ({off:.1f} se from exact) "
+              f"in {estimate.trials} + {estimate.pilot_trials} pilot trials, {importance_time:.2f}s; "
+              f"effective trials {estimate.effective_trials:.0f}")
+        print(f"  crude:      {crude.trials - crude.survivals} failures in {crude.trials} trials, {crude_time:.2f}s; "
+              f"needs {needed:.3g} trials for {args.relative_half_width:.0%}")
+        print(f"  {speedup:.3g}x fewer trials{'  FAILED' if failed else ''}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# @file bench_sampler.py
+# @brief Compares sampling through the tabulated inverse CDFs with NumPy's samplers and scipy's rvs/ppf.
+# Exits non-zero if a table's quantiles are further from scipy's ppf than its rtol.
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats_and_charts.stats import Fit, frozen_distribution
+from stats_and_charts.sampler import QuantileTableCache, DEFAULT_RTOL, DEFAULT_BLOCK_SIZE, sample_fit
+
+FITS = (
+    Fit("weibull", (0.7, 500.0), None, None, None),
+    Fit("weibull", (2.5, 500.0), None, None, None),
+    Fit("rayleigh", (400.0,), None, None, None),
+    Fit("exponential", (500.0,), None, None, None),
+    Fit("lognormal", (0.8, 500.0), None, None, None),
+    Fit("gamma", (0.5, 500.0), None, None, None),
+    Fit("gamma", (4.0, 500.0), None, None, None),
+)
+
+# NumPy's own sampler for each fit, as the plots call them
+def numpy_sample(fit, n, rng):
+    *shape, scale = fit.params
+    match fit.distribution:
+        case "weibull":
+            return scale * rng.weibull(shape[0], n)
+        case "rayleigh":
+            return rng.rayleigh(scale, n)
+        case "exponential":
+            return rng.exponential(scale, n)
+        case "lognormal":
+            return rng.lognormal(np.log(scale), shape[0], n)
+        case "gamma":
+            return rng.gamma(shape[0], scale, n)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+# Largest relative error of the table's quantiles over probabilities spanning both tails
+def table_error(table, fit):
+    p = np.concatenate([np.logspace(-12, -3, 500), np.linspace(1e-3, 1 - 1e-3, 100_001), 1 - np.logspace(-3, -12, 500)])
+    reference = frozen_distribution(fit).ppf(p)
+    ok = reference > 0
+    return float(np.max(np.abs(table.ppf(p, fit.params[-1])[ok] / reference[ok] - 1)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks and checks the tabulated inverse-CDF sampler")
+    parser.add_argument("--samples", type=int, default=10_000_000, help="samples drawn per fit by each path")
+    parser.add_argument("--rtol", type=float, default=DEFAULT_RTOL)
+    args = parser.parse_args(argv)
+
+    n = args.samples
+    rng = np.random.default_rng(0)
+    tables = QuantileTableCache()
+    failures = 0
+    print(f"{'fit':24s} {'build':>9s} {'table':>9s} {'numpy':>9s} {'rvs':>9s} {'ppf':>9s}   error (rtol {args.rtol:.0e})")
+    for fit in FITS:
+        (table, _), build_time = timed(tables.for_fit, fit, args.rtol)
+        sample_fit(fit, 1000, rng, tables=tables)
+        _, table_time = timed(sample_fit, fit, n, rng, DEFAULT_BLOCK_SIZE, tables)
+        _, numpy_time = timed(numpy_sample, fit, n, rng)
+        distribution = frozen_distribution(fit)
+        _, rvs_time = timed(distribution.rvs, n, rng)
+        _, ppf_time = timed(distribution.ppf, rng.random(n))
+        error = table_error(table, fit)
+        failures += error > args.rtol
+        name = f"{fit.distribution}{fit.params}"
+        print(f"{name:24s} {build_time * 1000:7.1f}ms {table_time * 1000:7.0f}ms {numpy_time * 1000:7.0f}ms "
+              f"{rvs_time * 1000:7.0f}ms {ppf_time * 1000:7.0f}ms   {error:.2e} ({len(table)} knots)")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
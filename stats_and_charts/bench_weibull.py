@@ -0,0 +1,85 @@
+# @file bench_weibull.py
+# @brief Times the batched Weibull/Rayleigh fits against one scipy minimize per LB/BE/UB triple
+# (how _weibull and _rayleigh used to fit). Accuracy is checked by tests/test_stats.py.
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from scipy.optimize import minimize, Bounds
+from scipy.special import gamma
+from scipy.stats import weibull_min
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats_and_charts.stats import (
+    fit_weibull_batch,
+    fit_rayleigh_batch,
+    weibull_objective,
+    rayleigh_objective,
+)
+
+# Triples from known (k, lam) with multiplicative noise, like hand-entered estimates
+def make_triples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    k = rng.uniform(0.5, 5.0, n)
+    lam = rng.uniform(1.0, 1000.0, n)
+    noise = rng.lognormal(0.0, 0.2, (3, n))
+    lb = weibull_min.ppf(0.05, k, scale=lam) * noise[0]
+    be = lam * np.exp(gamma(1 + 1 / k) / 2) * noise[1]
+    ub = weibull_min.ppf(0.95, k, scale=lam) * noise[2]
+    return lb, be, ub
+
+# The fit _weibull did for each triple
+def per_call(lb, be, ub):
+    bounds = Bounds([0.01, 0.01], [np.inf, np.inf])
+    for values in zip(lb, be, ub):
+        minimize(weibull_objective, [1.0, 1.0], args=(np.array(values),), bounds=bounds)
+
+# The fit _rayleigh did for each triple
+def per_call_rayleigh(lb, be, ub):
+    bounds = Bounds([0.01], [np.inf])
+    for values in zip(lb, be, ub):
+        minimize(rayleigh_objective, [1.0], args=(np.array(values),), bounds=bounds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the batched Weibull and Rayleigh fits")
+    parser.add_argument("--triples", type=int, default=100_000, help="triples fitted in one batch")
+    parser.add_argument("--per-call", type=int, default=500,
+                        help="triples fitted one call at a time (the throughput is extrapolated)")
+    args = parser.parse_args(argv)
+
+    lb, be, ub = make_triples(args.triples)
+
+    start = time.perf_counter()
+    k, lam, converged = fit_weibull_batch(lb, be, ub)
+    batch_time = time.perf_counter() - start
+
+    n = min(args.per_call, args.triples)
+    start = time.perf_counter()
+    with np.errstate(all="ignore"):
+        per_call(lb[:n], be[:n], ub[:n])
+    per_call_time = time.perf_counter() - start
+
+    batch_rate = args.triples / batch_time
+    per_call_rate = n / per_call_time
+    print(f"{args.triples} triples in one batch: {batch_time * 1000:9.1f} ms ({batch_rate:12,.0f} fits/s), "
+          f"{converged.mean():.2%} converged")
+    print(f"{n} triples one call each:  {per_call_time * 1000:9.1f} ms ({per_call_rate:12,.0f} fits/s)")
+    print(f"speedup: {batch_rate / per_call_rate:,.0f}x")
+
+    start = time.perf_counter()
+    fit_rayleigh_batch(lb, be, ub)
+    rayleigh_time = time.perf_counter() - start
+    start = time.perf_counter()
+    per_call_rayleigh(lb[:n], be[:n], ub[:n])
+    rayleigh_per_call_time = time.perf_counter() - start
+    rayleigh_rate = args.triples / rayleigh_time
+    rayleigh_per_call_rate = n / rayleigh_per_call_time
+    print(f"rayleigh, closed form:    {rayleigh_time * 1000:9.1f} ms ({rayleigh_rate:12,.0f} fits/s)")
+    print(f"rayleigh, one call each:  {rayleigh_per_call_time * 1000:9.1f} ms ({rayleigh_per_call_rate:12,.0f} fits/s)")
+    print(f"speedup: {rayleigh_rate / rayleigh_per_call_rate:,.0f}x")
+
+if __name__ == "__main__":
+    main()
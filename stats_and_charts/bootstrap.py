@@ -0,0 +1,192 @@
+# @file bootstrap.py
+# @brief Perturbation bootstrap confidence intervals for the Weibull/Rayleigh fits
+
+import os
+import time
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from stats_and_charts.stats import fit_weibull, fit_rayleigh, fit_weibull_batch, fit_rayleigh_batch
+
+# How each replicate perturbs LB/BE/UB, each bound independently:
+#   lognormal: value * exp(N(0, scale)), so bounds stay positive
+#   normal:    value * (1 + N(0, scale)), clipped at 0
+ERROR_MODELS = ("lognormal", "normal")
+
+PARAM_NAMES = {"weibull": ("k", "lam"), "rayleigh": ("sigma",)}
+
+DEFAULT_REPLICATES = 5_000
+# Replicates per work unit sent to a worker process
+DEFAULT_BATCH_SIZE = 1_000
+
+# Under a time budget, batches start at this size (at most) until a rate is
+# measured, then are sized to take this fraction of the time left, so a batch
+# still running at the deadline overruns it by little
+BUDGET_FIRST_BATCH = 100
+BUDGET_BATCH_FRACTION = 0.1
+
+BootstrapResult = namedtuple(
+    "BootstrapResult", ["fit", "intervals", "replicates", "elapsed", "timed_out"]
+)
+
+def perturb(values, n, error_model="lognormal", scale=0.2, rng=None) -> np.ndarray:
+    rng = np.random.default_rng() if rng is None else rng
+    values = np.asarray(values, dtype=np.float64)
+    noise = rng.standard_normal((n, 3)) * scale
+    if error_model == "lognormal":
+        return values * np.exp(noise)
+    if error_model == "normal":
+        return np.maximum(values * (1 + noise), 0.0)
+    raise ValueError(f"unknown error model: {error_model}")
+
+# Work unit run in a worker process: fits n perturbed copies of one triple
+def _replicate_batch(values, distribution, n, error_model, scale, seed) -> np.ndarray:
+    samples = perturb(values, n, error_model, scale, np.random.default_rng(seed))
+    if distribution == "weibull":
+        # Unconverged replicates are kept: they stall in flat valleys of the
+        # objective, and dropping them would bias the interval
+        k, lam, _ = fit_weibull_batch(*samples.T)
+        return np.stack([k, lam], axis=-1)
+    return fit_rayleigh_batch(*samples.T)[:, None]
+
+"""
+
+   Name: _Batches
+   Type: class
+   Description: Splits the replicates into work units. Without a deadline every
+   unit is batch_size replicates. With one, units are sized from the
+   replicates per second measured on finished units (see record()), capped at
+   batch_size. Seeds are spawned in order, so a seed gives the same draws for
+   the same unit sizes.
+
+"""
+
+class _Batches:
+    def __init__(self, replicates, batch_size, deadline, seed):
+        self.left = replicates
+        self.batch_size = batch_size
+        self.deadline = deadline
+        self.seeds = np.random.SeedSequence(seed)
+        self.done = 0
+        self.seconds = 0.0
+
+    # Size and seed of the next unit, or None when every replicate is handed out
+    def next(self):
+        if self.left <= 0:
+            return None
+        n = min(self.batch_size, self.left)
+        if self.deadline is not None:
+            if self.done:
+                remaining = max(self.deadline - time.perf_counter(), 0)
+                n = min(n, max(1, int(self.done / self.seconds * remaining * BUDGET_BATCH_FRACTION)))
+            else:
+                n = min(n, BUDGET_FIRST_BATCH)
+        self.left -= n
+        return n, self.seeds.spawn(1)[0]
+
+    def record(self, n, seconds) -> None:
+        self.done += n
+        self.seconds += max(seconds, 1e-9)
+
+"""
+
+   Name: bootstrap_fit
+   Type: function
+   Description: Point fit for an LB/BE/UB triple plus percentile confidence
+   intervals for its parameters. Refits replicates of the triple perturbed
+   under error_model, in batches across worker processes (workers=0 runs them
+   here). With time_budget (seconds), batches are kept small enough to end
+   near the deadline; when it passes, queued batches are cancelled, running
+   ones are abandoned without waiting, and the replicates finished so far are
+   used. intervals maps each parameter name to (low, high).
+
+"""
+
+def bootstrap_fit(values, distribution="weibull", replicates=DEFAULT_REPLICATES, error_model="lognormal",
+                  scale=0.2, confidence=0.95, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                  time_budget=None, seed=None) -> BootstrapResult:
+    if distribution not in PARAM_NAMES:
+        raise ValueError(f"unknown distribution: {distribution}")
+    if error_model not in ERROR_MODELS:
+        raise ValueError(f"unknown error model: {error_model}")
+    start = time.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+    values = np.asarray(values, dtype=np.float64)
+    fit = fit_weibull(values) if distribution == "weibull" else fit_rayleigh(values)
+
+    batches = _Batches(replicates, batch_size, deadline, seed)
+    results, timed_out = [], False
+    if workers == 0:
+        while (unit := batches.next()) is not None:
+            if deadline is not None and time.perf_counter() >= deadline:
+                timed_out = True
+                break
+            n, unit_seed = unit
+            submitted = time.perf_counter()
+            results.append(_replicate_batch(values, distribution, n, error_model, scale, unit_seed))
+            batches.record(n, time.perf_counter() - submitted)
+    else:
+        workers = workers or os.cpu_count() or 1
+        # Not a with block: its exit would wait for batches still running at the deadline
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending, exhausted = {}, False
+            while True:
+                # Keep every worker busy without queueing work the budget can't cover
+                while not exhausted and len(pending) < 2 * workers:
+                    unit = batches.next()
+                    if unit is None:
+                        exhausted = True
+                        break
+                    n, unit_seed = unit
+                    future = executor.submit(_replicate_batch, values, distribution, n, error_model, scale, unit_seed)
+                    pending[future] = (n, time.perf_counter())
+                if not pending:
+                    break
+                timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+                finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    n, submitted = pending.pop(future)
+                    results.append(future.result())
+                    batches.record(n, time.perf_counter() - submitted)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    timed_out = bool(pending) or not exhausted and batches.left > 0
+                    break
+        finally:
+            executor.shutdown(wait=not timed_out, cancel_futures=True)
+
+    params = np.concatenate(results) if results else np.empty((0, len(PARAM_NAMES[distribution])))
+    tail = (1 - confidence) / 2 * 100
+    intervals = {
+        name: tuple(np.percentile(params[:, i], [tail, 100 - tail])) if len(params) else (np.nan, np.nan)
+        for i, name in enumerate(PARAM_NAMES[distribution])
+    }
+    return BootstrapResult(fit, intervals, len(params), time.perf_counter() - start, timed_out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals for one LB/BE/UB fit")
+    parser.add_argument("bounds", type=float, nargs=3, metavar=("LB", "BE", "UB"))
+    parser.add_argument("--distribution", choices=tuple(PARAM_NAMES), default="weibull")
+    parser.add_argument("--replicates", type=int, default=DEFAULT_REPLICATES)
+    parser.add_argument("--error-model", choices=ERROR_MODELS, default="lognormal")
+    parser.add_argument("--scale", type=float, default=0.2, help="standard deviation of the relative error")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (0: none)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--budget", type=float, help="wall-clock budget in seconds")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    result = bootstrap_fit(
+        args.bounds, args.distribution, args.replicates, args.error_model, args.scale,
+        args.confidence, args.workers, args.batch_size, args.budget, args.seed,
+    )
+    print(f"{args.distribution} fit to {args.bounds}: {result.replicates} replicates "
+          f"in {result.elapsed:.2f}s{' (budget reached)' if result.timed_out else ''}")
+    for name, estimate in zip(PARAM_NAMES[args.distribution], result.fit.params):
+        low, high = result.intervals[name]
+        print(f"  {name} = {estimate:.6g}  {args.confidence:.0%} interval [{low:.6g}, {high:.6g}]")
+
+if __name__ == "__main__":
+    main()
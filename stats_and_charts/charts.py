@@ -18,32 +18,17 @@ class Charts:
         # Clear the existing plot
         self.main_window.main_figure.clear()
 
-        component_data = []
+        view = self.main_window.chart_view()
         threshold = float(self.main_window.threshold_field.text())
 
-        for row in range(self.main_window.table_widget.rowCount()):
-            failure_mode_item = self.main_window.table_widget.item(row, 0)
-            rpn_item = self.main_window.table_widget.item(row, 1)
-            if failure_mode_item and rpn_item:
-                component_data.append(
-                    {
-                        "id": int(row),
-                        "failure_mode": failure_mode_item.text(),
-                        "rpn": float(rpn_item.text()),
-                    }
-                )
-
         # Adjust the subplot for spacing
         self.main_window.main_figure.subplots_adjust(
             left=0.18
         )  # You can adjust the value to suit your needs
 
-        # Extract the failure modes and RPN values
-        ids = [data["id"] for data in component_data]
-        rpn_values = [data["rpn"] for data in component_data]
-
-        # Convert the IDs to integers
-        ids = list(map(int, ids))
+        # Failure mode IDs are the table rows
+        rpn_values = view.rpn.astype(float)
+        ids = np.arange(len(view))
 
         # Create a DataFrame for seaborn
         df = pd.DataFrame({"Failure Mode ID": ids, "RPN": rpn_values})
@@ -52,11 +37,9 @@ class Charts:
         ax = self.main_window.main_figure.add_subplot(111)
 
         # Set the color of the bars based on RPN values
-        colors = ["#5f9ea0" if rpn < threshold else "#FF6961" for rpn in rpn_values]
-        df["Threshold"] = [
-            "Below Threshold" if rpn < threshold else "Above Threshold"
-            for rpn in rpn_values
-        ]
+        df["Threshold"] = np.where(
+            rpn_values < threshold, "Below Threshold", "Above Threshold"
+        )
         sns.barplot(
             x="Failure Mode ID",
             y="RPN",
@@ -97,20 +80,10 @@ class Charts:
         # Clear the existing plot
         self.main_window.main_figure.clear()
 
-        component_data = []
+        view = self.main_window.chart_view()
         threshold = float(self.main_window.threshold_field.text())
-        below_threshold = 0
-        above_threshold = 0
-
-        for row in range(self.main_window.table_widget.rowCount()):
-            failure_mode_item = self.main_window.table_widget.item(row, 0)
-            rpn_item = self.main_window.table_widget.item(row, 1)
-            if failure_mode_item and rpn_item:
-                rpn = float(rpn_item.text())
-                if rpn <= threshold:
-                    below_threshold += 1
-                else:
-                    above_threshold += 1
+        below_threshold = int(np.count_nonzero(view.rpn <= threshold))
+        above_threshold = len(view) - below_threshold
 
         # Prepare the data for the pie chart
         labels = ["Below Risk\nThreshold", "Above Risk\nThreshold"]
@@ -245,38 +218,17 @@ class Charts:
     """
 
     def scatterplot(self):
-        component_data = []
-        threshold = float(self.main_window.threshold_field.text())
-
-        for row in range(self.main_window.table_widget.rowCount()):
-            frequency_item = self.main_window.table_widget.item(row, 2)
-            severity_item = self.main_window.table_widget.item(row, 3)
-            detection_item = self.main_window.table_widget.item(row, 4)
-            if severity_item and detection_item and frequency_item:
-                component_data.append(
-                    {
-                        "id": int(row),
-                        "severity": float(severity_item.text()),
-                        "detection": float(detection_item.text()),
-                        "frequency": float(frequency_item.text()),
-                    }
-                )
+        view = self.main_window.chart_view()
 
         # Clear the existing plot
         self.main_window.main_figure.clear()
 
-        # Extract the values
-        ids = [data["id"] for data in component_data]
-        severity_values = [data["severity"] for data in component_data]
-        detection_values = [data["detection"] for data in component_data]
-        frequency_values = [data["frequency"] for data in component_data]
-
         df = pd.DataFrame(
             {
-                "Failure Mode ID": ids,
-                "Severity": severity_values,
-                "Detection": detection_values,
-                "Frequency": frequency_values,
+                "Failure Mode ID": np.arange(len(view)),
+                "Severity": view.severity.astype(float),
+                "Detection": view.detection.astype(float),
+                "Frequency": view.frequency.astype(float),
             }
         )
 
@@ -313,36 +265,14 @@ class Charts:
     """
 
     def bubble_plot(self):
-        component_data = []
-        threshold = float(self.main_window.threshold_field.text())
+        view = self.main_window.chart_view()
+        severity_values = view.severity.astype(float)
+        detection_values = view.detection.astype(float)
+        frequency_values = view.frequency.astype(float)
 
-        for row in range(self.main_window.table_widget.rowCount()):
-            frequency_item = self.main_window.table_widget.item(row, 2)
-            severity_item = self.main_window.table_widget.item(row, 3)
-            detection_item = self.main_window.table_widget.item(row, 4)
-            if severity_item and detection_item and frequency_item:
-                component_data.append(
-                    {
-                        "id": int(row),
-                        "severity": float(severity_item.text()),
-                        "detection": float(detection_item.text()),
-                        "frequency": float(frequency_item.text()),
-                    }
-                )
-
-        ids = [data["id"] for data in component_data]
-        severity_values = [data["severity"] for data in component_data]
-        detection_values = [data["detection"] for data in component_data]
-        frequency_values = [data["frequency"] for data in component_data]
-
-        rpn_values = [
-            data["severity"] * data["detection"] * data["frequency"]
-            for data in component_data
-        ]
+        rpn_values = severity_values * detection_values * frequency_values
 
-        rpn_scaled = [
-            np.cbrt(val) * 30 for val in rpn_values
-        ]  # Adjust scaling factor as needed
+        rpn_scaled = np.cbrt(rpn_values) * 30  # Adjust scaling factor as needed
 
         # Create a 3D plot
         self.main_window.main_figure.clear()
@@ -0,0 +1,404 @@
+# @file reliability.py
+# @brief Monte Carlo reliability of a component from its failure modes' uncertain failure rates
+
+import os
+import sqlite3
+import argparse
+from collections import namedtuple
+import numpy as np
+from scipy.stats import norm
+from scipy.special import expit
+from data.repository import PartRepository
+from stats_and_charts.stats import (
+    Fit,
+    fit_weibull_batch,
+    fit_rayleigh_batch,
+    frozen_distribution,
+    select_model_batch,
+    selection_fit,
+)
+from stats_and_charts.sampler import fit_quantiles
+
+# LB/BE/UB are failure rates in failures per RATE_HOURS hours (criticality.py reads
+# best_estimate the same way); mission times are in hours. A failure mode's fit is
+# the distribution of its uncertain rate, and given a rate, the mode fails at a
+# constant rate: exponential failure times.
+RATE_HOURS = 1e6
+
+# How a component's rows are turned into rate fits (see rate_fits)
+RATE_DISTRIBUTIONS = ("weibull", "rayleigh", "best")
+
+# Trials sampled per block; memory is O(block_size * number of failure modes)
+DEFAULT_BLOCK_SIZE = 100_000
+
+DEFAULT_HALF_WIDTH = 1e-3
+DEFAULT_MAX_TRIALS = 10_000_000
+
+# How failure modes combine: series fails at the first failure mode, parallel
+# (fully redundant) at the last, and "k-of-n" survives while k modes survive
+LOGICS = ("series", "parallel", "k-of-n")
+
+ReliabilityEstimate = namedtuple(
+    "ReliabilityEstimate", ["trials", "survivals", "reliability", "lower", "upper", "converged"]
+)
+
+# Importance sampling stops once the interval's half-width is this fraction of the unreliability
+DEFAULT_RELATIVE_HALF_WIDTH = 0.01
+# Cross-entropy refinements of the tilted failure probabilities, each on CE_PILOT_SIZE pilot trials
+CE_ITERATIONS = 3
+CE_PILOT_SIZE = 10_000
+# Least survival probability a tilt leaves a mode whose survival can still fail the system,
+# so no failing combination is left unsampled
+CE_MIN_SURVIVAL = 1e-3
+# Share of the initial tilt every mode keeps through cross-entropy, so a mode the pilot trials
+# happened not to fail isn't left at its nominal (rare) probability with heavy-tailed weights
+CE_DEFENSIVE_SHARE = 0.1
+
+# unreliability (1 - R) with its standard error and interval, plus diagnostics:
+#   pilot_trials:     trials spent fitting the tilt by cross-entropy, not counted in trials
+#   effective_trials: Kish's effective sample size of the failing trials' weights
+#   max_weight_share: the largest single weight over their sum (near 1: one trial dominates)
+#   crude_trials:     trials crude sampling would need for the same standard error
+#   probabilities:    each mode's tilted probability of failing by mission time
+ImportanceEstimate = namedtuple(
+    "ImportanceEstimate",
+    ["trials", "pilot_trials", "unreliability", "std_error", "lower", "upper", "effective_trials",
+     "max_weight_share", "crude_trials", "converged", "probabilities"],
+)
+
+# Rates drawn from fits (from stats.fit_*), one column per fit, from unit exponentials.
+# A fit of None is a mode without spread, held at its fixed rate.
+def sample_rates(fits, exponentials: np.ndarray, fixed=None) -> np.ndarray:
+    rates = np.empty_like(exponentials)
+    for i, fit in enumerate(fits):
+        if fit is None:
+            rates[:, i] = fixed[i]
+        elif fit.distribution == "weibull":
+            k, lam = fit.params
+            # Inverse CDF: lam * (-ln U) ** (1 / k), and -ln U is a unit exponential
+            rates[:, i] = lam * exponentials[:, i] ** (1 / k)
+        elif fit.distribution == "rayleigh":
+            (sigma,) = fit.params
+            rates[:, i] = sigma * np.sqrt(2 * exponentials[:, i])
+        else:
+            # No cheap closed form: through the fit's tabulated inverse CDF
+            rates[:, i] = fit_quantiles(fit, exponentials[:, i])
+    return rates
+
+# Hours to failure of modes failing at the given rates (per RATE_HOURS), from unit exponentials
+def rate_failure_times(rates: np.ndarray, exponentials: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return exponentials / rates * RATE_HOURS
+
+# Failure times in hours: each trial draws every mode's rate, then its time to failure at that rate
+def sample_failure_times(fits, rate_exponentials: np.ndarray, time_exponentials: np.ndarray,
+                         fixed=None) -> np.ndarray:
+    return rate_failure_times(sample_rates(fits, rate_exponentials, fixed), time_exponentials)
+
+def system_failure_times(times: np.ndarray, logic="series", k=None) -> np.ndarray:
+    if logic == "series":
+        return times.min(axis=1)
+    if logic == "parallel":
+        return times.max(axis=1)
+    if logic == "k-of-n":
+        n = times.shape[1]
+        if k is None or not 1 <= k <= n:
+            raise ValueError(f"k-of-n needs 1 <= k <= {n}")
+        # The system fails when fewer than k modes are left: at the (n - k + 1)-th failure
+        return np.partition(times, n - k, axis=1)[:, n - k]
+    raise ValueError(f"unknown logic: {logic}")
+
+# Wilson score interval for a binomial proportion; stays inside [0, 1] at 0 or n successes
+def wilson_interval(successes: int, trials: int, confidence=0.95):
+    z = norm.ppf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half = z * np.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+"""
+
+   Name: simulate_reliability
+   Type: function
+   Description: Estimates the probability that a component survives to
+   mission_time (hours), given one rate fit per failure mode (None: fixed at
+   fixed[i]) combined under logic. Samples
+   block_size trials at a time and yields a ReliabilityEstimate after every
+   block, stopping once the confidence interval's half-width is at most
+   half_width (or after max_trials). Only running counts are kept, so memory
+   doesn't grow with the number of trials.
+
+"""
+
+def simulate_reliability(fits, mission_time, logic="series", k=None, block_size=DEFAULT_BLOCK_SIZE,
+                         half_width=DEFAULT_HALF_WIDTH, confidence=0.95,
+                         max_trials=DEFAULT_MAX_TRIALS, rng=None, fixed=None):
+    fits = list(fits)
+    if not fits:
+        raise ValueError("no failure modes to simulate")
+    rng = np.random.default_rng() if rng is None else rng
+
+    trials = survivals = 0
+    exponentials = np.empty((2, block_size, len(fits)))
+    while trials < max_trials:
+        n = min(block_size, max_trials - trials)
+        block = exponentials[:, :n]
+        rng.standard_exponential(out=block)
+        times = system_failure_times(sample_failure_times(fits, block[0], block[1], fixed), logic, k)
+        survivals += int(np.count_nonzero(times > mission_time))
+        trials += n
+
+        lower, upper = wilson_interval(survivals, trials, confidence)
+        converged = (upper - lower) / 2 <= half_width
+        yield ReliabilityEstimate(trials, survivals, survivals / trials, lower, upper, converged)
+        if converged:
+            return
+
+# Runs simulate_reliability to the end and returns its last estimate
+def estimate_reliability(fits, mission_time, **kwargs) -> ReliabilityEstimate:
+    estimate = None
+    for estimate in simulate_reliability(fits, mission_time, **kwargs):
+        pass
+    return estimate
+
+# Each mode's probability of failing by mission_time: 1 - exp(-rate * mission_time / RATE_HOURS)
+# averaged over its rate fit, accurate down to the smallest rates
+def failure_probabilities(fits, mission_time, fixed=None) -> np.ndarray:
+    exposure = mission_time / RATE_HOURS
+    probabilities = np.empty(len(fits))
+    for i, fit in enumerate(fits):
+        if fit is None:
+            probabilities[i] = -np.expm1(-fixed[i] * exposure)
+        else:
+            probabilities[i] = frozen_distribution(fit).expect(
+                lambda rate: -np.expm1(-rate * exposure), epsabs=0, epsrel=1e-10, limit=200
+            )
+    return probabilities
+
+# Failed modes that fail the system under logic: it fails at the (n - k + 1)-th failure
+def _failures_needed(n, logic="series", k=None) -> int:
+    if logic == "series":
+        return 1
+    if logic == "parallel":
+        return n
+    if logic == "k-of-n":
+        if k is None or not 1 <= k <= n:
+            raise ValueError(f"k-of-n needs 1 <= k <= {n}")
+        return n - k + 1
+    raise ValueError(f"unknown logic: {logic}")
+
+# Which modes fail in each of n trials drawn at tilted probabilities q, and each trial's log likelihood ratio
+def _tilted_block(p, q, n, rng):
+    failed = rng.random((n, len(q))) < q
+    # A mode certain to fail (p = q = 1) has no survival ratio, but never survives either
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio_failed = np.log(p) - np.log(q)
+        log_ratio_survived = np.log1p(-p) - np.log1p(-q)
+    return failed, np.sum(np.where(failed, log_ratio_failed, log_ratio_survived), axis=1)
+
+"""
+
+   Name: tilted_probabilities
+   Type: function
+   Description: Importance sampling distribution for at least m of the
+   modes failing, as raised per-mode failure probabilities. Starts from the
+   exponential tilt (the same shift of every mode's log odds) that makes m
+   failures the expected count, then refines each probability by
+   cross-entropy: the likelihood-ratio-weighted share of failing pilot
+   trials in which that mode failed, kept above CE_DEFENSIVE_SHARE of the
+   initial tilt. Tilts never lower a probability. With full_output, also
+   returns the number of pilot trials sampled.
+
+"""
+
+def tilted_probabilities(p, m, pilot_size=CE_PILOT_SIZE, rng=None, full_output=False):
+    rng = np.random.default_rng() if rng is None else rng
+    p = np.asarray(p, dtype=np.float64)
+    upper = np.ones_like(p) if m == len(p) else np.maximum(p, 1 - CE_MIN_SURVIVAL)
+    with np.errstate(divide="ignore"):
+        log_odds = np.log(p) - np.log1p(-p)
+
+    def expected_failures(shift):
+        return np.sum(np.minimum(expit(log_odds + shift), upper))
+
+    low, high = 0.0, 1.0
+    if expected_failures(low) >= m:
+        q = p.copy()
+    else:
+        while expected_failures(high) < m and high < 1e4:
+            low, high = high, 2 * high
+        for _ in range(100):
+            mid = (low + high) / 2
+            low, high = (mid, high) if expected_failures(mid) < m else (low, mid)
+        q = np.minimum(expit(log_odds + high), upper)
+
+    lower = np.maximum(p, CE_DEFENSIVE_SHARE * q)
+    pilot_trials = 0
+    for _ in range(CE_ITERATIONS):
+        failed, log_weights = _tilted_block(p, q, pilot_size, rng)
+        pilot_trials += pilot_size
+        system_failed = failed.sum(axis=1) >= m
+        if not system_failed.any():
+            break
+        weights = np.exp(log_weights[system_failed] - log_weights[system_failed].max())
+        q = np.clip(weights @ failed[system_failed] / weights.sum(), lower, upper)
+    if full_output:
+        return q, pilot_trials
+    return q
+
+"""
+
+   Name: simulate_unreliability
+   Type: function
+   Description: Importance-sampling estimate of the probability that a
+   component fails by mission_time, for failures too rare to see by crude
+   sampling. At a fixed mission time only which modes have failed matters,
+   so each trial draws mode failures at the tilted_probabilities (fitted on
+   separate pilot trials, so the estimate stays unbiased) and weighs a
+   system failure by its likelihood ratio. Samples block_size trials at a
+   time and yields an ImportanceEstimate after every block, stopping once
+   the interval's half-width is at most relative_half_width of the estimate
+   (or after max_trials).
+
+"""
+
+def simulate_unreliability(fits, mission_time, logic="series", k=None, block_size=DEFAULT_BLOCK_SIZE,
+                           relative_half_width=DEFAULT_RELATIVE_HALF_WIDTH, confidence=0.95,
+                           max_trials=DEFAULT_MAX_TRIALS, rng=None, fixed=None):
+    fits = list(fits)
+    if not fits:
+        raise ValueError("no failure modes to simulate")
+    rng = np.random.default_rng() if rng is None else rng
+    p = failure_probabilities(fits, mission_time, fixed)
+    m = _failures_needed(len(fits), logic, k)
+    if np.count_nonzero(p > 0) < m:
+        # Too few modes can fail at all
+        yield ImportanceEstimate(0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, np.nan, np.inf, True, p)
+        return
+    q, pilot_trials = tilted_probabilities(p, m, min(block_size, CE_PILOT_SIZE), rng, full_output=True)
+    z = norm.ppf(0.5 + confidence / 2)
+
+    trials = 0
+    total = total_squares = largest = 0.0
+    while trials < max_trials:
+        n = min(block_size, max_trials - trials)
+        failed, log_weights = _tilted_block(p, q, n, rng)
+        weights = np.exp(log_weights[failed.sum(axis=1) >= m])
+        total += weights.sum()
+        total_squares += np.sum(weights * weights)
+        largest = max(largest, weights.max(initial=0.0))
+        trials += n
+
+        unreliability = total / trials
+        std_error = np.sqrt(max(total_squares / trials - unreliability ** 2, 0.0) / trials)
+        effective = total ** 2 / total_squares if total_squares > 0 else 0.0
+        crude = max(unreliability * (1 - unreliability), 0.0) / std_error ** 2 if std_error > 0 else np.inf
+        converged = bool(unreliability > 0 and z * std_error <= relative_half_width * unreliability)
+        yield ImportanceEstimate(
+            trials, pilot_trials, unreliability, std_error, max(unreliability - z * std_error, 0.0),
+            min(unreliability + z * std_error, 1.0), effective, largest / total if total > 0 else np.nan,
+            crude, converged, q,
+        )
+        if converged:
+            return
+
+# Runs simulate_unreliability to the end and returns its last estimate
+def estimate_unreliability(fits, mission_time, **kwargs) -> ImportanceEstimate:
+    estimate = None
+    for estimate in simulate_unreliability(fits, mission_time, **kwargs):
+        pass
+    return estimate
+
+# Closed-form reliability for series/parallel logic, e.g. to check the simulation
+def exact_reliability(fits, mission_time, logic="series", fixed=None) -> float:
+    failure = failure_probabilities(fits, mission_time, fixed)
+    if logic == "series":
+        return float(np.exp(np.sum(np.log1p(-failure))))
+    if logic == "parallel":
+        return float(1 - np.prod(failure))
+    raise ValueError(f"no closed form for logic: {logic}")
+
+"""
+Rate fits for a component's rows: each row's LB/BE/UB fitted by distribution
+("best": each row's best-scoring model). Rows without spread (LB = UB) get
+None and are held at their BE, which is returned as the fixed rates.
+"""
+
+def rate_fits(bounds: np.ndarray, distribution="weibull"):
+    bounds = np.asarray(bounds, dtype=np.float64)
+    spread = bounds[:, 2] > bounds[:, 0]
+    fits = [None] * len(bounds)
+    if spread.any():
+        lb, be, ub = bounds[spread].T
+        if distribution == "weibull":
+            k, lam, _ = fit_weibull_batch(lb, be, ub)
+            fitted = [Fit("weibull", params, None, None, None) for params in zip(k.tolist(), lam.tolist())]
+        elif distribution == "rayleigh":
+            fitted = [Fit("rayleigh", (sigma,), None, None, None) for sigma in fit_rayleigh_batch(lb, be, ub).tolist()]
+        elif distribution == "best":
+            selection = select_model_batch(lb, be, ub)
+            fitted = [selection_fit(*row) for row in zip(selection.distribution, selection.shape,
+                                                         selection.scale, selection.residual)]
+        else:
+            raise ValueError(f"unknown distribution: {distribution}")
+        for i, fit in zip(np.flatnonzero(spread), fitted):
+            fits[i] = fit
+    return fits, bounds[:, 1].copy()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo reliability of one component at its mission time")
+    parser.add_argument("component", help="component name")
+    parser.add_argument("--db", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "part_info.db"))
+    parser.add_argument("--distribution", choices=RATE_DISTRIBUTIONS, default="weibull",
+                        help="distribution of each failure mode's rate (per million hours)")
+    parser.add_argument("--logic", choices=LOGICS, default="series")
+    parser.add_argument("-k", type=int, help="surviving modes needed for k-of-n")
+    parser.add_argument("--mission-time", type=float,
+                        help="hours; default: the longest mission_time of the component's failure modes")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--half-width", type=float, default=DEFAULT_HALF_WIDTH)
+    parser.add_argument("--max-trials", type=int, default=DEFAULT_MAX_TRIALS)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--importance", action="store_true",
+                        help="estimate the (rare) failure probability by importance sampling")
+    parser.add_argument("--relative-half-width", type=float, default=DEFAULT_RELATIVE_HALF_WIDTH,
+                        help="with --importance: target half-width relative to the estimate")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        repo = PartRepository(conn)
+        rows = repo.failure_modes(repo.component_id(args.component))
+    finally:
+        conn.close()
+    if not len(rows.index):
+        parser.error(f"no failure modes for component: {args.component}")
+
+    fits, fixed = rate_fits(rows[["lower_bound", "best_estimate", "upper_bound"]].to_numpy(np.float64),
+                            args.distribution)
+    mission_time = args.mission_time if args.mission_time is not None else float(rows["mission_time"].max())
+
+    print(f"{args.component}: {len(fits)} failure modes, {args.logic}, mission time {mission_time:g} h")
+    if args.importance:
+        for estimate in simulate_unreliability(
+            fits, mission_time, args.logic, args.k, args.block_size, args.relative_half_width,
+            max_trials=args.max_trials, rng=np.random.default_rng(args.seed), fixed=fixed,
+        ):
+            print(f"  {estimate.trials:10d} trials (+{estimate.pilot_trials} pilot): 1 - R = {estimate.unreliability:.5g} "
+                  f"[{estimate.lower:.5g}, {estimate.upper:.5g}], effective trials {estimate.effective_trials:.0f}, "
+                  f"largest weight share {estimate.max_weight_share:.2g}")
+        print(f"  crude sampling would need {estimate.crude_trials:.3g} trials for the same standard error")
+        return
+    for estimate in simulate_reliability(
+        fits, mission_time, args.logic, args.k, args.block_size, args.half_width,
+        max_trials=args.max_trials, rng=np.random.default_rng(args.seed), fixed=fixed,
+    ):
+        print(f"  {estimate.trials:10d} trials: R = {estimate.reliability:.5f} "
+              f"[{estimate.lower:.5f}, {estimate.upper:.5f}]")
+    if args.logic != "k-of-n":
+        print(f"  closed form: R = {exact_reliability(fits, mission_time, args.logic, fixed):.5f}")
+
+if __name__ == "__main__":
+    main()
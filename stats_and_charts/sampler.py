@@ -0,0 +1,175 @@
+# @file sampler.py
+# @brief Tabulated inverse CDFs for drawing large blocks of samples from fitted distributions
+
+from collections import OrderedDict, namedtuple
+import numpy as np
+from scipy.special import ndtri, gammaincinv, gammainccinv, gammaln
+
+# Tables are indexed by ln E for a unit exponential E, the variate the Monte
+# Carlo code already draws: F^-1(1 - exp(-E)) is a sample. Outside this range
+# a draw is clipped to the end of the table; E is below exp(-40) or above
+# exp(4) with probability about 1e-18 and 1e-24.
+LOG_E_RANGE = (-40.0, 4.0)
+
+# Largest relative error of a table's quantiles, checked at every interval
+# midpoint while the table is built
+DEFAULT_RTOL = 1e-6
+MIN_TABLE_KNOTS = 2 ** 8 + 1
+MAX_TABLE_KNOTS = 2 ** 20 + 1
+
+DEFAULT_TABLE_CACHE_SIZE = 64
+
+# Samples drawn per block by sample_fit; small enough that a block's temporaries stay in cache
+DEFAULT_BLOCK_SIZE = 65_536
+
+def _lognormal_log_quantile(log_e, s):
+    e = np.exp(log_e)
+    p, q = -np.expm1(-e), np.exp(-e)
+    # Each half from its own tail so neither loses precision near 1
+    return s * np.where(p < 0.5, ndtri(p), -ndtri(q))
+
+def _gamma_log_quantile(log_e, a):
+    e = np.exp(log_e)
+    p, q = -np.expm1(-e), np.exp(-e)
+    with np.errstate(under="ignore", divide="ignore"):
+        x = np.where(p < 0.5, gammaincinv(a, p), gammainccinv(a, q))
+        # Where the lower tail underflows, P(a, x) ~ x ** a / Gamma(a + 1)
+        return np.where(x > 1e-300, np.log(x), (np.log(p) + gammaln(a + 1)) / a)
+
+# ln F^-1(1 - exp(-E)) for scale = 1, from ln E and the shape parameters (stats.Fit params without the scale)
+UNIT_LOG_QUANTILES = {
+    "weibull": lambda log_e, k: log_e / k,
+    "rayleigh": lambda log_e: (np.log(2) + log_e) / 2,
+    "exponential": lambda log_e: log_e,
+    "lognormal": _lognormal_log_quantile,
+    "gamma": _gamma_log_quantile,
+}
+
+"""
+
+Name: QuantileTable
+Type: class
+Description: A distribution's log quantile for scale 1 as a function of ln E,
+tabulated on an even grid over LOG_E_RANGE and interpolated linearly. The
+grid is doubled until the interpolation is within rtol of the exact value at
+every interval midpoint (up to MAX_TABLE_KNOTS; error holds what was reached).
+Lookups are an index computation and two gathers, whatever the distribution,
+so gamma and lognormal draws cost about what Weibull ones do.
+
+"""
+
+class QuantileTable:
+    def __init__(self, distribution: str, shape=(), rtol=DEFAULT_RTOL):
+        if distribution not in UNIT_LOG_QUANTILES:
+            raise ValueError(f"unknown distribution: {distribution}")
+        self.distribution = distribution
+        self.shape = tuple(float(value) for value in shape)
+        self.rtol = rtol
+
+        exact = UNIT_LOG_QUANTILES[distribution]
+        low, high = LOG_E_RANGE
+        knots = MIN_TABLE_KNOTS
+        values = exact(np.linspace(low, high, knots), *self.shape)
+        while True:
+            midpoints = exact(np.linspace(low, high, 2 * knots - 1)[1::2], *self.shape)
+            self.error = float(np.expm1(np.max(np.abs(midpoints - (values[:-1] + values[1:]) / 2))))
+            if self.error <= rtol or 2 * knots - 1 > MAX_TABLE_KNOTS:
+                break
+            # The midpoints become knots of the doubled grid
+            refined = np.empty(2 * knots - 1)
+            refined[0::2], refined[1::2] = values, midpoints
+            values, knots = refined, 2 * knots - 1
+
+        self.values = values
+        # A repeated last slope so a lookup at the top of the range needs no bounds check
+        self.slopes = np.append(np.diff(values), 0.0)
+        self._inverse_step = (knots - 1) / (high - low)
+
+    def __len__(self):
+        return len(self.values)
+
+    # Interpolated log quantiles at ln E (overwritten when out is log_e)
+    def log_quantile(self, log_e, out=None) -> np.ndarray:
+        low, high = LOG_E_RANGE
+        position = np.clip(log_e, low, high, out=out)
+        position -= low
+        position *= self._inverse_step
+        i = position.astype(np.intp)
+        position -= i
+        position *= self.slopes.take(i)
+        position += self.values.take(i)
+        return position
+
+    # Samples from unit exponentials (overwritten when out is exponentials)
+    def quantiles(self, exponentials, scale=1.0, out=None) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            result = np.log(exponentials, out=out)
+        self.log_quantile(result, out=result)
+        np.exp(result, out=result)
+        result *= scale
+        return result
+
+    def ppf(self, p, scale=1.0) -> np.ndarray:
+        return self.quantiles(-np.log1p(-np.asarray(p, dtype=np.float64)), scale)
+
+TableCacheInfo = namedtuple("TableCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+"""
+
+   Name: QuantileTableCache
+   Type: class
+   Description: LRU memo of QuantileTables keyed on the distribution, its shape
+   parameters and rtol. The scale isn't part of a table, so every fit sharing
+   a shape (all Rayleigh and exponential fits) shares one.
+
+"""
+
+class QuantileTableCache:
+    def __init__(self, maxsize=DEFAULT_TABLE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+
+    def get(self, distribution: str, shape=(), rtol=DEFAULT_RTOL) -> QuantileTable:
+        key = (distribution, tuple(float(value) for value in shape), rtol)
+        table = self._tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(key)
+            return table
+
+        self.misses += 1
+        table = QuantileTable(distribution, key[1], rtol)
+        self._tables[key] = table
+        if len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+        return table
+
+    # The table for a stats.Fit, and the fit's scale (its last parameter)
+    def for_fit(self, fit, rtol=DEFAULT_RTOL):
+        *shape, scale = fit.params
+        return self.get(fit.distribution, shape, rtol), scale
+
+    def clear(self) -> None:
+        self._tables.clear()
+
+    def cache_info(self) -> TableCacheInfo:
+        return TableCacheInfo(self.hits, self.misses, self.maxsize, len(self._tables))
+
+# Shared by the sampling functions unless they're given their own
+TABLES = QuantileTableCache()
+
+# Samples from a fit's distribution (stats.Fit) for unit exponentials, through its cached table
+def fit_quantiles(fit, exponentials, out=None, tables=None) -> np.ndarray:
+    table, scale = (TABLES if tables is None else tables).for_fit(fit)
+    return table.quantiles(exponentials, scale, out)
+
+def sample_fit(fit, n: int, rng=None, block_size=DEFAULT_BLOCK_SIZE, tables=None) -> np.ndarray:
+    rng = np.random.default_rng() if rng is None else rng
+    sample = np.empty(n)
+    for start in range(0, n, block_size):
+        block = sample[start:start + block_size]
+        rng.standard_exponential(out=block)
+        fit_quantiles(fit, block, out=block, tables=tables)
+    return sample
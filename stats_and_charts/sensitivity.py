@@ -0,0 +1,182 @@
+# @file sensitivity.py
+# @brief Sobol sensitivity of a component's reliability or criticality to its failure modes' uncertain rates
+
+import os
+import sqlite3
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from data.repository import PartRepository
+from stats_and_charts.reliability import RATE_DISTRIBUTIONS, RATE_HOURS, rate_fits, sample_rates
+
+# What the indices decompose the variance of:
+#   reliability: exp(-sum of rate * mission_time), each rate in failures per RATE_HOURS
+#   criticality: item criticality Cr, the sum of beta * rate * mission_time
+OUTPUTS = ("reliability", "criticality")
+
+# Saltelli base samples (rows of each of the A and B matrices); a power of two, as Sobol' points need
+DEFAULT_SAMPLES = 2 ** 13
+# Base samples per work unit; each holds a (batch, failure modes) array a few times
+DEFAULT_BATCH_SIZE = 2 ** 10
+
+SensitivityResult = namedtuple(
+    "SensitivityResult", ["first_order", "total", "mean", "variance", "samples", "evaluations"]
+)
+
+# Rates at Sobol' points u (one column per fit); a fit of None is a fixed rate (no spread)
+def _rates(fits, fixed, u) -> np.ndarray:
+    # The unit exponential -ln(1 - u) has the same inverse CDF as reliability's draws
+    return sample_rates(fits, -np.log1p(-u), fixed)
+
+"""
+Work unit run in a worker process: Saltelli sums over base samples
+start:start + n of the scrambled Sobol' sequence (A from its first half of
+dimensions, B from the second). Both outputs are functions of one additive
+score s = sum of coefficient * rate, so the output with mode i's rate taken
+from B differs from the A output only through that one term: every A_B^(i)
+evaluation is O(1) given the A score, and a batch costs O(n * modes) rather
+than O(n * modes^2). Outputs are kept relative to the output at the
+reference rates (reliabilities as a multiple of it) so values near 1 don't
+cancel.
+"""
+
+def _saltelli_sums(fits, fixed, coefficients, reference, output, seed, start, n) -> np.ndarray:
+    d = len(fits)
+    engine = qmc.Sobol(2 * d, scramble=True, seed=seed)
+    if start:
+        engine.fast_forward(start)
+    u = engine.random(n)
+    a = _rates(fits, fixed, u[:, :d])
+    b = _rates(fits, fixed, u[:, d:])
+
+    # Scores relative to the reference score, each failure mode's change kept separately
+    a_terms = (a - reference) * coefficients
+    delta = (b - a) * coefficients
+    score_a = a_terms.sum(axis=1)
+    score_b = score_a + delta.sum(axis=1)
+    if output == "reliability":
+        # In units of the reference reliability (the indices don't depend on the output's scale)
+        value_a = np.expm1(-score_a)
+        value_b = np.expm1(-score_b)
+        # f(A_B^(i)) - f(A) = exp(-s_A) * (exp(-delta_i) - 1), from the one changed term
+        change = (1 + value_a)[:, None] * np.expm1(-delta)
+    else:
+        value_a, value_b = score_a, score_b
+        change = delta
+
+    sums = np.empty(2 * d + 4)
+    sums[:4] = value_a.sum(), np.dot(value_a, value_a), value_b.sum(), np.dot(value_b, value_b)
+    # Saltelli (2010) first-order and Jansen total-effect numerators
+    sums[4:4 + d] = value_b @ change
+    sums[4 + d:] = np.einsum("ij,ij->j", change, change) / 2
+    return sums
+
+"""
+
+   Name: sobol_indices
+   Type: function
+   Description: First-order and total Sobol indices of a component's output
+   (OUTPUTS) with respect to each failure mode's rate, sampled from the fit
+   to its LB/BE/UB (None for a mode without spread, held at fixed). Uses the
+   Saltelli design on scrambled Sobol' points, samples * (modes + 2) model
+   evaluations, in batches across worker processes (workers=0 runs them
+   here). Indices of a fixed mode are 0.
+
+"""
+
+def sobol_indices(fits, fixed, mission_times, output="reliability", beta=1.0, samples=DEFAULT_SAMPLES,
+                  workers=None, batch_size=DEFAULT_BATCH_SIZE, seed=None) -> SensitivityResult:
+    if output not in OUTPUTS:
+        raise ValueError(f"unknown output: {output}")
+    fits = list(fits)
+    d = len(fits)
+    if not d:
+        raise ValueError("no failure modes to analyze")
+    # Both counts rounded up to powers of two so every batch is a balanced run of Sobol' points
+    samples = 1 << max(int(samples) - 1, 1).bit_length()
+    batch_size = min(1 << max(int(batch_size) - 1, 1).bit_length(), samples)
+    fixed = np.asarray(fixed, dtype=np.float64)
+    mission_times = np.asarray(mission_times, dtype=np.float64)
+    coefficients = mission_times / RATE_HOURS if output == "reliability" else beta * mission_times
+    reference = _rates(fits, fixed, np.full((1, d), 0.5))[0]
+    seed = int(np.random.SeedSequence(seed).generate_state(1)[0])
+
+    units = [(fits, fixed, coefficients, reference, output, seed, start, batch_size)
+             for start in range(0, samples, batch_size)]
+    if workers == 0 or len(units) == 1:
+        sums = sum(_saltelli_sums(*unit) for unit in units)
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            sums = sum(executor.map(_saltelli_sums, *zip(*units)))
+
+    sum_a, squares_a, sum_b, squares_b = sums[:4]
+    mean = (sum_a + sum_b) / (2 * samples)
+    variance = (squares_a + squares_b) / (2 * samples) - mean * mean
+    if variance > 0:
+        first_order = sums[4:4 + d] / samples / variance
+        total = sums[4 + d:] / samples / variance
+    else:
+        first_order = total = np.zeros(d)
+    if output == "reliability":
+        unit = np.exp(-np.dot(reference, coefficients))
+        mean, variance = unit * (1 + mean), unit * unit * variance
+    else:
+        mean += np.dot(reference, coefficients)
+    return SensitivityResult(first_order, total, mean, variance, samples, samples * (d + 2))
+
+"""
+Sobol indices for one component's failure modes, read from the database:
+each row's rate is distributed as the fit to its LB/BE/UB (see
+reliability.rate_fits); rows without spread (LB = UB) are fixed at BE. Returns the rows' desc and cf_id with
+first_order and total, largest total first, and the SensitivityResult.
+"""
+
+def component_sensitivity(conn: sqlite3.Connection, component: str, table="local_comp_fails",
+                          distribution="weibull", **kwargs):
+    repo = PartRepository(conn)
+    comp_id = repo.component_id(component)
+    if comp_id is None:
+        raise ValueError(f"unknown component: {component}")
+    rows = repo.failure_modes(comp_id, table)
+    fits, fixed = rate_fits(rows[["lower_bound", "best_estimate", "upper_bound"]].to_numpy(np.float64), distribution)
+    result = sobol_indices(fits, fixed, rows["mission_time"].to_numpy(np.float64), **kwargs)
+    indices = pd.DataFrame(
+        {"desc": rows["desc"], "cf_id": rows["cf_id"], "first_order": result.first_order, "total": result.total}
+    )
+    return indices.sort_values("total", ascending=False, kind="stable"), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sobol sensitivity of a component to its failure modes' rates")
+    parser.add_argument("component", help="component name")
+    parser.add_argument("--db", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "part_info.db"))
+    parser.add_argument("--table", choices=("comp_fails", "local_comp_fails"), default="local_comp_fails")
+    parser.add_argument("--output", choices=OUTPUTS, default="reliability")
+    parser.add_argument("--distribution", choices=RATE_DISTRIBUTIONS, default="weibull")
+    parser.add_argument("--beta", type=float, default=1.0)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (0: none)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--limit", type=int, default=20, help="failure modes listed")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        indices, result = component_sensitivity(
+            conn, args.component, args.table, args.distribution, output=args.output, beta=args.beta,
+            samples=args.samples, workers=args.workers, batch_size=args.batch_size, seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+    print(f"{args.component}: {args.output} mean {result.mean:.6g}, variance {result.variance:.3g} "
+          f"({result.evaluations} evaluations)")
+    print(indices.head(args.limit).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
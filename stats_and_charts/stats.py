@@ -1,10 +1,27 @@
 from matplotlib import figure
 import numpy as np
-from scipy.optimize import minimize, Bounds
-from scipy.stats import weibull_min, rayleigh
-from scipy.special import gamma
+from scipy.stats import weibull_min, rayleigh, expon, lognorm, norm, gamma as gamma_distribution
+from scipy.special import gamma, digamma, gammaincinv
 import matplotlib.pyplot as plt
 import seaborn as sns
+from collections import OrderedDict, namedtuple
+from stats_and_charts.sampler import sample_fit
+
+# Result of fitting a distribution to one LB/BE/UB triple: params is (k, lam)
+# for weibull, (sigma,) for rayleigh, (scale,) for exponential, (s, scale) for
+# lognormal and (a, scale) for gamma; residual is the objective at params
+Fit = namedtuple("Fit", ["distribution", "params", "residual", "iterations", "converged"])
+
+# Font sizes for the distribution plots, applied per figure rather than globally
+PLOT_RC = {
+    "font.size": 18,
+    "axes.titlesize": 22,
+    "axes.labelsize": 20,
+    "xtick.labelsize": 18,
+    "ytick.labelsize": 18,
+    "legend.fontsize": 20,
+    "figure.titlesize": 24,
+}
 
 """
 
@@ -25,75 +42,229 @@ def weibull_objective(params, values):
         # Calculate the difference between actual and estimated values
         return np.sum((values - estimated_values) ** 2)
 
-def _weibull(values):
-    input = values
-    
-    # Set the lower bound, geometric mean, and upper bound of the failure rates
-    values1 = np.array([20.8, 125.0, 4.17])  # replace with actual lower bound, geometric mean, and upper bound
-    values2 = np.array([1.0, 30.0, 1000.0])
-    values3 = np.array([4.17, 83.3, 417.0])
-    values4 = np.array([41.7, 125.0, 375.0])
-    values5 = np.array([83.3, 4170.0, 4.17])
-    values6 = np.array([2.5, 33.3, 250.0])
-
-    # Initial guess for k and lam
-    """
-    k_app = math.pow((4*input[1])/(input[2]-input[0]),1.086)
-    initial_guess = np.array([k_app, input[1]/gamma(1+1/k_app)])
-    """
-    initial_guess = [1.0,1.0]
-    # Set bounds for k and lam
-    bounds = Bounds([0.01, 0.01], [np.inf, np.inf])  # Avoid zero by setting lower bound to a small positive number
-
-    # Perform the optimization
-    result = minimize(weibull_objective, initial_guess, args=(input,), bounds=bounds)
-
-    # Extract the optimized parameters
-    k_opt, lam_opt = result.x
+# Weibull quantile: ppf(p) = lam * (-ln(1 - p)) ** (1 / k)
+WEIBULL_LOWER_Q = -np.log(1 - 0.05)
+WEIBULL_UPPER_Q = -np.log(1 - 0.95)
+
+# Same lower bounds on k and lam as _weibull's optimizer
+WEIBULL_MIN_PARAM = 0.01
+# Past this the quantiles no longer depend on k; stops k running off to infinity
+WEIBULL_MAX_SHAPE = 1e6
+
+# LB/BE/UB arrays (or scalars) as one (n, 3) array
+def _triples(lb, be, ub) -> np.ndarray:
+    return np.stack(np.broadcast_arrays(
+        np.asarray(lb, dtype=np.float64),
+        np.asarray(be, dtype=np.float64),
+        np.asarray(ub, dtype=np.float64),
+    ), axis=-1).reshape(-1, 3)
+
+def _weibull_estimates(k, lam):
+    inv_k = 1 / k
+    g = np.stack(
+        [
+            WEIBULL_LOWER_Q ** inv_k,
+            np.exp(gamma(1 + inv_k) / 2),
+            WEIBULL_UPPER_Q ** inv_k,
+        ],
+        axis=-1,
+    )
+    # d g / d(log k) = -g * d(log g) / d(1/k) / k
+    dlog_g = np.stack(
+        [
+            np.full_like(k, np.log(WEIBULL_LOWER_Q)),
+            gamma(1 + inv_k) * digamma(1 + inv_k) / 2,
+            np.full_like(k, np.log(WEIBULL_UPPER_Q)),
+        ],
+        axis=-1,
+    )
+    estimates = lam[:, None] * g
+    return estimates, -estimates * dlog_g * inv_k[:, None]
+
+# The LB/BE/UB triples that fit_weibull_batch maps back to (k, lam), e.g. to
+# store parameters fitted some other way as bounds
+def weibull_bounds(k, lam) -> np.ndarray:
+    k = np.atleast_1d(np.asarray(k, dtype=np.float64))
+    lam = np.atleast_1d(np.asarray(lam, dtype=np.float64))
+    return _weibull_estimates(k, lam)[0]
 
-    # Generate a sample from the Weibull distribution with the optimized parameters
-    sample = lam_opt * np.random.weibull(k_opt, 1000)
+"""
+Starting (k, lam) for each triple: whichever of two closed-form guesses fits
+better. The UB/LB ratio alone fixes k; k_app = (4 BE / (UB - LB)) ** 1.086 is
+the spread approximation. lam is the least-squares projection for that k
+(the objective is linear in lam).
+"""
 
-    #print(k_opt)
-    #print(lam_opt)
+def _weibull_warm_start(values):
+    lb, be, ub = values[:, 0], values[:, 1], values[:, 2]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        k_ratio = np.log(WEIBULL_UPPER_Q / WEIBULL_LOWER_Q) / np.log(ub / lb)
+        k_app = np.power(4 * be / (ub - lb), 1.086)
+
+    best_k, best_lam, best_cost = None, None, None
+    for k in (k_ratio, k_app):
+        k = np.clip(np.where(np.isfinite(k) & (k > 0), k, 1.0), 0.2, 50.0)
+        g, _ = _weibull_estimates(k, np.ones(len(values)))
+        lam = np.maximum(np.sum(g * values, axis=1) / np.sum(g * g, axis=1), WEIBULL_MIN_PARAM)
+        cost = np.sum((lam[:, None] * g - values) ** 2, axis=1)
+        if best_cost is None:
+            best_k, best_lam, best_cost = k, lam, cost
+        else:
+            better = cost < best_cost
+            best_k = np.where(better, k, best_k)
+            best_lam = np.where(better, lam, best_lam)
+            best_cost = np.where(better, cost, best_cost)
+    return best_k, best_lam
 
-    # Create a Figure and Axes object
-    fig = plt.figure(figsize=(8, 6))
-    ax = fig.subplots()
+"""
 
-    # Set x values and calculate the PDF
-    x = np.linspace(np.min(sample), np.max(sample), 1000)
-    pdf = weibull_min.pdf(x, k_opt, scale=lam_opt)
+   Name: fit_weibull_batch
+   Type: function
+   Description: Fits (k, lam) to many LB/BE/UB triples at once, minimizing the
+   same squared error as weibull_objective. Every triple is iterated together
+   with damped Gauss-Newton (Levenberg-Marquardt) steps on (log k, log lam),
+   using the closed-form quantile and an analytic Jacobian. Returns arrays
+   k, lam and a boolean array of which fits converged; with full_output, also
+   each fit's objective value and iteration count.
 
-    # Plotting the histogram on the Axes
-    sns.histplot(sample, bins=50, kde=False, color='#5f9ea0', label='Histogram', stat="density", ax=ax)
+"""
 
-    # Set global font size
-    plt.rc('font', size=18)  # controls default text sizes
-    plt.rc('axes', titlesize=22)  # fontsize of the axes title
-    plt.rc('axes', labelsize=20)  # fontsize of the x and y labels
-    plt.rc('xtick', labelsize=18)  # fontsize of the tick labels
-    plt.rc('ytick', labelsize=18)  # fontsize of the tick labels
-    plt.rc('legend', fontsize=20)  # legend fontsize
-    plt.rc('figure', titlesize=24)  # fontsize of the figure title
+def fit_weibull_batch(lb, be, ub, max_iter=100, tol=1e-10, full_output=False):
+    values = _triples(lb, be, ub)
+    k, lam, converged, residual, iterations = _weibull_lm(values, max_iter, tol)
+    if full_output:
+        return k, lam, converged, residual, iterations
+    return k, lam, converged
+
+# The batch fit on an (n, 3) array; also returns each fit's objective and iteration count
+def _weibull_lm(values, max_iter, tol):
+    n = len(values)
+
+    k, lam = _weibull_warm_start(values)
+
+    log_min = np.log(WEIBULL_MIN_PARAM)
+    params = np.stack([np.log(k), np.log(lam)], axis=-1)
+    estimates, d_log_k = _weibull_estimates(k, lam)
+    residual = estimates - values
+    cost = np.sum(residual ** 2, axis=1)
+    damping = np.full(n, 1e-3)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int64)
+
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        iterations[active] += 1
+        # Jacobian columns: d r / d(log k) and d r / d(log lam) = estimates
+        j0, j1, r = d_log_k[active], estimates[active], residual[active]
+        a00 = np.sum(j0 * j0, axis=1)
+        a01 = np.sum(j0 * j1, axis=1)
+        a11 = np.sum(j1 * j1, axis=1)
+        b0 = -np.sum(j0 * r, axis=1)
+        b1 = -np.sum(j1 * r, axis=1)
+        mu = damping[active]
+        a00, a11 = a00 * (1 + mu), a11 * (1 + mu)
+        det = a00 * a11 - a01 * a01
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.stack([(a11 * b0 - a01 * b1) / det, (a00 * b1 - a01 * b0) / det], axis=-1)
+        # A parameter held at its lower bound stays there; the other takes a 1-D step
+        at_bound = (params[active] <= log_min) & (np.stack([b0, b1], axis=-1) < 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step[:, 0] = np.where(at_bound[:, 1], b0 / a00, step[:, 0])
+            step[:, 1] = np.where(at_bound[:, 0], b1 / a11, step[:, 1])
+        step[at_bound] = 0.0
+        step = np.where(np.isfinite(step), step, 0.0)
+
+        trial = np.maximum(params[active] + step, log_min)
+        trial[:, 0] = np.minimum(trial[:, 0], np.log(WEIBULL_MAX_SHAPE))
+        with np.errstate(over="ignore", invalid="ignore"):
+            trial_estimates, trial_d_log_k = _weibull_estimates(np.exp(trial[:, 0]), np.exp(trial[:, 1]))
+            trial_residual = trial_estimates - values[active]
+            trial_cost = np.sum(trial_residual ** 2, axis=1)
+        better = np.isfinite(trial_cost) & (trial_cost <= cost[active])
+
+        index = np.flatnonzero(active)
+        moved = index[better]
+        params[moved] = trial[better]
+        estimates[moved] = trial_estimates[better]
+        d_log_k[moved] = trial_d_log_k[better]
+        residual[moved] = trial_residual[better]
+        small_step = np.max(np.abs(step[better]), axis=1, initial=0) < tol
+        relative_drop = (cost[moved] - trial_cost[better]) <= tol * np.maximum(cost[moved], 1e-300)
+        cost[moved] = trial_cost[better]
+        damping[moved] = np.maximum(damping[moved] / 10, 1e-12)
+        damping[index[~better]] *= 10
+        converged[moved] = small_step | relative_drop
+        # A step too small to change anything means we're at the optimum (or a bound)
+        converged[index[~better]] = damping[index[~better]] > 1e12
+
+    converged &= np.isfinite(cost)
+    return np.exp(params[:, 0]), np.exp(params[:, 1]), converged, cost, iterations
 
-    # Plotting the PDF on the Axes
-    ax.plot(x, pdf, 'r-', label='Probability Density Function')
+"""
 
-    ax.set_title('Motor Failure Weibull Distribution')
-    ax.set_xlabel('Frequency')
-    ax.set_ylabel('Probability Density')
-    ax.legend()
+   Name: fit_weibull
+   Type: function
+   Description: Fits Weibull shape (k) and scale (lamda) to one LB/BE/UB triple.
+   Pure: no sampling, plotting or printing.
+
+"""
+
+def fit_weibull(values) -> Fit:
+    values = np.asarray(values, dtype=np.float64)
+    k, lam, converged, cost, iterations = fit_weibull_batch(*values, full_output=True)
+    return Fit("weibull", (float(k[0]), float(lam[0])), float(cost[0]), int(iterations[0]), bool(converged[0]))
+
+"""
+
+   Name: weibull_figure
+   Type: function
+   Description: Creates a histogram PDF plot of the weibull distrubtion from a
+   precomputed fit, with a sample of sample_size draws.
+
+"""
+
+def weibull_figure(fit: Fit, sample_size=1000, rng=None) -> figure.Figure:
+    k_opt, lam_opt = fit.params
+    rng = np.random.default_rng() if rng is None else rng
+
+    # Generate a sample from the Weibull distribution with the optimized parameters
+    sample = lam_opt * rng.weibull(k_opt, sample_size)
+
+    with plt.rc_context(PLOT_RC):
+        fig = figure.Figure(figsize=(8, 6))
+        ax = fig.subplots()
+
+        # Set x values and calculate the PDF
+        x = np.linspace(np.min(sample), np.max(sample), 1000)
+        pdf = weibull_min.pdf(x, k_opt, scale=lam_opt)
+
+        # Plotting the histogram on the Axes
+        sns.histplot(sample, bins=50, kde=False, color='#5f9ea0', label='Histogram', stat="density", ax=ax)
+
+        # Plotting the PDF on the Axes
+        ax.plot(x, pdf, 'r-', label='Probability Density Function')
+
+        ax.set_title('Motor Failure Weibull Distribution')
+        ax.set_xlabel('Frequency')
+        ax.set_ylabel('Probability Density')
+        ax.legend()
 
-    # Return the Figure
-    """
-    import time
-    fig.show()
-    while True:
-        time.sleep(1)
-    """
     return fig
 
+"""
+
+   Name: _weibull
+   Type: function
+   Description: Creates a histogram PDF plot of the weibull distrubtion based on LB/BE/UB.
+   Fits and plots in one call; use fit_weibull and weibull_figure to reuse a fit.
+
+"""
+
+def _weibull(values):
+    return weibull_figure(fit_weibull(values))
+
 #_weibull(np.array([1,2,3]))
 """
 
@@ -104,6 +275,13 @@ def _weibull(values):
 
 """
 
+# rayleigh_objective's estimates for sigma = 1: ppf(0.05), mean, ppf(0.95)
+RAYLEIGH_UNIT_ESTIMATES = np.array([
+    np.sqrt(-2 * np.log(1 - 0.05)),
+    np.sqrt(np.pi / 2),
+    np.sqrt(-2 * np.log(1 - 0.95)),
+])
+
 def rayleigh_objective(param, values):
         sigma = param[0]
         # Calculate the estimated values for lower bound, geometric mean, and upper bound
@@ -114,55 +292,410 @@ def rayleigh_objective(param, values):
         # Calculate the difference between actual and estimated values
         return np.sum((values - estimated_values) ** 2)
 
-def _rayleigh(values):
-    input = values
-    
-    # Set the lower bound, geometric mean, and upper bound of the failure rates
-    values1 = np.array([1.0, 3.0, 1000.0])  # replace with actual lower bound, mean, and upper bound
+"""
 
-    # Initial guess for sigma
-    initial_guess = np.array([1.0])
+   Name: fit_rayleigh
+   Type: function
+   Description: Fits the Rayleigh scale (sigma) to one LB/BE/UB triple.
+   Pure: no sampling, plotting or printing.
+
+"""
 
-    # Set bounds for sigma
-    bounds = Bounds([0.01], [np.inf])  # Avoid zero by setting lower bound to a small positive number
+def fit_rayleigh(values) -> Fit:
+    values = np.asarray(values, dtype=np.float64)
+    sigma = fit_rayleigh_batch(values[0], values[1], values[2])[0]
+    return Fit("rayleigh", (float(sigma),), float(rayleigh_objective([sigma], values)), 0, True)
 
-    # Perform the optimization
-    result = minimize(rayleigh_objective, initial_guess, args=(input,), bounds=bounds)
+"""
 
-    # Extract the optimized parameter
-    sigma_opt = result.x[0]
+   Name: fit_rayleigh_batch
+   Type: function
+   Description: Exact minimizer of rayleigh_objective for many LB/BE/UB
+   triples. Every estimate is sigma times a constant, so the least-squares
+   sigma is a projection, clipped to the same 0.01 lower bound. With
+   full_output, also returns each fit's objective value.
+
+"""
+
+def fit_rayleigh_batch(lb, be, ub, full_output=False):
+    values = _triples(lb, be, ub)
+    sigma = np.maximum(values @ RAYLEIGH_UNIT_ESTIMATES / (RAYLEIGH_UNIT_ESTIMATES @ RAYLEIGH_UNIT_ESTIMATES), 0.01)
+    if full_output:
+        residual = np.sum((sigma[:, None] * RAYLEIGH_UNIT_ESTIMATES - values) ** 2, axis=1)
+        return sigma, residual
+    return sigma
+
+"""
+
+   Name: rayleigh_figure
+   Type: function
+   Description: Creates a histogram PDF plot of the rayleigh distrubtion from a
+   precomputed fit, with a sample of sample_size draws.
+
+"""
+
+def rayleigh_figure(fit: Fit, sample_size=1000, rng=None) -> figure.Figure:
+    (sigma_opt,) = fit.params
+    rng = np.random.default_rng() if rng is None else rng
 
     # Generate a sample from the Rayleigh distribution with the optimized parameter
-    sample = np.random.rayleigh(sigma_opt, 1000)
-
-    #print(sigma_opt)
-
-    # Plotting the histogram
-    fig, ax = plt.subplots(figsize=(8, 6))
-    # Set global font size
-    plt.rc('font', size=18)  # controls default text sizes
-    plt.rc('axes', titlesize=22)  # fontsize of the axes title
-    plt.rc('axes', labelsize=20)  # fontsize of the x and y labels
-    plt.rc('xtick', labelsize=18)  # fontsize of the tick labels
-    plt.rc('ytick', labelsize=18)  # fontsize of the tick labels
-    plt.rc('legend', fontsize=20)  # legend fontsize
-    plt.rc('figure', titlesize=24)  # fontsize of the figure title
-    sns.histplot(sample, bins=50, kde=False, color='#5f9ea0', label='Histogram', stat="density", ax=ax)
-
-    # Plotting the PDF
-    x = np.linspace(np.min(sample), np.max(sample), 1000)
-    pdf = rayleigh.pdf(x, scale=sigma_opt)
-    ax.plot(x, pdf, 'r-', label='Probability Density Function')
-
-    ax.set_title('Motor Failure Rayleigh Distribution')
-    ax.set_xlabel('Frequency')
-    ax.set_ylabel('Probability Density')
-    ax.legend()
+    sample = rng.rayleigh(sigma_opt, sample_size)
+
+    with plt.rc_context(PLOT_RC):
+        fig = figure.Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        sns.histplot(sample, bins=50, kde=False, color='#5f9ea0', label='Histogram', stat="density", ax=ax)
+
+        # Plotting the PDF
+        x = np.linspace(np.min(sample), np.max(sample), 1000)
+        pdf = rayleigh.pdf(x, scale=sigma_opt)
+        ax.plot(x, pdf, 'r-', label='Probability Density Function')
+
+        ax.set_title('Motor Failure Rayleigh Distribution')
+        ax.set_xlabel('Frequency')
+        ax.set_ylabel('Probability Density')
+        ax.legend()
 
     return fig
 
+"""
+
+   Name: _rayleigh
+   Type: function
+   Description: Creates a histogram PDF plot of the rayleigh distrubtion based on LB/BE/UB.
+   Fits and plots in one call; use fit_rayleigh and rayleigh_figure to reuse a fit.
+
+"""
+
+def _rayleigh(values):
+    return rayleigh_figure(fit_rayleigh(values))
+
 #_rayleigh(np.array([1,2,3]))
 
+# Lower bound on every scale parameter, as for Weibull and Rayleigh
+MIN_SCALE = 0.01
+
+# Least-squares scale for each triple (rows of values) given each shape's unit
+# estimates (rows of g, one per triple), clipped to MIN_SCALE; with the objective
+def _project_scale(values, g):
+    scale = np.maximum(np.sum(values * g, axis=1) / np.sum(g * g, axis=1), MIN_SCALE)
+    return scale, np.sum((scale[:, None] * g - values) ** 2, axis=1)
+
+# The exponential's 5% point, geometric mean and 95% point for scale = 1
+EXPONENTIAL_UNIT_ESTIMATES = np.array([-np.log(1 - 0.05), np.exp(-np.euler_gamma), -np.log(1 - 0.95)])
+
+"""
+
+   Name: fit_exponential_batch
+   Type: function
+   Description: Fits the exponential scale (mean time to failure) to many
+   LB/BE/UB triples, reading BE as the geometric mean. Like Rayleigh, every
+   estimate is the scale times a constant, so the fit is a projection. With
+   full_output, also returns each fit's objective value.
+
+"""
+
+def fit_exponential_batch(lb, be, ub, full_output=False):
+    values = _triples(lb, be, ub)
+    scale, residual = _project_scale(values, np.broadcast_to(EXPONENTIAL_UNIT_ESTIMATES, values.shape))
+    return (scale, residual) if full_output else scale
+
+# Shape parameters searched for the two-parameter profile fits, as log ranges
+LOGNORMAL_LOG_SHAPE = (np.log(1e-3), np.log(20.0))
+GAMMA_LOG_SHAPE = (np.log(1e-2), np.log(1e4))
+# Coarse grid points over the range, then golden-section steps around the best
+PROFILE_GRID = 200
+PROFILE_ITERATIONS = 30
+# Triples per block of the grid search, which holds a (block, PROFILE_GRID) array
+PROFILE_BLOCK = 4096
+
+# Each shape's 5% point, geometric mean and 95% point for scale = 1
+def _lognormal_unit_estimates(s):
+    z_lower, z_upper = norm.ppf([0.05, 0.95])
+    return np.stack([np.exp(s * z_lower), np.ones_like(s), np.exp(s * z_upper)], axis=-1)
+
+def _gamma_unit_estimates(a):
+    with np.errstate(under="ignore"):
+        return np.stack([gammaincinv(a, 0.05), np.exp(digamma(a)), gammaincinv(a, 0.95)], axis=-1)
+
+"""
+Fits (shape, scale) to each triple for a family whose estimates are the scale
+times unit_estimates(shape). The scale is profiled out by projection, leaving
+a 1-D search over log shape: a grid shared by every triple (its unit
+estimates are computed once), then golden-section refinement between the
+best grid point's neighbours. Returns shape, scale and the objective.
+"""
+
+def _profile_fit(values, unit_estimates, log_shape_range):
+    n = len(values)
+    grid = np.linspace(*log_shape_range, PROFILE_GRID)
+    g = unit_estimates(np.exp(grid))
+    gg = np.sum(g * g, axis=1)
+    best = np.empty(n, dtype=np.int64)
+    for start in range(0, n, PROFILE_BLOCK):
+        block = values[start:start + PROFILE_BLOCK]
+        vg = block @ g.T
+        scale = np.maximum(vg / gg, MIN_SCALE)
+        cost = np.sum(block * block, axis=1)[:, None] - 2 * scale * vg + scale * scale * gg
+        best[start:start + PROFILE_BLOCK] = np.argmin(cost, axis=1)
+
+    def objective(log_shape):
+        return _project_scale(values, unit_estimates(np.exp(log_shape)))[1]
+
+    # Golden-section search on [a, b], keeping interior points c < d
+    a = grid[np.maximum(best - 1, 0)]
+    b = grid[np.minimum(best + 1, PROFILE_GRID - 1)]
+    ratio = (np.sqrt(5) - 1) / 2
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = objective(c), objective(d)
+    for _ in range(PROFILE_ITERATIONS):
+        left = fc < fd
+        a = np.where(left, a, c)
+        b = np.where(left, d, b)
+        c, d = np.where(left, b - ratio * (b - a), d), np.where(left, c, a + ratio * (b - a))
+        new = objective(np.where(left, c, d))
+        fc, fd = np.where(left, new, fd), np.where(left, fc, new)
+
+    log_shape = np.where(fc < fd, c, d)
+    # The grid point itself wins if the objective isn't unimodal around it
+    grid_cost = objective(grid[best])
+    log_shape = np.where(grid_cost < np.minimum(fc, fd), grid[best], log_shape)
+    shape = np.exp(log_shape)
+    scale, residual = _project_scale(values, unit_estimates(shape))
+    return shape, scale, residual
+
+"""
+
+   Name: fit_lognormal_batch
+   Type: function
+   Description: Fits the lognormal shape (s, the log standard deviation) and
+   scale (exp of the log mean) to many LB/BE/UB triples, reading BE as the
+   geometric mean. Returns arrays s and scale; with full_output, also each
+   fit's objective value.
+
+"""
+
+def fit_lognormal_batch(lb, be, ub, full_output=False):
+    s, scale, residual = _profile_fit(_triples(lb, be, ub), _lognormal_unit_estimates, LOGNORMAL_LOG_SHAPE)
+    return (s, scale, residual) if full_output else (s, scale)
+
+"""
+
+   Name: fit_gamma_batch
+   Type: function
+   Description: Fits the gamma shape (a) and scale to many LB/BE/UB triples,
+   reading BE as the geometric mean. Returns arrays a and scale; with
+   full_output, also each fit's objective value.
+
+"""
+
+def fit_gamma_batch(lb, be, ub, full_output=False):
+    a, scale, residual = _profile_fit(_triples(lb, be, ub), _gamma_unit_estimates, GAMMA_LOG_SHAPE)
+    return (a, scale, residual) if full_output else (a, scale)
+
+def fit_exponential(values) -> Fit:
+    scale, residual = fit_exponential_batch(*np.asarray(values, dtype=np.float64), full_output=True)
+    return Fit("exponential", (float(scale[0]),), float(residual[0]), 0, True)
+
+def fit_lognormal(values) -> Fit:
+    s, scale, residual = fit_lognormal_batch(*np.asarray(values, dtype=np.float64), full_output=True)
+    return Fit("lognormal", (float(s[0]), float(scale[0])), float(residual[0]), PROFILE_ITERATIONS, True)
+
+def fit_gamma(values) -> Fit:
+    a, scale, residual = fit_gamma_batch(*np.asarray(values, dtype=np.float64), full_output=True)
+    return Fit("gamma", (float(a[0]), float(scale[0])), float(residual[0]), PROFILE_ITERATIONS, True)
+
+# scipy distribution for each fit's params: shape parameters first, then the scale
+SCIPY_DISTRIBUTIONS = {
+    "weibull": weibull_min,
+    "rayleigh": rayleigh,
+    "exponential": expon,
+    "lognormal": lognorm,
+    "gamma": gamma_distribution,
+}
+
+def frozen_distribution(fit: Fit):
+    *shape, scale = fit.params
+    return SCIPY_DISTRIBUTIONS[fit.distribution](*shape, scale=scale)
+
+"""
+
+   Name: distribution_figure
+   Type: function
+   Description: Creates a histogram PDF plot of any fitted distribution, like
+   weibull_figure and rayleigh_figure, with a sample of sample_size draws.
+
+"""
+
+def distribution_figure(fit: Fit, sample_size=1000, rng=None) -> figure.Figure:
+    distribution = frozen_distribution(fit)
+    sample = sample_fit(fit, sample_size, rng)
+
+    with plt.rc_context(PLOT_RC):
+        fig = figure.Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        sns.histplot(sample, bins=50, kde=False, color='#5f9ea0', label='Histogram', stat="density", ax=ax)
+
+        x = np.linspace(np.min(sample), np.max(sample), 1000)
+        ax.plot(x, distribution.pdf(x), 'r-', label='Probability Density Function')
+
+        ax.set_title(f'Motor Failure {fit.distribution.title()} Distribution')
+        ax.set_xlabel('Frequency')
+        ax.set_ylabel('Probability Density')
+        ax.legend()
+
+    return fig
+
+FIT_FUNCTIONS = {
+    "weibull": fit_weibull,
+    "rayleigh": fit_rayleigh,
+    "exponential": fit_exponential,
+    "lognormal": fit_lognormal,
+    "gamma": fit_gamma,
+}
+
+# Candidates for select_model_batch with their parameter counts
+MODEL_CANDIDATES = {"exponential": 1, "weibull": 2, "rayleigh": 1, "lognormal": 2, "gamma": 2}
+
+# Relative RMS error below which fits count as exact, so ln(0) can't decide a ranking
+SELECTION_ERROR_FLOOR = 1e-6
+
+ModelSelection = namedtuple("ModelSelection", ["distribution", "shape", "scale", "residual", "score", "scores"])
+
+"""
+AIC-style score of fits to triples: 3 ln(RSS / 3) + 2p for Gaussian errors
+on the three bounds, with RSS taken relative to the bounds' sum of squares
+and floored at SELECTION_ERROR_FLOOR. Lower is better.
+"""
+
+def selection_score(residual, values, n_params):
+    # Bounds smaller than any fit's MIN_SCALE are measured against it instead
+    size = np.maximum(np.sum(values * values, axis=1), 3 * MIN_SCALE ** 2)
+    mse = np.maximum(residual / size / 3, SELECTION_ERROR_FLOOR ** 2)
+    return 3 * np.log(mse) + 2 * n_params
+
+# Each candidate's fit to every triple: params as a tuple of arrays, and the objective
+def _candidate_fits(values, candidates):
+    fits = {}
+    for name in candidates:
+        if name == "weibull":
+            k, lam, _, residual, _ = _weibull_lm(values, 100, 1e-10)
+            fits[name] = ((k, lam), residual)
+        elif name == "rayleigh":
+            sigma, residual = fit_rayleigh_batch(*values.T, full_output=True)
+            fits[name] = ((sigma,), residual)
+        elif name == "exponential":
+            scale, residual = fit_exponential_batch(*values.T, full_output=True)
+            fits[name] = ((scale,), residual)
+        elif name == "lognormal":
+            fits[name] = _split_profile(_profile_fit(values, _lognormal_unit_estimates, LOGNORMAL_LOG_SHAPE))
+        elif name == "gamma":
+            fits[name] = _split_profile(_profile_fit(values, _gamma_unit_estimates, GAMMA_LOG_SHAPE))
+        else:
+            raise ValueError(f"unknown distribution: {name}")
+    return fits
+
+def _split_profile(result):
+    shape, scale, residual = result
+    return (shape, scale), residual
+
+"""
+
+   Name: select_model_batch
+   Type: function
+   Description: Fits every candidate distribution to many LB/BE/UB triples and
+   picks each triple's lowest selection_score. Returns a ModelSelection of
+   arrays: the winner's name, shape (NaN for one-parameter families), scale,
+   objective and score, plus every candidate's score in candidates order.
+
+"""
+
+def select_model_batch(lb, be, ub, candidates=tuple(MODEL_CANDIDATES), fits=None) -> ModelSelection:
+    values = _triples(lb, be, ub)
+    # fits: candidates already fitted to these triples, as {name: (params, objective)}
+    fits = dict(fits or {})
+    fits.update(_candidate_fits(values, [name for name in candidates if name not in fits]))
+    scores = np.stack(
+        [selection_score(fits[name][1], values, MODEL_CANDIDATES[name]) for name in candidates], axis=-1
+    )
+    # NaN scores (failed fits) never win
+    best = np.argmin(np.where(np.isnan(scores), np.inf, scores), axis=1)
+    rows = np.arange(len(values))
+    shape = np.full(len(values), np.nan)
+    scale = np.empty(len(values))
+    residual = np.empty(len(values))
+    for i, name in enumerate(candidates):
+        chosen = best == i
+        params, objective = fits[name]
+        if len(params) == 2:
+            shape[chosen] = params[0][chosen]
+        scale[chosen] = params[-1][chosen]
+        residual[chosen] = objective[chosen]
+    names = np.array(candidates, dtype=object)[best]
+    return ModelSelection(names, shape, scale, residual, scores[rows, best], scores)
+
+# The winner for one triple as a Fit, with its score
+def select_model(values):
+    selection = select_model_batch(*np.asarray(values, dtype=np.float64))
+    return selection_fit(selection.distribution[0], selection.shape[0], selection.scale[0],
+                         selection.residual[0]), float(selection.score[0])
+
+# A Fit from a selection's (distribution, shape, scale, residual)
+def selection_fit(distribution, shape, scale, residual) -> Fit:
+    params = (float(scale),) if MODEL_CANDIDATES[distribution] == 1 else (float(shape), float(scale))
+    return Fit(distribution, params, float(residual), 0, True)
+
+DEFAULT_FIT_CACHE_SIZE = 256
+
+# Significant digits of each bound kept in a FitCache key
+FIT_KEY_DIGITS = 9
+
+FitCacheInfo = namedtuple("FitCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+"""
+
+   Name: FitCache
+   Type: class
+   Description: LRU memo in front of the fit_* functions, keyed on the
+   distribution and the LB/BE/UB triple rounded to FIT_KEY_DIGITS significant
+   digits, so redraws of the same component don't refit.
+
+"""
+
+class FitCache:
+    def __init__(self, maxsize=DEFAULT_FIT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fits = OrderedDict()
+
+    @staticmethod
+    def key(distribution: str, values) -> tuple:
+        return (distribution,) + tuple(
+            float(f"{value:.{FIT_KEY_DIGITS}g}") for value in np.asarray(values, dtype=np.float64).ravel()
+        )
+
+    def get(self, distribution: str, values) -> Fit:
+        key = self.key(distribution, values)
+        fit = self._fits.get(key)
+        if fit is not None:
+            self.hits += 1
+            self._fits.move_to_end(key)
+            return fit
+
+        self.misses += 1
+        fit = FIT_FUNCTIONS[distribution](np.array(key[1:]))
+        self._fits[key] = fit
+        if len(self._fits) > self.maxsize:
+            self._fits.popitem(last=False)
+        return fit
+
+    def clear(self) -> None:
+        self._fits.clear()
+
+    def cache_info(self) -> FitCacheInfo:
+        return FitCacheInfo(self.hits, self.misses, self.maxsize, len(self._fits))
+
 def _bathtub(N, T, t1, t2):
     # Time vector
     t = np.linspace(0, T, N)
@@ -0,0 +1,220 @@
+# @file survival.py
+# @brief Kaplan-Meier and Nelson-Aalen estimates from censored failure times, to check the fitted curves against
+
+import argparse
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+import matplotlib.pyplot as plt
+from matplotlib import figure
+from stats_and_charts.stats import PLOT_RC, Fit, frozen_distribution
+from stats_and_charts.weibull_mle import DEFAULT_CHUNKSIZE, read_log_records
+
+# Points a step curve is reduced to before drawing, whatever the number of events
+DEFAULT_MAX_POINTS = 500
+
+# One estimate per distinct failure time:
+#   survival (Kaplan-Meier) with Greenwood bands lower/upper on the log(-log) scale
+#   hazard (Nelson-Aalen cumulative hazard) with bands on the log scale
+SurvivalCurve = namedtuple(
+    "SurvivalCurve",
+    ["time", "at_risk", "events", "survival", "lower", "upper", "hazard", "hazard_lower", "hazard_upper"],
+)
+
+# Cumulative sums of x restarting at each segment; segment_start[i] is the index x[i]'s segment starts at
+def _segment_cumsum(x, segment_start) -> np.ndarray:
+    total = np.cumsum(x)
+    return total - (total[segment_start] - x[segment_start])
+
+"""
+
+   Name: survival_curves
+   Type: function
+   Description: Kaplan-Meier and Nelson-Aalen estimates for every key at once.
+   keys, times and failed are parallel arrays (failed False: a suspension,
+   i.e. right-censored). Everything is one sort by (key, time) followed by
+   cumulative sums, so millions of records cost a sort. Records suspended at
+   a failure time count as at risk at it. Once every record at risk has
+   failed, survival and its band are 0. Returns {key: SurvivalCurve}; a key
+   without failures gets empty arrays.
+
+"""
+
+def survival_curves(keys, times, failed, confidence=0.95) -> dict:
+    times = np.asarray(times, dtype=np.float64)
+    failed = np.asarray(failed, dtype=bool)
+    codes, uniques = pd.factorize(keys if isinstance(keys, pd.Index) else np.asarray(keys))
+    order = np.lexsort((times, codes))
+    codes, times, failed = codes[order], times[order], failed[order]
+
+    # One entry per distinct (key, time), in sorted order
+    n = len(times)
+    distinct = np.ones(n, dtype=bool)
+    distinct[1:] = (codes[1:] != codes[:-1]) | (times[1:] != times[:-1])
+    starts = np.flatnonzero(distinct)
+    key_of = codes[starts]
+    events = np.add.reduceat(failed.astype(np.int64), starts) if n else np.zeros(0, dtype=np.int64)
+    # Records of each key at or after each time
+    key_end = np.searchsorted(codes, np.arange(len(uniques)), side="right")
+    at_risk = key_end[key_of] - starts
+
+    keep = events > 0
+    time, at_risk, events, key_of = times[starts][keep], at_risk[keep], events[keep], key_of[keep]
+    first = np.ones(len(key_of), dtype=bool)
+    first[1:] = key_of[1:] != key_of[:-1]
+    segment_start = np.maximum.accumulate(np.where(first, np.arange(len(key_of)), 0))
+
+    d, r = events.astype(np.float64), at_risk.astype(np.float64)
+    # Steps where every record at risk fails take S to 0 for the rest of the key. Their
+    # log terms are -inf, which would poison the shared cumulative sums of every later
+    # key, so they are counted separately and only finite terms are summed.
+    to_zero = events == at_risk
+    zeros_so_far = _segment_cumsum(to_zero.astype(np.int64), segment_start)
+    z = norm.ppf(0.5 + confidence / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_steps = np.where(to_zero, 0.0, np.log1p(-d / r))
+        survival = np.where(zeros_so_far > 0, 0.0, np.exp(_segment_cumsum(log_steps, segment_start)))
+        greenwood = _segment_cumsum(np.where(to_zero, 0.0, d / (r * (r - d))), segment_start)
+        # Greenwood variance of log S, mapped to log(-log S), keeps the band inside [0, 1]
+        spread = np.exp(z * np.sqrt(greenwood) / np.abs(np.log(survival)))
+        lower = np.where(survival > 0, survival ** spread, 0.0)
+        upper = np.where(survival > 0, survival ** (1 / spread), 0.0)
+        hazard = _segment_cumsum(d / r, segment_start)
+        hazard_spread = np.exp(z * np.sqrt(_segment_cumsum(d / (r * r), segment_start)) / hazard)
+    lower = np.nan_to_num(lower, nan=0.0)
+    upper = np.nan_to_num(upper, nan=1.0)
+
+    bounds = np.searchsorted(key_of, np.arange(1, len(uniques)))
+    columns = [time, at_risk, events, survival, lower, upper, hazard, hazard / hazard_spread, hazard * hazard_spread]
+    split = [np.split(column, bounds) for column in columns]
+    return {key: SurvivalCurve(*(parts[i] for parts in split)) for i, key in enumerate(uniques)}
+
+def survival_curve(times, failed, confidence=0.95) -> SurvivalCurve:
+    return survival_curves(np.zeros(len(times), dtype=np.int64), times, failed, confidence)[0] \
+        if len(times) else SurvivalCurve(*(np.zeros(0) for _ in SurvivalCurve._fields))
+
+"""
+Curves for every (component, failure mode) in a failure log (see
+weibull_mle.read_log_chunks). The times are kept in memory, 17 bytes a
+record, for the sort. progress(records) is called after each chunk.
+"""
+
+def failure_log_curves(path: str, chunksize=DEFAULT_CHUNKSIZE, columns=None, confidence=0.95,
+                       progress=None) -> dict:
+    components, failure_modes, times, failed = [], [], [], []
+    read = 0
+    for chunk in read_log_records(path, chunksize, columns):
+        for parts, values in zip((components, failure_modes, times, failed), chunk):
+            parts.append(values)
+        read += len(chunk[2]) + chunk[4]
+        if progress is not None:
+            progress(read)
+    if not times:
+        return {}
+    keys = pd.MultiIndex.from_arrays([np.concatenate(components), np.concatenate(failure_modes)])
+    return survival_curves(keys, np.concatenate(times), np.concatenate(failed), confidence)
+
+"""
+Indices of the steps to draw so at most about 2 * max_points remain: the
+last step in each of max_points equal slices of the time axis and of each
+series' [0, 1] range. Every step the plot can resolve is kept, so drawing
+cost stays flat however many events there are.
+"""
+
+def downsample_steps(time, *series, max_points=DEFAULT_MAX_POINTS) -> np.ndarray:
+    n = len(time)
+    if n <= max_points:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    span = time[-1] - time[0]
+    bins = [np.floor((time - time[0]) / span * max_points) if span > 0 else np.zeros(n)]
+    bins += [np.floor(np.clip(values, 0, 1) * max_points) for values in series]
+    for binned in bins:
+        # The last step in each bin
+        keep[:-1] |= binned[1:] != binned[:-1]
+    return np.flatnonzero(keep)
+
+"""
+
+   Name: overlay_survival
+   Type: function
+   Description: Draws a Kaplan-Meier curve with its Greenwood band over a
+   figure from stats (weibull_figure, distribution_figure...) on a second y
+   axis, with the fit's survival function for comparison when given.
+
+"""
+
+def overlay_survival(fig: figure.Figure, curve: SurvivalCurve, fit: Fit = None,
+                     max_points=DEFAULT_MAX_POINTS, label="Kaplan-Meier") -> figure.Figure:
+    if not len(curve.time):
+        return fig
+    with plt.rc_context(PLOT_RC):
+        ax = fig.axes[0]
+        survival_ax = ax.twinx()
+        rows = downsample_steps(curve.time, curve.survival, curve.lower, curve.upper, max_points=max_points)
+        # Start the steps at (0, 1) so the first drop is drawn
+        time = np.concatenate([[0.0], curve.time[rows]])
+        survival = np.concatenate([[1.0], curve.survival[rows]])
+        survival_ax.step(time, survival, where="post", color="#1f3b73", label=label)
+        survival_ax.fill_between(
+            time, np.concatenate([[1.0], curve.lower[rows]]), np.concatenate([[1.0], curve.upper[rows]]),
+            step="post", color="#1f3b73", alpha=0.2, label="Greenwood band",
+        )
+        if fit is not None:
+            x = np.linspace(0, curve.time[-1], 500)
+            survival_ax.plot(x, frozen_distribution(fit).sf(x), "--", color="#C02F1D",
+                             label=f"Fitted {fit.distribution} survival")
+        survival_ax.set_ylim(0, 1.05)
+        survival_ax.set_ylabel("Survival Probability")
+
+        handles, labels = ax.get_legend_handles_labels()
+        more_handles, more_labels = survival_ax.get_legend_handles_labels()
+        if ax.get_legend() is not None:
+            ax.get_legend().remove()
+        survival_ax.legend(handles + more_handles, labels + more_labels)
+    return fig
+
+# Time at which the survival estimate first drops to 0.5 or below (NaN if it never does)
+def median_survival(curve: SurvivalCurve) -> float:
+    below = np.flatnonzero(curve.survival <= 0.5)
+    return float(curve.time[below[0]]) if len(below) else np.nan
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kaplan-Meier estimates per component and failure mode of a failure log")
+    parser.add_argument("log", help="CSV or Parquet with component, failure_mode, time and status columns")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--component", help="plot this component's curve (with --failure-mode)")
+    parser.add_argument("--failure-mode")
+    parser.add_argument("--out", help="image file to save the plot to")
+    args = parser.parse_args(argv)
+    if args.component is not None and args.out is None:
+        parser.error("--component needs --out")
+
+    curves = failure_log_curves(args.log, args.chunksize, confidence=args.confidence)
+    summary = pd.DataFrame(
+        [
+            (component, failure_mode, int(curve.events.sum()), len(curve.time), median_survival(curve))
+            for (component, failure_mode), curve in curves.items()
+        ],
+        columns=["component", "failure_mode", "failures", "failure_times", "median"],
+    )
+    print(summary.to_string(index=False))
+
+    if args.component is not None:
+        curve = curves.get((args.component, args.failure_mode))
+        if curve is None:
+            parser.error(f"not in the log: {args.component} / {args.failure_mode}")
+        with plt.rc_context(PLOT_RC):
+            fig = figure.Figure(figsize=(8, 6))
+            ax = fig.subplots()
+            ax.set_title(f"{args.component}: {args.failure_mode}")
+            ax.set_xlabel("Time")
+            ax.set_yticks([])
+        overlay_survival(fig, curve)
+        fig.savefig(args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# @file weibull_mle.py
+# @brief Streaming maximum-likelihood Weibull fits to right-censored failure-time logs
+
+import os
+import sys
+import sqlite3
+import argparse
+from math import factorial
+import numpy as np
+import pandas as pd
+from stats_and_charts.stats import Fit, weibull_bounds
+from stats_and_charts.reliability import RATE_HOURS
+
+# Shapes k at which the running sums are anchored. Shapes outside the grid are
+# reported at its nearest end with converged = False.
+MLE_SHAPE_GRID = np.geomspace(0.1, 30.0, 48)
+# Terms kept of each sum's Taylor series in k; the error is below 1e-12 for
+# log failure times spread over 20 units at the fitted k
+MLE_TAYLOR_TERMS = 20
+MLE_BISECTIONS = 60
+
+DEFAULT_CHUNKSIZE = 200_000
+
+LOG_COLUMNS = ("component", "failure_mode", "time", "status")
+
+# status values read as a failure; anything else (S, 0, suspension, censored...) is a suspension
+FAILURE_STATUSES = {"1", "1.0", "f", "fail", "failed", "failure", "true"}
+
+MLE_RESULT_COLUMNS = ("component", "failure_mode", "records", "failures", "k", "lam", "loglik", "converged")
+
+"""
+
+Name: WeibullMLE
+Type: class
+Description: Running state for censored Weibull maximum likelihood, one
+entry per (component, failure mode). add() folds in a chunk of records and
+fit() solves the profile likelihood from the state alone, so memory does not
+grow with the number of records (about 8 KB per key).
+
+With u = ln t - c (c: a per-key centre fixed when the key is first seen), the
+profile likelihood needs the failure count r, the sum of u over failures and
+S(k) = sum over all records of exp(k u). For each grid shape k0 the state
+holds M_n = sum exp(w - m) w^n with w = k0 u, shifted by the running maximum
+m so nothing overflows. Then S(k0 (1 + p)) = e^m * sum_n p^n / n! * M_n.
+
+"""
+
+class WeibullMLE:
+    def __init__(self, shape_grid=MLE_SHAPE_GRID, terms=MLE_TAYLOR_TERMS):
+        self.shape_grid = np.asarray(shape_grid, dtype=np.float64)
+        self.terms = terms
+        self.keys = {}
+        n_grid = len(self.shape_grid)
+        self.records = np.zeros(0, dtype=np.int64)
+        self.failures = np.zeros(0, dtype=np.int64)
+        self.center = np.zeros(0)
+        self.failure_u = np.zeros(0)
+        self.shift = np.zeros((0, n_grid))
+        # Moments 0..terms + 1: the extra one gives the derivative of S
+        self.moments = np.zeros((0, n_grid, terms + 2))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _grow(self, n_new) -> None:
+        n_grid = len(self.shape_grid)
+        self.records = np.concatenate([self.records, np.zeros(n_new, dtype=np.int64)])
+        self.failures = np.concatenate([self.failures, np.zeros(n_new, dtype=np.int64)])
+        self.center = np.concatenate([self.center, np.zeros(n_new)])
+        self.failure_u = np.concatenate([self.failure_u, np.zeros(n_new)])
+        self.shift = np.concatenate([self.shift, np.full((n_new, n_grid), -np.inf)])
+        self.moments = np.concatenate([self.moments, np.zeros((n_new, n_grid, self.terms + 2))])
+
+    # Folds in one chunk: parallel arrays of (component, failure mode) keys,
+    # times to failure or suspension (> 0) and whether each record is a failure
+    def add(self, components, failure_modes, times, failed) -> None:
+        times = np.asarray(times, dtype=np.float64)
+        failed = np.asarray(failed, dtype=bool)
+        if not len(times):
+            return
+        codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([components, failure_modes]))
+        new = [key for key in uniques if key not in self.keys]
+        first_new = len(self.keys)
+        for key in new:
+            self.keys[key] = len(self.keys)
+        self._grow(len(new))
+        groups = np.array([self.keys[key] for key in uniques], dtype=np.int64)[codes]
+        n_keys = len(self.keys)
+
+        log_t = np.log(times)
+        if new:
+            # A new key is centred on its first chunk's mean log time
+            count = np.bincount(groups, minlength=n_keys)[first_new:]
+            total = np.bincount(groups, weights=log_t, minlength=n_keys)[first_new:]
+            self.center[first_new:] = total / np.maximum(count, 1)
+        u = log_t - self.center[groups]
+        self.records += np.bincount(groups, minlength=n_keys)
+        self.failures += np.bincount(groups, weights=failed, minlength=n_keys).astype(np.int64)
+        self.failure_u += np.bincount(groups, weights=u * failed, minlength=n_keys)
+
+        # Raise each (key, grid shape)'s shift to the chunk's largest w, rescaling its sums
+        w = u[:, None] * self.shape_grid[None, :]
+        order = np.argsort(groups, kind="stable")
+        present, starts = np.unique(groups[order], return_index=True)
+        chunk_max = np.maximum.reduceat(w[order], starts, axis=0)
+        old = self.shift[present]
+        new_shift = np.maximum(old, chunk_max)
+        with np.errstate(invalid="ignore"):
+            rescale = np.where(np.isfinite(old), np.exp(old - new_shift), 0.0)
+        self.moments[present] *= rescale[:, :, None]
+        self.shift[present] = new_shift
+
+        n_grid = len(self.shape_grid)
+        index = (groups[:, None] * n_grid + np.arange(n_grid)).ravel()
+        term = np.exp(w - self.shift[groups])
+        flat = self.moments.reshape(n_keys * n_grid, -1)
+        for n in range(self.terms + 2):
+            flat[:, n] += np.bincount(index, weights=term.ravel(), minlength=n_keys * n_grid)
+            term *= w
+
+    # ln S(k) and d ln S / dk at shapes k (one per key in keys), from each key's nearest grid shape
+    def _log_sum(self, keys, k):
+        step = np.log(self.shape_grid[1] / self.shape_grid[0])
+        j = np.clip(np.rint(np.log(k / self.shape_grid[0]) / step).astype(np.int64), 0, len(self.shape_grid) - 1)
+        k0 = self.shape_grid[j]
+        rho = k / k0 - 1
+        coefficients = rho[:, None] ** np.arange(self.terms + 1) / [factorial(n) for n in range(self.terms + 1)]
+        moments = self.moments[keys, j]
+        t0 = np.sum(coefficients * moments[:, :-1], axis=1)
+        t1 = np.sum(coefficients * moments[:, 1:], axis=1)
+        return self.shift[keys, j] + np.log(t0), t1 / (k0 * t0)
+
+    """
+    Maximum-likelihood (k, lam) for every key with at least one failure.
+    The profile score d ln S / dk - 1 / k - mean u over failures increases
+    in k, so its root is bracketed on the grid and then bisected. Returns a
+    DataFrame with MLE_RESULT_COLUMNS; keys without failures get NaN.
+    """
+
+    def fit(self) -> pd.DataFrame:
+        n_keys = len(self.keys)
+        k = np.full(n_keys, np.nan)
+        lam = np.full(n_keys, np.nan)
+        loglik = np.full(n_keys, np.nan)
+        converged = np.zeros(n_keys, dtype=bool)
+
+        keys = np.flatnonzero(self.failures > 0)
+        if len(keys):
+            r = self.failures[keys]
+            mean_u = self.failure_u[keys] / r
+            with np.errstate(divide="ignore", invalid="ignore"):
+                score = self.moments[keys, :, 1] / (self.shape_grid * self.moments[keys, :, 0]) \
+                    - 1 / self.shape_grid - mean_u[:, None]
+            positive = score > 0
+            upper = np.where(positive.any(axis=1), np.argmax(positive, axis=1), len(self.shape_grid))
+            inside = (upper > 0) & (upper < len(self.shape_grid))
+            low = np.log(self.shape_grid[np.clip(upper - 1, 0, len(self.shape_grid) - 1)])
+            high = np.log(self.shape_grid[np.clip(upper, 0, len(self.shape_grid) - 1)])
+            for _ in range(MLE_BISECTIONS):
+                mid = (low + high) / 2
+                _, d_log_sum = self._log_sum(keys, np.exp(mid))
+                above = d_log_sum - np.exp(-mid) - mean_u > 0
+                low, high = np.where(above, low, mid), np.where(above, mid, high)
+            shape = np.exp((low + high) / 2)
+
+            log_sum, _ = self._log_sum(keys, shape)
+            center = self.center[keys]
+            # lam ** k = sum(t ** k) / r, and ln sum(t ** k) = k c + ln S(k)
+            k[keys] = shape
+            lam[keys] = np.exp(center + (log_sum - np.log(r)) / shape)
+            sum_log_failures = r * center + self.failure_u[keys]
+            loglik[keys] = r * np.log(shape) - r * (shape * center + log_sum - np.log(r)) \
+                + (shape - 1) * sum_log_failures - r
+            converged[keys] = inside
+
+        components, failure_modes = zip(*self.keys) if n_keys else ((), ())
+        return pd.DataFrame(
+            {
+                "component": list(components),
+                "failure_mode": list(failure_modes),
+                "records": self.records,
+                "failures": self.failures,
+                "k": k,
+                "lam": lam,
+                "loglik": loglik,
+                "converged": converged,
+            },
+            columns=MLE_RESULT_COLUMNS,
+        )
+
+# One fitted row of WeibullMLE.fit() as a Fit, usable wherever stats.fit_weibull's are
+def result_fit(row) -> Fit:
+    return Fit("weibull", (float(row["k"]), float(row["lam"])), None, MLE_BISECTIONS, bool(row["converged"]))
+
+"""
+Yields a failure log (CSV, or Parquet with pyarrow) as DataFrames of at most
+chunksize records with LOG_COLUMNS. columns maps LOG_COLUMNS names to the
+file's headers where they differ.
+"""
+
+def read_log_chunks(path: str, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    names = {name: (columns or {}).get(name, name) for name in LOG_COLUMNS}
+    rename = {header: name for name, header in names.items()}
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        for chunk in pd.read_csv(path, usecols=list(names.values()), chunksize=chunksize,
+                                 dtype={names["status"]: str}, keep_default_na=False):
+            yield chunk.rename(columns=rename)
+    elif ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet logs require pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=list(names.values())):
+            yield batch.to_pandas().rename(columns=rename)
+    else:
+        raise ValueError(f"unsupported log format: {ext or path}")
+
+"""
+Yields a failure log's records a chunk at a time as (components,
+failure_modes, times, failed, skipped) arrays. Records with a missing or
+non-positive time are dropped and counted in skipped.
+"""
+
+def read_log_records(path: str, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    for chunk in read_log_chunks(path, chunksize, columns):
+        times = pd.to_numeric(chunk["time"], errors="coerce").to_numpy(np.float64)
+        valid = np.isfinite(times) & (times > 0)
+        failed = chunk["status"].astype(str).str.strip().str.lower().isin(FAILURE_STATUSES).to_numpy()
+        yield (
+            chunk["component"].astype(str).to_numpy()[valid],
+            chunk["failure_mode"].astype(str).to_numpy()[valid],
+            times[valid],
+            failed[valid],
+            int(np.count_nonzero(~valid)),
+        )
+
+"""
+Fits every (component, failure mode) in a failure log in one pass.
+progress(records) is called after each chunk. Returns (WeibullMLE.fit()
+frame, records skipped).
+"""
+
+def fit_failure_log(path: str, chunksize=DEFAULT_CHUNKSIZE, columns=None, progress=None):
+    mle = WeibullMLE()
+    read = skipped = 0
+    for components, failure_modes, times, failed, dropped in read_log_records(path, chunksize, columns):
+        mle.add(components, failure_modes, times, failed)
+        skipped += dropped
+        read += len(times) + dropped
+        if progress is not None:
+            progress(read)
+    return mle.fit(), skipped
+
+UPDATE_BOUNDS_QUERY = """
+UPDATE local_comp_fails
+SET lower_bound = ?, best_estimate = ?, upper_bound = ?
+WHERE comp_id = (SELECT id FROM components WHERE name = ?)
+  AND fail_id = (SELECT id FROM fail_modes WHERE desc = ?)
+"""
+
+# LB/BE/UB failure rates (failures per RATE_HOURS hours) from a Weibull fit to failure
+# times in hours: RATE_HOURS over its 95%, central and 5% time estimates (see weibull_bounds),
+# so a longer-lived mode gets lower rates and the rate bounds stay ordered
+def rate_bounds(k, lam) -> np.ndarray:
+    times = weibull_bounds(k, lam)
+    return RATE_HOURS / times[:, ::-1]
+
+"""
+Replaces the elicited LB/BE/UB of every fitted (component, failure mode) in
+local_comp_fails with rate_bounds of the MLE (k, lam). The log's times must be
+in hours; the bounds written are failures per million hours, the unit the
+criticality and reliability code read them in. Doesn't commit. Returns the
+number of rows updated.
+"""
+
+def write_bounds(conn: sqlite3.Connection, results: pd.DataFrame) -> int:
+    fitted = results[results["failures"] > 0]
+    bounds = rate_bounds(fitted["k"].to_numpy(), fitted["lam"].to_numpy())
+    before = conn.total_changes
+    conn.executemany(
+        UPDATE_BOUNDS_QUERY,
+        [
+            (lb, be, ub, component, failure_mode)
+            for (lb, be, ub), component, failure_mode in zip(
+                bounds.tolist(), fitted["component"], fitted["failure_mode"]
+            )
+        ],
+    )
+    return conn.total_changes - before
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fits Weibull (k, lam) per component and failure mode to a failure log")
+    parser.add_argument("log", help="CSV or Parquet with component, failure_mode, time (hours) and status columns")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    for name in LOG_COLUMNS:
+        parser.add_argument(f"--{name.replace('_', '-')}-column", dest=name, default=name,
+                            help=f"header of the {name} column")
+    parser.add_argument("--out", help="write the fits to this CSV")
+    parser.add_argument("--db", help="replace LB/BE/UB in this database's local_comp_fails with the fits' "
+                                     "rate bounds (failures per million hours)")
+    args = parser.parse_args(argv)
+
+    def progress(records):
+        print(f"\r{records} records read", end="", file=sys.stderr)
+
+    results, skipped = fit_failure_log(
+        args.log, args.chunksize, {name: getattr(args, name) for name in LOG_COLUMNS}, progress
+    )
+    print(f"\n{len(results.index)} keys fitted, {skipped} records skipped", file=sys.stderr)
+    if args.out:
+        results.to_csv(args.out, index=False)
+    else:
+        print(results.to_string(index=False))
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        try:
+            with conn:
+                updated = write_bounds(conn, results)
+        finally:
+            conn.close()
+        print(f"{updated} rows of {args.db} updated", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# @file test_stats.py
+# @brief Pins the Weibull and Rayleigh fits to what the old per-triple scipy minimize produced
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats_and_charts.stats import (
+    fit_weibull,
+    fit_weibull_batch,
+    fit_rayleigh,
+    fit_rayleigh_batch,
+    weibull_objective,
+)
+
+# (LB, BE, UB), then k, lam, objective and Rayleigh sigma from
+# minimize(objective, ones, bounds=Bounds(0.01, inf)) as _weibull and _rayleigh fitted before
+
+# Triples the old minimize solved: the fits must agree
+CONVERGED = [
+    ((0.5, 2, 6), 0.5889962995, 0.9308445552, 0.244194283, 2.264005256),
+    ((3, 4, 5), 6.387440242, 3.269162675, 3.602846853, 2.376154923),
+    ((0.2, 1.0, 1.5), 1.346080638, 0.6552783224, 0.01807542908, 0.6508926233),
+    ((1, 2, 3), 1.745972707, 1.491946466, 0.6791704822, 1.326857478),
+]
+
+# Triples where it stopped near its k = 1 start: the fits must be no worse
+STALLED = [
+    ((0.05, 0.3, 1.2), 1.242109429, 0.4558213618, 0.1916022394, 0.4343602403),
+    ((5, 9, 14), 0.9890831106, 1.999940409, 119.4242695, 6.151425744),
+    ((1, 5, 10), 0.9813640114, 1.999826335, 18.74643023, 4.052830711),
+    ((50, 200, 600), 0.9950921811, 21.99999943, 314058.906, 226.4005492),
+    ((10, 40, 90), 0.9923701269, 5.999994179, 6165.349955, 35.69969167),
+]
+
+# Both optimizers stop on a tolerance, so parameters agree to about 1e-5
+PARAM_RTOL = 1e-4
+
+@pytest.mark.parametrize("values, k, lam, objective, sigma", CONVERGED)
+def test_weibull_matches_minimize(values, k, lam, objective, sigma):
+    fit = fit_weibull(values)
+    assert fit.converged
+    assert fit.params == pytest.approx((k, lam), rel=PARAM_RTOL)
+    assert fit.residual == pytest.approx(objective, rel=1e-6)
+
+@pytest.mark.parametrize("values, k, lam, objective, sigma", STALLED)
+def test_weibull_no_worse_than_minimize(values, k, lam, objective, sigma):
+    fit = fit_weibull(values)
+    assert fit.converged
+    assert fit.residual <= objective * (1 + 1e-6)
+
+@pytest.mark.parametrize("values, k, lam, objective, sigma", CONVERGED + STALLED)
+def test_rayleigh_matches_minimize(values, k, lam, objective, sigma):
+    assert fit_rayleigh(values).params[0] == pytest.approx(sigma, rel=1e-6)
+
+def test_batch_matches_single_fits():
+    lb, be, ub = np.array([values for values, *_ in CONVERGED + STALLED]).T
+    k, lam, converged = fit_weibull_batch(lb, be, ub)
+    sigma = fit_rayleigh_batch(lb, be, ub)
+    for i, values in enumerate(zip(lb, be, ub)):
+        fit = fit_weibull(values)
+        assert (k[i], lam[i]) == pytest.approx(fit.params, rel=1e-9)
+        assert weibull_objective((k[i], lam[i]), np.array(values)) == pytest.approx(fit.residual, rel=1e-9)
+        assert sigma[i] == pytest.approx(fit_rayleigh(values).params[0], rel=1e-12)
+    assert converged.all()
@@ -0,0 +1,93 @@
+# @file test_survival.py
+# @brief Checks survival_curves against Kaplan-Meier and Nelson-Aalen estimates worked out by hand
+
+import os
+import sys
+import numpy as np
+import pytest
+from scipy.stats import norm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stats_and_charts.survival import survival_curve, survival_curves
+
+# (key, time, failed), shuffled so the sort is exercised. "A" comes first and ends
+# in a failure, which takes its survival to 0 before "B"'s records in the sorted order.
+RECORDS = [
+    ("A", 3.0, True),
+    ("B", 6.0, True),
+    ("C", 1.0, False),
+    ("A", 1.0, True),
+    ("B", 2.0, True),
+    ("A", 5.0, True),
+    ("B", 7.0, False),
+    ("A", 2.0, False),
+    ("B", 4.0, False),
+    ("A", 3.0, False),
+    ("B", 2.0, True),
+]
+
+# A: t=1 r=5 d=1, S = 4/5; t=3 r=3 d=1, S = 4/5 * 2/3; t=5 r=1 d=1, S = 0
+# B: t=2 r=5 d=2, S = 3/5; t=6 r=2 d=1, S = 3/5 * 1/2
+EXPECTED = {
+    "A": {
+        "time": [1.0, 3.0, 5.0],
+        "at_risk": [5, 3, 1],
+        "events": [1, 1, 1],
+        "survival": [0.8, 0.8 * 2 / 3, 0.0],
+        "hazard": [1 / 5, 1 / 5 + 1 / 3, 1 / 5 + 1 / 3 + 1],
+        "greenwood": [1 / (5 * 4), 1 / (5 * 4) + 1 / (3 * 2), None],
+    },
+    "B": {
+        "time": [2.0, 6.0],
+        "at_risk": [5, 2],
+        "events": [2, 1],
+        "survival": [0.6, 0.3],
+        "hazard": [2 / 5, 2 / 5 + 1 / 2],
+        "greenwood": [2 / (5 * 3), 2 / (5 * 3) + 1 / (2 * 1)],
+    },
+}
+
+@pytest.fixture
+def curves():
+    keys, times, failed = zip(*RECORDS)
+    return survival_curves(np.array(keys), np.array(times), np.array(failed))
+
+@pytest.mark.parametrize("key", sorted(EXPECTED))
+def test_matches_hand_computed_curve(curves, key):
+    curve, expected = curves[key], EXPECTED[key]
+    np.testing.assert_array_equal(curve.time, expected["time"])
+    np.testing.assert_array_equal(curve.at_risk, expected["at_risk"])
+    np.testing.assert_array_equal(curve.events, expected["events"])
+    np.testing.assert_allclose(curve.survival, expected["survival"], rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(curve.hazard, expected["hazard"], rtol=1e-12)
+
+    z = norm.ppf(0.975)
+    for i, greenwood in enumerate(expected["greenwood"]):
+        survival = expected["survival"][i]
+        if greenwood is None:
+            assert curve.lower[i] == curve.upper[i] == 0.0
+            continue
+        spread = np.exp(z * np.sqrt(greenwood) / abs(np.log(survival)))
+        assert curve.lower[i] == pytest.approx(survival ** spread, rel=1e-12)
+        assert curve.upper[i] == pytest.approx(survival ** (1 / spread), rel=1e-12)
+
+def test_key_without_failures_is_empty(curves):
+    assert len(curves["C"].time) == 0
+
+def test_fully_failed_keys_stay_finite():
+    rng = np.random.default_rng(0)
+    keys = np.repeat(["Pump/seal", "Valve/stuck"], 1000)
+    times = rng.exponential(10.0, 2000)
+    curves = survival_curves(keys, times, np.ones(2000, dtype=bool))
+    for curve in curves.values():
+        assert len(curve.time) == 1000
+        assert np.all(np.isfinite(curve.survival))
+        assert np.all(np.diff(curve.survival) < 0)
+        np.testing.assert_allclose(curve.survival, 1 - np.arange(1, 1001) / 1000, atol=1e-12)
+        assert np.all((curve.lower <= curve.survival) & (curve.survival <= curve.upper))
+
+def test_single_failure():
+    curve = survival_curve([3.0], [True])
+    assert curve.survival.tolist() == [0.0]
+    assert curve.hazard.tolist() == [1.0]